@@ -1,14 +1,24 @@
 # Handles user authentication and registration 
 import getpass
-from database import Database
-from datetime import datetime
+from service import ShopService, ServiceError
 
 class Auth:
-    def __init__(self, db):
+    def __init__(self, db, service=None):
         self.db = db
-        self.current_user = None
-        self.current_role = None
-        self.session_no = None
+        self.service = service or ShopService(db)
+        self.session = None
+    
+    @property
+    def current_user(self):
+        return self.session.uid if self.session else None
+    
+    @property
+    def current_role(self):
+        return self.session.role if self.session else None
+    
+    @property
+    def session_no(self):
+        return self.session.session_no if self.session else None
     
     def login(self):
         """Login existing user"""
@@ -22,28 +32,15 @@ class Auth:
         # Use getpass to hide password input
         pwd = getpass.getpass("Enter Password: ")
         
-        # Parameterized query to prevent SQL injection
-        query = "SELECT uid, pwd, role FROM users WHERE uid = ?"
-        result = self.db.execute_query(query, (uid,))
-        
-        if result and len(result) > 0:
-            user = result[0]
-            if user['pwd'] == pwd:
-                self.current_user = user['uid']
-                self.current_role = user['role']
-                
-                # Create new session for customer
-                if self.current_role == 'customer':
-                    self._create_session()
-                
-                print(f"\nLogin successful! Welcome, {self.current_role}.")
-                return True
-            else:
-                print("Invalid password.")
-                return False
-        else:
-            print("User ID not found.")
+        # Checks credentials and opens a session for customers
+        try:
+            self.session = self.service.login(uid, pwd)
+        except ServiceError as e:
+            print(e)
             return False
+        
+        print(f"\nLogin successful! Welcome, {self.current_role}.")
+        return True
     
     def signup(self):
         """Register new customer"""
@@ -52,10 +49,7 @@ class Auth:
         email = input("Enter your email: ").strip()
         
         # Check if email already exists
-        query = "SELECT email FROM customers WHERE LOWER(email) = LOWER(?)"
-        result = self.db.execute_query(query, (email,))
-        
-        if result and len(result) > 0:
+        if self.service.email_registered(email):
             print("Email already registered. Please login or use a different email.")
             return False
         
@@ -66,43 +60,20 @@ class Auth:
             print("Passwords do not match.")
             return False
         
-        # Generate new user ID
-        new_uid = self.db.get_next_id('users', 'uid')
-        
-        # Insert into users table
-        query = "INSERT INTO users (uid, pwd, role) VALUES (?, ?, ?)"
-        if not self.db.execute_update(query, (new_uid, pwd, 'customer')):
-            print("Error creating user account.")
-            return False
-        
-        # Insert into customers table
-        query = "INSERT INTO customers (cid, name, email) VALUES (?, ?, ?)"
-        if not self.db.execute_update(query, (new_uid, name, email)):
-            print("Error creating customer profile.")
+        try:
+            new_uid = self.service.signup(name, email, pwd)
+        except ServiceError as e:
+            print(e)
             return False
         
         print(f"\nAccount created successfully! Your User ID is: {new_uid}")
         print("Please login with your new credentials.")
         return True
     
-    def _create_session(self):
-        """Create a new session for logged-in customer"""
-        session_no = self.db.get_next_id('sessions', 'sessionNo')
-        start_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
-        query = "INSERT INTO sessions (cid, sessionNo, start_time) VALUES (?, ?, ?)"
-        self.db.execute_update(query, (self.current_user, session_no, start_time))
-        self.session_no = session_no
-    
     def logout(self):
         """Logout current user"""
-        if self.current_role == 'customer' and self.session_no:
-            # Update session end time
-            end_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            query = "UPDATE sessions SET end_time = ? WHERE cid = ? AND sessionNo = ?"
-            self.db.execute_update(query, (end_time, self.current_user, self.session_no))
+        if self.session:
+            self.service.logout(self.session)
         
-        self.current_user = None
-        self.current_role = None
-        self.session_no = None
-        print("\nLogged out successfully.")
\ No newline at end of file
+        self.session = None
+        print("\nLogged out successfully.")
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Checkout contention benchmark (flash sale)
+
+Buyer threads place orders as fast as they can against a scratch copy of
+the prj-tables.sql schema in which a few hot products have a small stock
+and get most of the orders. Runs once with the old row-by-row checkout
+(one INSERT and one unconditional stock UPDATE per line, as in the old
+Customer._checkout) and once with CheckoutEngine, and prints for each the
+orders placed and refused per second, latency percentiles, lock timeouts
+and how many units were sold beyond the stock.
+
+Usage: python bench_checkout.py [--buyers N] [--seconds S] [--hot N]
+                                [--hot-stock N] [--hot-share F]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from bench_concurrency import create_scratch_db
+from checkout import CheckoutEngine, InsufficientStock
+from database import Database
+
+
+class RowByRowCheckout:
+    """The pre-engine checkout: no stock check, one statement per line"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def place_order(self, ono, cid, session_no, odate, address, items):
+        with self.db.transaction():
+            conn = self.db.conn
+            conn.execute("INSERT INTO orders (ono, cid, sessionNo, odate, shipping_address) "
+                         "VALUES (?, ?, ?, ?, ?)", (ono, cid, session_no, odate, address))
+            for line_no, (pid, qty) in enumerate(items.items(), 1):
+                price = conn.execute("SELECT price FROM products WHERE pid = ?", (pid,)).fetchone()[0]
+                conn.execute("INSERT INTO orderlines (ono, lineNo, pid, qty, uprice) VALUES (?, ?, ?, ?, ?)",
+                             (ono, line_no, pid, qty, price))
+                conn.execute("UPDATE products SET stock_count = stock_count - ? WHERE pid = ?",
+                             (qty, pid))
+            conn.execute("DELETE FROM cart WHERE cid = ? AND sessionNo = ?", (cid, session_no))
+
+
+def run(engine_cls, path, args):
+    """Run the buyers for args.seconds; returns counters and latencies"""
+    db = Database(path, busy_timeout=args.busy_timeout)
+    engine = engine_cls(db)
+    counts = {'placed': 0, 'refused': 0, 'timeouts': 0}
+    latencies = []
+    lock = threading.Lock()
+    next_ono = iter(range(1, 10**9))
+    deadline = time.perf_counter() + args.seconds
+
+    def buyer(seed):
+        rng = random.Random(seed)
+        mine = {'placed': 0, 'refused': 0, 'timeouts': 0}
+        times = []
+        while time.perf_counter() < deadline:
+            items = {}
+            for _ in range(rng.randint(1, 3)):
+                if rng.random() < args.hot_share:
+                    pid = rng.randint(1, args.hot)
+                else:
+                    pid = rng.randint(args.hot + 1, args.products)
+                items[pid] = rng.randint(1, 2)
+            with lock:
+                ono = next(next_ono)
+            start = time.perf_counter()
+            try:
+                engine.place_order(ono, 1, 1, '2025-01-01', 'Bench St', items)
+                mine['placed'] += 1
+            except InsufficientStock:
+                mine['refused'] += 1
+            except sqlite3.OperationalError:
+                mine['timeouts'] += 1
+            times.append(time.perf_counter() - start)
+        db.release_connection()
+        with lock:
+            for key in counts:
+                counts[key] += mine[key]
+            latencies.extend(times)
+
+    threads = [threading.Thread(target=buyer, args=(i,)) for i in range(args.buyers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    row = db.execute_query("SELECT COALESCE(-SUM(stock_count), 0) as n FROM products "
+                           "WHERE stock_count < 0")
+    counts['oversold'] = row[0]['n']
+    db.close()
+    latencies.sort()
+    return counts, latencies
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(pct / 100 * len(values))) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkout contention benchmark")
+    parser.add_argument('--buyers', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--hot', type=int, default=3, help="number of flash-sale products")
+    parser.add_argument('--hot-stock', type=int, default=500, help="stock of each hot product")
+    parser.add_argument('--hot-share', type=float, default=0.8,
+                        help="chance a cart line is a hot product (default 0.8)")
+    parser.add_argument('--busy-timeout', type=int, default=5000, help="ms (default 5000)")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("  Checkout contention benchmark")
+    print("=" * 60)
+    print(f"Buyers: {args.buyers}  Duration: {args.seconds:.1f}s  Hot products: {args.hot} "
+          f"x {args.hot_stock} units  Hot share: {args.hot_share:.0%}")
+
+    for name, engine_cls in [('row-by-row', RowByRowCheckout),
+                             ('CheckoutEngine', CheckoutEngine)]:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.db')
+            create_scratch_db(path, args.products)
+            conn = sqlite3.connect(path)
+            conn.execute("UPDATE products SET stock_count = ? WHERE pid <= ?",
+                         (args.hot_stock, args.hot))
+            conn.commit()
+            conn.close()
+            counts, latencies = run(engine_cls, path, args)
+        print(f"\n{name}:")
+        print(f"  Orders placed:  {counts['placed'] / args.seconds:8.0f} /sec")
+        print(f"  Orders refused: {counts['refused'] / args.seconds:8.0f} /sec")
+        print(f"  Lock timeouts:  {counts['timeouts']:8d}")
+        print(f"  Latency:        p50 {percentile(latencies, 50) * 1000:.2f} ms  "
+              f"p99 {percentile(latencies, 99) * 1000:.2f} ms")
+        print(f"  Units oversold: {counts['oversold']:8d}")
+
+
+if __name__ == "__main__":
+    main()
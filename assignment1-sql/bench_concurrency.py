@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for the Database connection pool
+
+Runs reader threads (product keyword searches, as in Customer.search_products)
+alongside writer threads (checkout-style order inserts and stock updates, as in
+Customer._checkout) against a scratch copy of the prj-tables.sql schema, once
+with the old single shared connection in rollback-journal mode and once with
+the pooled WAL Database, and prints the throughput of both.
+
+Usage: python bench_concurrency.py [--readers N] [--writers N] [--seconds S]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from database import Database
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prj-tables.sql')
+
+SEARCH_QUERY = """
+    SELECT * FROM products
+    WHERE (LOWER(name) LIKE ? OR LOWER(descr) LIKE ?)
+"""
+KEYWORDS = ['cream', 'soap', 'card', 'food', 'gaming', 'laptop', 'cable', 'bag']
+
+
+def create_scratch_db(path, products=5000):
+    """Create the project schema and seed products/customers/sessions"""
+    conn = sqlite3.connect(path)
+    with open(SCHEMA_FILE) as f:
+        conn.executescript(f.read())
+    rows = []
+    for pid in range(1, products + 1):
+        kw = KEYWORDS[pid % len(KEYWORDS)]
+        rows.append((pid, f'Product {pid} {kw}', 'Bench', 9.99, 1_000_000,
+                     f'Benchmark item {pid} with {kw}'))
+    conn.executemany("INSERT INTO products VALUES (?, ?, ?, ?, ?, ?)", rows)
+    conn.execute("INSERT INTO users VALUES (1, 'pw', 'customer')")
+    conn.execute("INSERT INTO customers VALUES (1, 'Bench', 'bench@example.com')")
+    conn.execute("INSERT INTO sessions VALUES (1, 1, '2025-01-01 00:00:00', NULL)")
+    conn.commit()
+    conn.close()
+
+
+class SharedConnection:
+    """The pre-pool behaviour: one connection and cursor shared by every thread"""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+
+    def search(self, keyword):
+        with self.lock:
+            cur = self.conn.execute(SEARCH_QUERY, (f'%{keyword}%', f'%{keyword}%'))
+            return cur.fetchall()
+
+    def checkout(self, ono, pid):
+        with self.lock:
+            write_order(self.conn, ono, pid)
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class PooledConnection:
+    """The pooled Database: each thread gets its own WAL connection"""
+
+    def __init__(self, path):
+        self.db = Database(path)
+
+    def search(self, keyword):
+        return self.db.execute_query(SEARCH_QUERY, (f'%{keyword}%', f'%{keyword}%'))
+
+    def checkout(self, ono, pid):
+        with self.db.transaction():
+            write_order(self.db.conn, ono, pid)
+
+    def close(self):
+        self.db.close()
+
+
+def write_order(conn, ono, pid):
+    """Insert one order with a single line and decrement stock"""
+    # Columns named: opening a Database adds the order total columns
+    conn.execute("INSERT INTO orders (ono, cid, sessionNo, odate, shipping_address) "
+                 "VALUES (?, 1, 1, '2025-01-01', 'Bench St')", (ono,))
+    conn.execute("INSERT INTO orderlines (ono, lineNo, pid, qty, uprice) VALUES (?, 1, ?, 1, 9.99)",
+                 (ono, pid))
+    conn.execute("UPDATE products SET stock_count = stock_count - 1 WHERE pid = ?", (pid,))
+
+
+def run(backend, readers, writers, seconds, products):
+    """Run readers and writers for a fixed time and return op counts"""
+    counts = {'reads': 0, 'writes': 0}
+    counts_lock = threading.Lock()
+    next_ono = iter(range(1, 10**9))
+    ono_lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def reader():
+        done = 0
+        rng = random.Random()
+        while time.perf_counter() < deadline:
+            backend.search(rng.choice(KEYWORDS))
+            done += 1
+        with counts_lock:
+            counts['reads'] += done
+
+    def writer():
+        done = 0
+        rng = random.Random()
+        while time.perf_counter() < deadline:
+            with ono_lock:
+                ono = next(next_ono)
+            backend.checkout(ono, rng.randint(1, products))
+            done += 1
+        with counts_lock:
+            counts['writes'] += done
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Database connection pool benchmark")
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=1)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--products', type=int, default=5000)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("  Connection pool benchmark")
+    print("=" * 60)
+    print(f"Readers: {args.readers}  Writers: {args.writers}  "
+          f"Duration: {args.seconds:.1f}s  Products: {args.products}")
+
+    results = {}
+    for name, backend_cls in [('shared connection', SharedConnection),
+                              ('pooled WAL', PooledConnection)]:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.db')
+            create_scratch_db(path, args.products)
+            backend = backend_cls(path)
+            try:
+                counts = run(backend, args.readers, args.writers,
+                             args.seconds, args.products)
+            finally:
+                backend.close()
+        reads = counts['reads'] / args.seconds
+        writes = counts['writes'] / args.seconds
+        results[name] = reads + writes
+        print(f"\n{name}:")
+        print(f"  Searches:  {reads:8.0f} ops/sec")
+        print(f"  Checkouts: {writes:8.0f} ops/sec")
+
+    base = results['shared connection']
+    if base > 0:
+        print(f"\nSpeedup: {results['pooled WAL'] / base:.2f}x total throughput")
+
+
+if __name__ == "__main__":
+    main()
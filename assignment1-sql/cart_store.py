@@ -0,0 +1,166 @@
+# Session carts kept in memory and written back to the cart table in batches
+import atexit
+import sqlite3
+import threading
+
+
+class CartStore:
+    """Hold each session's cart in memory and persist it lazily
+
+    Every cart click used to be a SELECT plus an INSERT/UPDATE/DELETE and a
+    commit. Here a session's cart is read from the cart table once (picking
+    up rows the session already has there) and then changed in memory only.
+    Changed carts are written back, each as a DELETE of the session's rows
+    plus one executemany INSERT, all in a single transaction:
+      - by drop() at logout,
+      - every flush_interval seconds by a background thread, so the cart
+        table never trails the sessions by more than that.
+    A checkout takes the cart with take() instead and deletes whatever rows
+    earlier flushes left.
+    """
+
+    DELETE = "DELETE FROM cart WHERE cid = ? AND sessionNo = ?"
+    INSERT = "INSERT INTO cart (cid, sessionNo, pid, qty) VALUES (?, ?, ?, ?)"
+
+    def __init__(self, db, flush_interval=5.0):
+        self.db = db
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._carts = {}    # (cid, sessionNo) -> {pid: qty}
+        self._dirty = set()
+        self._stopped = threading.Event()
+        self._flusher = None
+        atexit.register(self.close)
+
+    @staticmethod
+    def _key(session):
+        return (session.uid, session.session_no)
+
+    def _cart(self, key):
+        """The in-memory cart for key, loaded from the cart table on first use"""
+        cart = self._carts.get(key)
+        if cart is None:
+            query = "SELECT pid, qty FROM cart WHERE cid = ? AND sessionNo = ?"
+            rows = self.db.execute_query(query, key) or []
+            cart = self._carts.setdefault(key, {row['pid']: row['qty'] for row in rows})
+        return cart
+
+    def _changed(self, key):
+        self._dirty.add(key)
+        if self._flusher is None and not self._stopped.is_set():
+            self._flusher = threading.Thread(target=self._run, name='cart-flusher', daemon=True)
+            self._flusher.start()
+
+    def items(self, session):
+        """{pid: qty} copy of the session's cart"""
+        key = self._key(session)
+        with self._lock:
+            return dict(self._cart(key))
+
+    def add(self, session, pid, qty):
+        """Add qty of pid to the cart"""
+        key = self._key(session)
+        with self._lock:
+            cart = self._cart(key)
+            cart[pid] = cart.get(pid, 0) + qty
+            self._changed(key)
+
+    def set(self, session, pid, qty):
+        """Set the quantity of pid in the cart"""
+        key = self._key(session)
+        with self._lock:
+            self._cart(key)[pid] = qty
+            self._changed(key)
+
+    def remove(self, session, pid):
+        """Drop pid from the cart"""
+        key = self._key(session)
+        with self._lock:
+            if self._cart(key).pop(pid, None) is not None:
+                self._changed(key)
+
+    def take(self, session):
+        """{pid: qty} copy of the cart, handed over to a checkout
+
+        The cart is no longer flushed: the checkout deletes its rows. Call
+        clear(session) once the order commits, or mark_changed(session) if
+        it does not.
+        """
+        key = self._key(session)
+        with self._lock:
+            self._dirty.discard(key)
+            return dict(self._cart(key))
+
+    def mark_changed(self, session):
+        """Mark the cart as not written (e.g. the checkout after take() failed)"""
+        with self._lock:
+            if self._key(session) in self._carts:
+                self._changed(self._key(session))
+
+    def clear(self, session):
+        """Empty the in-memory cart (its rows are already gone, e.g. after checkout)"""
+        key = self._key(session)
+        with self._lock:
+            self._carts[key] = {}
+            self._dirty.discard(key)
+
+    def drop(self, session):
+        """Write back and forget the session's cart (at logout)"""
+        self.flush([self._key(session)])
+        with self._lock:
+            if self._key(session) not in self._dirty:
+                self._carts.pop(self._key(session), None)
+
+    def pending(self):
+        """Number of carts with changes not yet written"""
+        with self._lock:
+            return len(self._dirty)
+
+    def _run(self):
+        """Background thread: write back changed carts on a timer"""
+        try:
+            while not self._stopped.wait(self.flush_interval):
+                self.flush()
+        finally:
+            self.db.release_connection()
+
+    def flush(self, keys=None):
+        """Write changed carts (all, or those in keys) in one transaction
+
+        Returns the number of carts written.
+        """
+        if not self.pending():
+            return 0
+        taken = []
+        try:
+            # The carts are read once the write lock is held, so a checkout
+            # committing meanwhile is never overwritten with its old cart
+            with self.db.transaction():
+                with self._lock:
+                    keys = [key for key in (self._dirty if keys is None else keys)
+                            if key in self._dirty]
+                    rows = [key + (pid, qty) for key in keys
+                            for pid, qty in self._carts[key].items()]
+                    self._dirty.difference_update(keys)
+                    taken = keys
+                if keys:
+                    self.db.execute_many(self.DELETE, keys)
+                    self.db.execute_many(self.INSERT, rows)
+        except sqlite3.Error as e:
+            # Mark the carts taken for this flush again so the next one
+            # retries them
+            print(f"Cart flush error: {e}")
+            with self._lock:
+                self._dirty.update(taken)
+            return 0
+        return len(keys)
+
+    def close(self):
+        """Stop the background flusher and write every changed cart"""
+        # Let go of the exit hook, which would keep this store alive until exit
+        atexit.unregister(self.close)
+        self._stopped.set()
+        flusher, self._flusher = self._flusher, None
+        if flusher is not None and flusher is not threading.current_thread():
+            flusher.join()
+        self.flush()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Query-plan regression checker
+
+Collects every SQL statement written in the SOURCE_FILES modules (plus the
+dynamically built product search, keyset page and ranking queries), runs
+EXPLAIN QUERY PLAN for each against a large seeded copy of the
+prj-tables.sql schema with the managed indexes installed, and fails if a hot
+query falls back to a full SCAN of a table.
+
+Usage: python check_query_plans.py [--scale N] [--verbose]
+Exit status is 1 if any non-allowlisted statement scans a table.
+"""
+
+import argparse
+import ast
+import os
+import sqlite3
+import sys
+import tempfile
+
+from database import Database
+from datagen import generate
+from checkout import CheckoutEngine
+from pagination import KeysetPager
+from product_bulk import ProductBulk
+from product_search import build_search_query, search_keys
+import service
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SOURCE_FILES = ['service.py', 'checkout.py', 'cart_store.py', 'event_log.py',
+                'product_cache.py', 'product_bulk.py']
+SQL_VERBS = ("SELECT ", "INSERT ", "UPDATE ", "DELETE ", "WITH ")  # as written in the code
+
+# Statements allowed to scan, keyed by (file, constant or function name),
+# with the reason
+ALLOWED_SCANS = {
+    ('service.py', 'TOP_BY_ORDERS_SOURCE'):
+        "ranking source, only run wrapped by Database.top_n_with_ties (see 'top 3 by ...')",
+    ('service.py', 'TOP_BY_VIEWS_SOURCE'):
+        "ranking source, only run wrapped by Database.top_n_with_ties (see 'top 3 by ...')",
+    ('product_bulk.py', 'ProductBulk.EXPORT'):
+        "an export reads every product, in primary key order",
+    ('product_bulk.py', 'ProductBulk.MERGE'):
+        "a bulk import reads the whole staging table it has just filled",
+    ('product_bulk.py', 'ProductBulk.import_products'):
+        "one catalog count per bulk import, to choose how to re-index",
+}
+
+
+def extract_statements(filename):
+    """Yield (name, line, sql) for each SQL string literal in a source file
+
+    name is the function the literal appears in, else the module or class
+    constant it is assigned to (both qualified by their class), else
+    '<module>'.
+    """
+    with open(os.path.join(HERE, filename)) as f:
+        tree = ast.parse(f.read(), filename)
+
+    def qualify(scope, name):
+        return name if scope == '<module>' else f"{scope}.{name}"
+
+    def visit(node, function, scope='<module>'):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                name = qualify(scope, child.name)
+                yield from visit(child, name, name)
+                continue
+            if isinstance(child, ast.ClassDef):
+                name = qualify(scope, child.name)
+                yield from visit(child, function, name)
+                continue
+            if (function == '<module>' and isinstance(child, ast.Assign)
+                    and len(child.targets) == 1 and isinstance(child.targets[0], ast.Name)):
+                yield from visit(child, qualify(scope, child.targets[0].id), scope)
+                continue
+            if isinstance(child, ast.JoinedStr):
+                # f-strings are built at runtime; the builders are checked
+                # separately through dynamic_statements()
+                continue
+            if isinstance(child, ast.Constant) and isinstance(child.value, str):
+                sql = ' '.join(child.value.split())
+                # str.format templates are checked through dynamic_statements()
+                if sql.startswith(SQL_VERBS) and '{}' not in sql:
+                    yield function, child.lineno, sql
+            yield from visit(child, function, scope)
+
+    yield from visit(tree, '<module>')
+
+
+def dynamic_statements(db):
+    """Yield (label, sql, params) for queries assembled at runtime"""
+    for keywords in (['gaming'], ['gaming', 'laptop'], ['laptop', 'pc']):
+        use_index = 'product_search' in db.features
+        query, params = build_search_query(keywords, use_index, ordered=False)
+        pager = KeysetPager(db, query, params, search_keys(keywords, use_index))
+        yield f"search {keywords} first page", *pager.page_query()
+        yield f"search {keywords} next page", *pager.page_query((1,))
+        pager.close()
+    pager = KeysetPager(db, service.ORDER_HISTORY_QUERY, (1,),
+                        service.ORDER_HISTORY_KEYS, descending=True)
+    yield "order history first page", *pager.page_query()
+    yield "order history next page", *pager.page_query(('2025-01-01', 10))
+    pager.close()
+    yield "checkout products", CheckoutEngine.PRODUCTS.format('?, ?, ?'), (1, 2, 3)
+    for table, column in [('users', 'uid'), ('sessions', 'sessionNo'), ('orders', 'ono')]:
+        yield f"id block {table}.{column}", f"SELECT MAX({column}) FROM {table}", ()
+    for source, metric in [(service.TOP_BY_ORDERS_SOURCE, 'order_count'),
+                           (service.TOP_BY_VIEWS_SOURCE, 'view_count')]:
+        yield f"top 3 by {metric}", *db.top_n_query(source, metric, 3, tiebreak='pid',
+                                                    min_value=1)
+
+
+def full_scans(conn, sql, params=None):
+    """Return (plan lines, scanning lines) for a statement"""
+    if params is None:
+        params = (None,) * sql.count('?')
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+    scans = [line for line in plan
+             if line.startswith('SCAN ')
+             and 'VIRTUAL TABLE' not in line
+             and not line.startswith(('SCAN CONSTANT ROW', 'SCAN (subquery'))]
+    return plan, scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN QUERY PLAN regression checker")
+    parser.add_argument('--scale', type=int, default=20000,
+                        help="number of customers to seed (default 20000)")
+    parser.add_argument('--verbose', action='store_true', help="print every plan")
+    args = parser.parse_args()
+
+    failures = 0
+    checked = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'plans.db')
+        print(f"Seeding scratch database (scale {args.scale})...")
+        generate(path, customers=args.scale)
+        db = Database(path)
+        db.conn.execute("ANALYZE")
+        conn = db.conn
+        # Staging table the bulk import statements work on
+        conn.execute(ProductBulk.STAGE)
+
+        checks = []
+        for filename in SOURCE_FILES:
+            for function, line, sql in extract_statements(filename):
+                checks.append((f"{filename}:{line} {function}", (filename, function), sql, None))
+        for label, sql, params in dynamic_statements(db):
+            checks.append((label, None, sql, params))
+
+        for label, key, sql, params in checks:
+            checked += 1
+            try:
+                plan, scans = full_scans(conn, sql, params)
+            except sqlite3.Error as e:
+                print(f"✗ {label}: cannot plan statement ({e})")
+                failures += 1
+                continue
+            if scans and key in ALLOWED_SCANS:
+                status = f"~ allowed scan ({ALLOWED_SCANS[key]})"
+            elif scans:
+                status = "✗ FULL SCAN"
+                failures += 1
+            else:
+                status = "✓"
+            if args.verbose or scans:
+                print(f"\n{status} {label}")
+                print(f"  {' '.join(sql.split())}")
+                for line in plan:
+                    print(f"    {line}")
+        db.close()
+
+    print(f"\nChecked {checked} statements: {failures} failure(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+# Turns a cart into an order without ever selling more than is in stock
+import threading
+
+
+class InsufficientStock(Exception):
+    """Some cart lines ask for more than is in stock
+
+    shortages is a list of {'pid', 'name', 'qty', 'stock_count'} dicts,
+    one per line that cannot be filled.
+    """
+
+    def __init__(self, shortages):
+        super().__init__("Insufficient stock for: " + ", ".join(
+            f"{s['name']} (available: {s['stock_count']})" for s in shortages))
+        self.shortages = shortages
+
+
+class CheckoutEngine:
+    """Place orders with set-based, conditional stock updates
+
+    The old checkout inserted each order line and decremented each stock
+    count with its own statement and never looked at stock_count again, so
+    two customers buying the last unit could both succeed and leave it
+    negative. Here, inside one write transaction, the cart's products are
+    read once, every line is decremented by a single executemany of
+
+        UPDATE products SET stock_count = stock_count - ?
+        WHERE pid = ? AND stock_count >= ?
+
+    and the order lines are written by one executemany. If any line was
+    not decremented the transaction rolls back and InsufficientStock is
+    raised, so stock can never go below zero.
+
+    Flash sales (many buyers, one hot product) are kept from turning into
+    a storm of writers polling the database lock:
+      - a line that is already short is refused from a plain read, before
+        the write lock is requested, so once an item sells out further
+        buyers never queue for the lock;
+      - this process's checkouts wait for each other on an in-process lock
+        rather than on SQLite's busy handler, which sleeps and retries;
+      - the write transaction holds only the five statements above (IDs
+        and the cart are read before it starts).
+    """
+
+    PRODUCTS = "SELECT pid, name, price, stock_count FROM products WHERE pid IN ({})"
+    CART = "SELECT pid, qty FROM cart WHERE cid = ? AND sessionNo = ?"
+    DECREMENT = "UPDATE products SET stock_count = stock_count - ? WHERE pid = ? AND stock_count >= ?"
+    ORDER = "INSERT INTO orders (ono, cid, sessionNo, odate, shipping_address) VALUES (?, ?, ?, ?, ?)"
+    LINE = "INSERT INTO orderlines (ono, lineNo, pid, qty, uprice) VALUES (?, ?, ?, ?, ?)"
+    CLEAR_CART = "DELETE FROM cart WHERE cid = ? AND sessionNo = ?"
+
+    def __init__(self, db):
+        self.db = db
+        self._gate = threading.Lock()
+
+    def cart_items(self, cid, session_no):
+        """{pid: qty} of a cart stored in the cart table"""
+        rows = self.db.execute_query(self.CART, (cid, session_no)) or []
+        return {row['pid']: row['qty'] for row in rows}
+
+    def _products(self, pids):
+        query = self.PRODUCTS.format(', '.join('?' * len(pids)))
+        return {row['pid']: row for row in self.db.execute_query(query, pids) or []}
+
+    @staticmethod
+    def _shortages(items, products):
+        return [{'pid': pid, 'name': products[pid]['name'] if pid in products else str(pid),
+                 'qty': qty, 'stock_count': products[pid]['stock_count'] if pid in products else 0}
+                for pid, qty in items.items()
+                if pid not in products or products[pid]['stock_count'] < qty]
+
+    def shortages(self, items):
+        """Lines of items ({pid: qty}) that the current stock cannot fill"""
+        pids = sorted(items)
+        return self._shortages(items, self._products(pids)) if pids else []
+
+    def place_order(self, ono, cid, session_no, odate, address, items):
+        """Write order ono for items ({pid: qty}) and delete the session's cart rows
+
+        Returns the order lines as {'pid', 'name', 'qty', 'uprice'} dicts,
+        priced at the products' prices when the order commits. Raises
+        InsufficientStock (nothing written) if a line cannot be filled;
+        database errors propagate after the rollback.
+        """
+        pids = sorted(items)
+        shortages = self.shortages(items)
+        if shortages:
+            raise InsufficientStock(shortages)
+
+        if self.db.in_transaction():
+            return self._write(ono, cid, session_no, odate, address, items, pids)
+        with self._gate, self.db.transaction():
+            return self._write(ono, cid, session_no, odate, address, items, pids)
+
+    def _write(self, ono, cid, session_no, odate, address, items, pids):
+        # Prices and stock as of now that the write lock is held
+        products = self._products(pids)
+        shortages = self._shortages(items, products)
+        if shortages:
+            raise InsufficientStock(shortages)
+
+        try:
+            # A savepoint, so a failed decrement is undone even when the
+            # caller's transaction carries on
+            with self.db.transaction():
+                decremented = self.db.execute_many(
+                    self.DECREMENT, [(items[pid], pid, items[pid]) for pid in pids])
+                if decremented != len(pids):
+                    raise InsufficientStock([])
+        except InsufficientStock:
+            # Stock changed between the read and the update (only possible
+            # if the caller's transaction did not take the write lock). The
+            # update has taken it now, so a re-read tells which lines are short
+            raise InsufficientStock(self._shortages(items, self._products(pids)))
+
+        lines = [{'pid': pid, 'name': products[pid]['name'], 'qty': items[pid],
+                  'uprice': products[pid]['price']} for pid in pids]
+        self.db.execute_update(self.ORDER, (ono, cid, session_no, odate, address))
+        self.db.execute_many(self.LINE, [(ono, line_no, line['pid'], line['qty'], line['uprice'])
+                                         for line_no, line in enumerate(lines, 1)])
+        self.db.execute_update(self.CLEAR_CART, (cid, session_no))
+        return lines
@@ -1,10 +1,11 @@
 # Implements all customer functionalities
-from datetime import datetime
+from service import ServiceError
 
 class Customer:
     def __init__(self, db, auth):
         self.db = db
         self.auth = auth
+        self.service = auth.service
     
     def menu(self):
         """Display customer menu"""
@@ -34,70 +35,57 @@ class Customer:
         print("\n=== SEARCH PRODUCTS ===")
         keywords = input("Enter search keywords (space-separated): ").strip()
         
-        if not keywords:
-            print("No keywords provided.")
-            return
-        
-        # Record search in database
-        ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        query = "INSERT INTO search (cid, sessionNo, ts, query) VALUES (?, ?, ?, ?)"
-        self.db.execute_update(query, (self.auth.current_user, self.auth.session_no, ts, keywords))
-        
-        # Split keywords and build query with AND semantics
-        keyword_list = keywords.lower().split()
-        conditions = []
-        params = []
-        
-        for keyword in keyword_list:
-            conditions.append("(LOWER(name) LIKE ? OR LOWER(descr) LIKE ?)")
-            params.extend([f'%{keyword}%', f'%{keyword}%'])
-        
-        query = f"SELECT * FROM products WHERE {' AND '.join(conditions)}"
-        results = self.db.execute_query(query, tuple(params))
-        
-        if not results or len(results) == 0:
-            print("No products found.")
+        # Records the search and fetches results one page (5 rows) at a
+        # time, prefetching the next page
+        try:
+            pager = self.service.search_pager(self.auth.session, keywords, prefetch=True)
+        except ServiceError as e:
+            print(e)
             return
-        
-        # Paginate results (5 per page)
-        self._paginate_products(results)
+        try:
+            if not pager.rows:
+                print("No products found.")
+                return
+            self._paginate_products(pager)
+        finally:
+            pager.close()
     
-    def _paginate_products(self, products):
+    def _paginate_products(self, pager):
         """Display products with pagination"""
-        page = 0
-        per_page = 5
-        total_pages = (len(products) - 1) // per_page + 1
-        
         while True:
-            start = page * per_page
-            end = min(start + per_page, len(products))
-            
-            print(f"\n--- Page {page + 1} of {total_pages} ---")
-            for i in range(start, end):
-                p = products[i]
-                print(f"{i + 1}. [{p['pid']}] {p['name']} - ${p['price']:.2f}")
+            last = "" if pager.has_next else " (last page)"
+            print(f"\n--- Page {pager.page_no + 1}{last} ---")
+            for i, p in enumerate(pager.rows, pager.offset + 1):
+                print(f"{i}. [{p['pid']}] {p['name']} - ${p['price']:.2f}")
                 print(f"   Category: {p['category']} | Stock: {p['stock_count']}")
             
             print("\nOptions: [N]ext, [P]rev, [Select number], [B]ack to menu")
             choice = input("Enter choice: ").strip().lower()
             
-            if choice == 'n' and page < total_pages - 1:
-                page += 1
-            elif choice == 'p' and page > 0:
-                page -= 1
+            if choice == 'n' and pager.has_next:
+                pager.next_page()
+            elif choice == 'p' and pager.page_no > 0:
+                pager.prev_page()
             elif choice == 'b':
                 break
             elif choice.isdigit():
-                idx = int(choice) - 1
-                if 0 <= idx < len(products):
-                    self._view_product_detail(products[idx])
+                idx = int(choice) - 1 - pager.offset
+                if 0 <= idx < len(pager.rows):
+                    self._view_product_detail(pager.rows[idx]['pid'])
                 else:
                     print("Invalid selection.")
             else:
                 print("Invalid option.")
     
-    def _view_product_detail(self, product):
+    def _view_product_detail(self, pid):
         """View detailed product information"""
+        # Fetches the product and records the view
+        try:
+            product = self.service.view_product(self.auth.session, pid)
+        except ServiceError as e:
+            print(e)
+            return
+        
         print("\n=== PRODUCT DETAILS ===")
         print(f"ID: {product['pid']}")
         print(f"Name: {product['name']}")
@@ -106,11 +94,6 @@ class Customer:
         print(f"Stock: {product['stock_count']}")
         print(f"Description: {product['descr']}")
         
-        # Record view in viewedProduct table
-        ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
-        query = "INSERT INTO viewedProduct (cid, sessionNo, ts, pid) VALUES (?, ?, ?, ?)"
-        self.db.execute_update(query, (self.auth.current_user, self.auth.session_no, ts, product['pid']))
-        
         # Option to add to cart
         if product['stock_count'] > 0:
             add = input("\nAdd to cart? (y/n): ").strip().lower()
@@ -121,19 +104,11 @@ class Customer:
     
     def _add_to_cart(self, pid):
         """Add product to cart"""
-        # Check if product already in cart
-        query = "SELECT qty FROM cart WHERE cid = ? AND sessionNo = ? AND pid = ?"
-        result = self.db.execute_query(query, (self.auth.current_user, self.auth.session_no, pid))
-        
-        if result and len(result) > 0:
-            # Update quantity
-            new_qty = result[0]['qty'] + 1
-            query = "UPDATE cart SET qty = ? WHERE cid = ? AND sessionNo = ? AND pid = ?"
-            self.db.execute_update(query, (new_qty, self.auth.current_user, self.auth.session_no, pid))
-        else:
-            # Insert new cart item
-            query = "INSERT INTO cart (cid, sessionNo, pid, qty) VALUES (?, ?, ?, ?)"
-            self.db.execute_update(query, (self.auth.current_user, self.auth.session_no, pid, 1))
+        try:
+            self.service.add_to_cart(self.auth.session, pid)
+        except ServiceError as e:
+            print(e)
+            return
         
         print("Product added to cart!")
     
@@ -141,15 +116,9 @@ class Customer:
         """View and manage shopping cart"""
         print("\n=== SHOPPING CART ===")
         
-        query = """
-            SELECT c.pid, p.name, p.price, p.stock_count, c.qty
-            FROM cart c
-            JOIN products p ON c.pid = p.pid
-            WHERE c.cid = ? AND c.sessionNo = ?
-        """
-        cart_items = self.db.execute_query(query, (self.auth.current_user, self.auth.session_no))
+        cart_items = self.service.cart(self.auth.session)
         
-        if not cart_items or len(cart_items) == 0:
+        if not cart_items:
             print("Your cart is empty.")
             return
         
@@ -184,14 +153,12 @@ class Customer:
                 item = cart_items[idx]
                 new_qty = int(input(f"Enter new quantity (max {item['stock_count']}): "))
                 
-                if new_qty <= 0:
-                    print("Quantity must be positive.")
-                elif new_qty > item['stock_count']:
-                    print(f"Insufficient stock. Available: {item['stock_count']}")
-                else:
-                    query = "UPDATE cart SET qty = ? WHERE cid = ? AND sessionNo = ? AND pid = ?"
-                    self.db.execute_update(query, (new_qty, self.auth.current_user, self.auth.session_no, item['pid']))
-                    print("Cart updated successfully!")
+                try:
+                    self.service.update_cart(self.auth.session, item['pid'], new_qty)
+                except ServiceError as e:
+                    print(e)
+                    return
+                print("Cart updated successfully!")
             else:
                 print("Invalid item number.")
         except ValueError:
@@ -202,9 +169,11 @@ class Customer:
         try:
             idx = int(input("Enter item number to remove: ")) - 1
             if 0 <= idx < len(cart_items):
-                item = cart_items[idx]
-                query = "DELETE FROM cart WHERE cid = ? AND sessionNo = ? AND pid = ?"
-                self.db.execute_update(query, (self.auth.current_user, self.auth.session_no, item['pid']))
+                try:
+                    self.service.remove_from_cart(self.auth.session, cart_items[idx]['pid'])
+                except ServiceError as e:
+                    print(e)
+                    return
                 print("Item removed from cart!")
             else:
                 print("Invalid item number.")
@@ -228,84 +197,53 @@ class Customer:
             print("Order cancelled.")
             return
         
-        # Create order
-        ono = self.db.get_next_id('orders', 'ono')
-        odate = datetime.now().strftime('%Y-%m-%d')
-        
-        query = "INSERT INTO orders (ono, cid, sessionNo, odate, shipping_address) VALUES (?, ?, ?, ?, ?)"
-        if not self.db.execute_update(query, (ono, self.auth.current_user, self.auth.session_no, odate, address)):
-            print("Error creating order.")
+        # Order, order lines, stock and cart changes commit together
+        try:
+            order = self.service.checkout(self.auth.session, address)
+        except ServiceError as e:
+            print(e)
             return
         
-        # Create order lines
-        line_no = 1
-        for item in cart_items:
-            query = "INSERT INTO orderlines (ono, lineNo, pid, qty, uprice) VALUES (?, ?, ?, ?, ?)"
-            self.db.execute_update(query, (ono, line_no, item['pid'], item['qty'], item['price']))
-            line_no += 1
-            
-            # Update stock
-            query = "UPDATE products SET stock_count = stock_count - ? WHERE pid = ?"
-            self.db.execute_update(query, (item['qty'], item['pid']))
-        
-        # Clear cart
-        query = "DELETE FROM cart WHERE cid = ? AND sessionNo = ?"
-        self.db.execute_update(query, (self.auth.current_user, self.auth.session_no))
-        
-        print(f"\nOrder placed successfully! Order number: {ono}")
+        print(f"\nOrder placed successfully! Order number: {order['ono']}")
     
     def view_orders(self):
         """View past orders"""
         print("\n=== MY ORDERS ===")
         
-        query = """
-            SELECT o.ono, o.odate, o.shipping_address,
-                   SUM(ol.qty * ol.uprice) as total
-            FROM orders o
-            JOIN orderlines ol ON o.ono = ol.ono
-            WHERE o.cid = ?
-            GROUP BY o.ono
-            ORDER BY o.odate DESC
-        """
-        orders = self.db.execute_query(query, (self.auth.current_user,))
-        
-        if not orders or len(orders) == 0:
-            print("No orders found.")
-            return
-        
-        # Paginate orders
-        self._paginate_orders(orders)
+        pager = self.service.orders_pager(self.auth.session, prefetch=True)
+        try:
+            if not pager.rows:
+                print("No orders found.")
+                return
+            
+            # Paginate orders
+            self._paginate_orders(pager)
+        finally:
+            pager.close()
     
-    def _paginate_orders(self, orders):
+    def _paginate_orders(self, pager):
         """Display orders with pagination"""
-        page = 0
-        per_page = 5
-        total_pages = (len(orders) - 1) // per_page + 1
-        
         while True:
-            start = page * per_page
-            end = min(start + per_page, len(orders))
-            
-            print(f"\n--- Page {page + 1} of {total_pages} ---")
-            for i in range(start, end):
-                o = orders[i]
-                print(f"{i + 1}. Order #{o['ono']} - {o['odate']}")
+            last = "" if pager.has_next else " (last page)"
+            print(f"\n--- Page {pager.page_no + 1}{last} ---")
+            for i, o in enumerate(pager.rows, pager.offset + 1):
+                print(f"{i}. Order #{o['ono']} - {o['odate']}")
                 print(f"   Address: {o['shipping_address']}")
-                print(f"   Total: ${o['total']:.2f}")
+                print(f"   Total: ${o['total']:.2f} ({o['line_count']} line(s))")
             
             print("\nOptions: [N]ext, [P]rev, [Select number], [B]ack to menu")
             choice = input("Enter choice: ").strip().lower()
             
-            if choice == 'n' and page < total_pages - 1:
-                page += 1
-            elif choice == 'p' and page > 0:
-                page -= 1
+            if choice == 'n' and pager.has_next:
+                pager.next_page()
+            elif choice == 'p' and pager.page_no > 0:
+                pager.prev_page()
             elif choice == 'b':
                 break
             elif choice.isdigit():
-                idx = int(choice) - 1
-                if 0 <= idx < len(orders):
-                    self._view_order_detail(orders[idx]['ono'])
+                idx = int(choice) - 1 - pager.offset
+                if 0 <= idx < len(pager.rows):
+                    self._view_order_detail(pager.rows[idx]['ono'])
                 else:
                     print("Invalid selection.")
             else:
@@ -313,9 +251,12 @@ class Customer:
     
     def _view_order_detail(self, ono):
         """View detailed order information"""
-        # Get order header
-        query = "SELECT ono, odate, shipping_address FROM orders WHERE ono = ?"
-        order = self.db.execute_query(query, (ono,))[0]
+        try:
+            detail = self.service.order_detail(self.auth.session, ono)
+        except ServiceError as e:
+            print(e)
+            return
+        order = detail['order']
         
         print("\n=== ORDER DETAILS ===")
         print(f"Order Number: {order['ono']}")
@@ -323,21 +264,9 @@ class Customer:
         print(f"Shipping Address: {order['shipping_address']}")
         print("\n--- Order Items ---")
         
-        # Get order lines
-        query = """
-            SELECT p.name, p.category, ol.qty, ol.uprice,
-                   (ol.qty * ol.uprice) as line_total
-            FROM orderlines ol
-            JOIN products p ON ol.pid = p.pid
-            WHERE ol.ono = ?
-        """
-        lines = self.db.execute_query(query, (ono,))
-        
-        total = 0
-        for line in lines:
+        for line in detail['lines']:
             print(f"- {line['name']} ({line['category']})")
             print(f"  Qty: {line['qty']} x ${line['uprice']:.2f} = ${line['line_total']:.2f}")
-            total += line['line_total']
         
-        print(f"\n--- Grand Total: ${total:.2f} ---")
-        input("\nPress Enter to continue...")
+        print(f"\n--- Grand Total: ${detail['total']:.2f} ---")
+        input("\nPress Enter to continue...")
\ No newline at end of file
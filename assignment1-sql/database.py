@@ -1,47 +1,255 @@
 # This file handles database connections and common utilities
 import sqlite3
 import sys
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
+from cart_store import CartStore
+from event_log import EventLog
+from id_allocator import IdAllocator
+from product_cache import ProductCache
+from query_stats import QueryStats
+import schema
 
 class Database:
-    def __init__(self, db_name):
-        """Initialize database connection"""
+    def __init__(self, db_name, busy_timeout=5000, wal=True, stats=None, trace=None):
+        """Initialize the connection pool (one sqlite3 connection per thread)
+
+        busy_timeout is how long (in ms) a connection waits on a lock held by
+        another connection before giving up. With wal=True the database runs
+        in WAL journal mode so readers never block behind a writer.
+        stats is the QueryStats that times every execute_query/execute_update
+        call (a default, non-reporting one if omitted). trace, if given, is
+        installed as the sqlite3 trace callback of every connection and is
+        called with the text of each statement SQLite runs.
+        """
+        self.db_name = db_name
+        self.busy_timeout = busy_timeout
+        self.wal = wal
+        self.stats = stats or QueryStats()
+        self.trace = trace
+        self._local = threading.local()
+        self._pool_lock = threading.Lock()
+        self._connections = []
+        # In-memory databases are private to a connection, so every thread
+        # has to share the one connection instead of opening its own
+        self._shared = db_name == ':memory:'
+        self.ids = IdAllocator(self)
+        self.events = EventLog(self)
+        self.products = ProductCache(self)
+        self.carts = CartStore(self)
         try:
-            self.conn = sqlite3.connect(db_name)
-            self.conn.row_factory = sqlite3.Row  # Access columns by name
-            self.cursor = self.conn.cursor()
+            self._open_connection()
+            # Indexes, triggers and helper tables the application relies on
+            self.features = schema.install(self.conn)
         except sqlite3.Error as e:
             print(f"Database connection error: {e}")
             sys.exit(1)
-    
+
+    def _open_connection(self):
+        """Open and configure a connection for the calling thread"""
+        with self._pool_lock:
+            if self._shared and self._connections:
+                conn = self._connections[0]
+            else:
+                # Autocommit mode: transaction() issues BEGIN/COMMIT itself
+                conn = sqlite3.connect(self.db_name, timeout=self.busy_timeout / 1000,
+                                       isolation_level=None, check_same_thread=False)
+                conn.row_factory = sqlite3.Row  # Access columns by name
+                conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+                if self.wal and not self._shared:
+                    conn.execute("PRAGMA journal_mode = WAL")
+                if self.trace is not None:
+                    conn.set_trace_callback(self.trace)
+                self._connections.append(conn)
+        self._local.conn = conn
+        self._local.cursor = conn.cursor()
+        self._local.depth = 0
+        return conn
+
+    @property
+    def conn(self):
+        """Connection owned by the calling thread"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open_connection()
+        return conn
+
+    @property
+    def cursor(self):
+        """Cursor on the calling thread's connection"""
+        if getattr(self._local, 'conn', None) is None:
+            self._open_connection()
+        return self._local.cursor
+
     def execute_query(self, query, params=()):
         """Execute a query with parameterized inputs (prevents SQL injection)"""
+        start = time.perf_counter()
         try:
-            self.cursor.execute(query, params)
-            return self.cursor.fetchall()
+            cursor = self.cursor
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
         except sqlite3.Error as e:
+            self.stats.record(query, time.perf_counter() - start, error=True)
             print(f"Query execution error: {e}")
             return None
-    
+        self.stats.record(query, time.perf_counter() - start, len(rows))
+        return rows
+
     def execute_update(self, query, params=()):
-        """Execute INSERT, UPDATE, DELETE queries"""
+        """Execute INSERT, UPDATE, DELETE queries
+
+        Outside a transaction each statement commits on its own. Inside
+        transaction() nothing is committed until the block ends, and an error
+        is re-raised so the whole block rolls back.
+        """
+        conn = self.conn
+        start = time.perf_counter()
         try:
-            self.cursor.execute(query, params)
-            self.conn.commit()
+            cursor = self.cursor
+            cursor.execute(query, params)
+            if not self.in_transaction():
+                conn.commit()
+            self.stats.record(query, time.perf_counter() - start, cursor.rowcount)
             return True
         except sqlite3.Error as e:
+            self.stats.record(query, time.perf_counter() - start, error=True)
             print(f"Update error: {e}")
-            self.conn.rollback()
+            if self.in_transaction():
+                raise
+            conn.rollback()
             return False
-    
+
+    def execute_many(self, query, seq_of_params):
+        """Execute an INSERT, UPDATE or DELETE once per parameter tuple
+
+        Returns the number of rows changed. Unlike execute_update, errors
+        (including ones raised while iterating seq_of_params) are re-raised
+        for the caller to handle; outside a transaction() block the rows
+        commit, or roll back, together.
+        """
+        conn = self.conn
+        start = time.perf_counter()
+        try:
+            rows = conn.executemany(query, seq_of_params).rowcount
+            if not self.in_transaction():
+                conn.commit()
+        except Exception:
+            self.stats.record(query, time.perf_counter() - start, error=True)
+            if not self.in_transaction():
+                conn.rollback()
+            raise
+        self.stats.record(query, time.perf_counter() - start, rows)
+        return rows
+
+    def in_transaction(self):
+        """True if the calling thread is inside a transaction() block"""
+        return getattr(self._local, 'depth', 0) > 0
+
+    @contextmanager
+    def transaction(self):
+        """Run a block of statements as one atomic, single-commit unit
+
+        Usage:
+            with db.transaction():
+                db.execute_update(...)
+                db.execute_update(...)
+
+        The outermost block opens a BEGIN IMMEDIATE transaction (taking the
+        write lock up front so concurrent writers queue on busy_timeout rather
+        than deadlocking) and commits when the block exits. Nested blocks
+        become savepoints, so a failing inner block only undoes its own work.
+        Any exception rolls the block back and is re-raised.
+        """
+        conn = self.conn
+        depth = self._local.depth
+        savepoint = f"sp_{depth}"
+        conn.execute("BEGIN IMMEDIATE" if depth == 0 else f"SAVEPOINT {savepoint}")
+        self._local.depth = depth + 1
+        try:
+            yield self
+        except BaseException:
+            self._local.depth = depth
+            if depth == 0:
+                conn.execute("ROLLBACK")
+            else:
+                conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+            raise
+        self._local.depth = depth
+        if depth > 0:
+            conn.execute(f"RELEASE {savepoint}")
+            return
+        try:
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+    def top_n_query(self, source, metric, n, params=(), dense=False,
+                    tiebreak=None, min_value=None):
+        """Build (sql, params) for top_n_with_ties()"""
+        rank = 'DENSE_RANK' if dense else 'RANK'
+        distinct = 'DISTINCT ' if dense else ''
+        order = 'rank_no' + (f', {tiebreak}' if tiebreak else '')
+        floor = min_value if min_value is not None else float('-inf')
+        # The n-th highest (distinct, for DENSE_RANK) metric value is a
+        # constant cutoff, so 'metric >= cutoff' is an index range on the
+        # source and only the tied top rows are ranked and returned
+        query = f"""
+            SELECT * FROM (
+              SELECT src.*, {rank}() OVER (ORDER BY src.{metric} DESC) AS rank_no
+              FROM ({source}) src
+              WHERE src.{metric} >= COALESCE((
+                  SELECT {distinct}cut.{metric} FROM ({source}) cut
+                  WHERE cut.{metric} >= ?
+                  ORDER BY cut.{metric} DESC LIMIT 1 OFFSET ?), ?)
+            )
+            WHERE rank_no <= ?
+            ORDER BY {order}
+        """
+        params = tuple(params)
+        return query, params + params + (floor, n - 1, floor, n)
+
+    def top_n_with_ties(self, source, metric, n, params=(), dense=False,
+                        tiebreak=None, min_value=None):
+        """Return the rows of 'source' in the top n by 'metric', keeping ties
+
+        source is a SELECT returning a 'metric' column. With RANK (default)
+        the result is the first n rows plus every row tied with the n-th;
+        with dense=True it is every row holding one of the n highest
+        distinct values. Rows get a rank_no column and are ordered by it,
+        then by tiebreak. Rows below min_value are never ranked. Only the
+        qualifying rows are returned from SQLite.
+        """
+        return self.execute_query(*self.top_n_query(source, metric, n, params, dense,
+                                                    tiebreak, min_value))
+
     def get_next_id(self, table, id_column):
-        """Generate next ID for a table"""
-        query = f"SELECT MAX({id_column}) as max_id FROM {table}"
-        result = self.execute_query(query)
-        if result and result[0]['max_id']:
-            return result[0]['max_id'] + 1
-        return 1
-    
+        """Generate next ID for a table (see IdAllocator)"""
+        return self.ids.next_id(table, id_column)
+
+    def release_connection(self):
+        """Close the calling thread's connection (call before a worker thread exits)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._shared:
+            return
+        with self._pool_lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        self._local.conn = None
+        self._local.cursor = None
+        conn.close()
+
     def close(self):
-        """Close database connection"""
-        self.conn.close()
\ No newline at end of file
+        """Flush buffered carts and events, close every connection and export stats"""
+        self.carts.close()
+        self.events.close()
+        self.ids.close()
+        self.stats.close()
+        with self._pool_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
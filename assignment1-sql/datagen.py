@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Synthetic data generator and bulk loader for the prj-tables.sql schema
+
+Generates users, customers, products, sessions, product views, searches,
+carts, orders and order lines for any number of customers, with the skew
+of a real shop: a few products get most of the views and sales, a few
+customers most of the sessions, and activity is heavier on recent days.
+Every foreign key points at a generated row.
+
+Rows are streamed into the base tables with executemany in large
+transactions while the tables have no secondary indexes or triggers;
+schema.install() then builds the indexes, the full-text index and the
+derived tables once over the loaded data.
+
+Usage: python datagen.py <database_file> [--customers N] [--products N]
+                         [--days N] [--seed N] [--batch N]
+The database file is recreated from prj-tables.sql.
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import schema
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prj-tables.sql')
+
+ADJECTIVES = ['gaming', 'wireless', 'organic', 'premium', 'compact', 'portable',
+              'classic', 'deluxe', 'smart', 'ergonomic', 'vintage', 'heavy duty',
+              'ultra', 'eco', 'mini', 'pro']
+# noun -> category
+NOUNS = {
+    'laptop': 'Electronics', 'mouse': 'Electronics', 'keyboard': 'Electronics',
+    'monitor': 'Electronics', 'headset': 'Electronics', 'pc': 'Electronics',
+    'cable': 'Accessories', 'bag': 'Accessories', 'card holder': 'Accessories',
+    'desk': 'Office', 'lamp': 'Office', 'chair': 'Office', 'notebook': 'Office',
+    'soap': 'Bath & Body', 'cream': 'Beauty', 'lotion': 'Bath & Body',
+    'coffee': 'Groceries', 'tea': 'Groceries', 'snack box': 'Groceries',
+    'gift cards': 'Gift Items', 'playing cards': 'Games', 'puzzle': 'Games',
+}
+USES = ['everyday use', 'the office', 'travel', 'gamers', 'students', 'the kitchen',
+        'sensitive skin', 'gifting', 'outdoor use']
+FIRST_NAMES = ['Ada', 'Ben', 'Chidi', 'Dana', 'Eli', 'Fatima', 'Gus', 'Hana', 'Ivan',
+               'Jia', 'Kofi', 'Lena', 'Mateo', 'Nia', 'Omar', 'Priya', 'Quinn', 'Rosa',
+               'Sam', 'Tariq', 'Uma', 'Vik', 'Wen', 'Yusuf', 'Zoe']
+LAST_NAMES = ['Adams', 'Bauer', 'Chen', 'Diaz', 'Eze', 'Fischer', 'Garcia', 'Haddad',
+              'Ito', 'Jensen', 'Kim', 'Lopez', 'Moreau', 'Nguyen', 'Okafor', 'Patel',
+              'Rossi', 'Singh', 'Tanaka', 'Walker']
+
+# Shape of the generated activity
+SESSION_SKEW = 1.5        # Pareto alpha of sessions per customer (mean 3)
+MAX_SESSIONS = 200
+VIEWS_PER_SESSION = 5.0   # mean, exponentially distributed
+SEARCHES_PER_SESSION = 1.5
+ORDER_RATE = 0.25         # chance a session places an order
+LINES_PER_ORDER = (1, 4)
+OPEN_CART_RATE = 0.1      # chance a customer's last session left items in the cart
+PRODUCT_SKEW = 1.1        # Zipf exponent of product popularity
+SALES_PER_CUSTOMERS = 1000
+
+
+class ZipfSampler:
+    """Draw items with probability proportional to 1 / rank**s
+
+    Items are shuffled before ranking so that popularity does not follow
+    their id order.
+    """
+
+    def __init__(self, items, s, rng):
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.rng = rng
+        self.cum_weights = []
+        total = 0.0
+        for rank in range(1, len(self.items) + 1):
+            total += rank ** -s
+            self.cum_weights.append(total)
+
+    def sample(self, k):
+        return self.rng.choices(self.items, cum_weights=self.cum_weights, k=k)
+
+    def sample_distinct(self, k):
+        """Up to k distinct items (fewer if the draws keep repeating)"""
+        return list(dict.fromkeys(self.sample(k * 2)))[:k]
+
+
+class BulkLoader:
+    """Buffer rows per table and write them with executemany
+
+    Each table's buffer is written once it holds batch_size rows, and the
+    open transaction is committed every commit_rows rows, so a load of
+    millions of rows is a few hundred statements and a handful of commits.
+    """
+
+    def __init__(self, conn, batch_size=50000, commit_rows=1000000):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.commit_rows = commit_rows
+        self.buffers = {}
+        self.counts = {}
+        self._uncommitted = 0
+        self.conn.execute("BEGIN")
+
+    def add(self, table, row):
+        buffer = self.buffers.setdefault(table, [])
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self.flush(table)
+
+    def flush(self, table):
+        rows = self.buffers.get(table)
+        if not rows:
+            return
+        placeholders = ', '.join('?' * len(rows[0]))
+        self.conn.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+        self.counts[table] = self.counts.get(table, 0) + len(rows)
+        self._uncommitted += len(rows)
+        self.buffers[table] = []
+        if self._uncommitted >= self.commit_rows:
+            self.conn.execute("COMMIT")
+            self.conn.execute("BEGIN")
+            self._uncommitted = 0
+
+    def close(self):
+        """Write every remaining row and commit; returns rows loaded per table"""
+        for table in list(self.buffers):
+            self.flush(table)
+        self.conn.execute("COMMIT")
+        return self.counts
+
+
+def _products(rng, count):
+    """Yield (pid, name, category, price, stock_count, descr) rows"""
+    nouns = list(NOUNS)
+    for pid in range(1, count + 1):
+        adjective = rng.choice(ADJECTIVES)
+        noun = rng.choice(nouns)
+        price = round(max(0.99, rng.lognormvariate(3.2, 0.9)), 2)
+        stock = 0 if rng.random() < 0.05 else rng.randint(1, 500)
+        yield (pid, f"{adjective.title()} {noun.title()} {pid}", NOUNS[noun], price, stock,
+               f"{adjective.capitalize()} {noun} for {rng.choice(USES)}")
+
+
+def generate_rows(loader, rng, customers, products, days, now):
+    """Generate every table's rows into loader"""
+    prices = [0.0]
+    for row in _products(rng, products):
+        prices.append(row[3])
+        loader.add('products', row)
+    popular = ZipfSampler(range(1, products + 1), PRODUCT_SKEW, rng)
+    words = ADJECTIVES + list(NOUNS)
+
+    sales = max(1, customers // SALES_PER_CUSTOMERS)
+    for uid in range(customers + 1, customers + sales + 1):
+        loader.add('users', (uid, 'pw', 'sales'))
+
+    session_no = 0
+    ono = 0
+    for cid in range(1, customers + 1):
+        loader.add('users', (cid, 'pw', 'customer'))
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        loader.add('customers', (cid, f"{first} {last}",
+                                 f"{first.lower()}.{last.lower()}{cid}@example.com"))
+
+        sessions = min(MAX_SESSIONS, int(rng.paretovariate(SESSION_SKEW)))
+        for s in range(sessions):
+            session_no += 1
+            # Squaring a uniform draw puts more sessions on recent days
+            start = now - timedelta(days=days * rng.random() ** 2,
+                                    seconds=rng.randint(0, 86399))
+            length = rng.randint(120, 3600)
+            loader.add('sessions', (cid, session_no, start.strftime('%Y-%m-%d %H:%M:%S'),
+                                    (start + timedelta(seconds=length)).strftime('%Y-%m-%d %H:%M:%S')))
+
+            # Events happen at distinct seconds within the session
+            views = int(rng.expovariate(1 / VIEWS_PER_SESSION))
+            searches = int(rng.expovariate(1 / SEARCHES_PER_SESSION))
+            offsets = rng.sample(range(length), min(length, views + searches))
+            viewed = popular.sample(views)
+            for pid, offset in zip(viewed, offsets[:views]):
+                ts = start + timedelta(seconds=offset, microseconds=rng.randint(0, 999999))
+                loader.add('viewedProduct', (cid, session_no, ts.strftime('%Y-%m-%d %H:%M:%S.%f'), pid))
+            for offset in offsets[views:]:
+                ts = start + timedelta(seconds=offset)
+                query = ' '.join(rng.sample(words, rng.choice((1, 1, 2))))
+                loader.add('search', (cid, session_no, ts.strftime('%Y-%m-%d %H:%M:%S'), query))
+
+            if rng.random() < ORDER_RATE:
+                ono += 1
+                loader.add('orders', (ono, cid, session_no, start.strftime('%Y-%m-%d'),
+                                      f"{rng.randint(1, 9999)} {rng.choice(LAST_NAMES)} St"))
+                # Mostly products viewed in the session, topped up with popular ones
+                lines = rng.randint(*LINES_PER_ORDER)
+                pids = list(dict.fromkeys(viewed[:lines] + popular.sample_distinct(lines)))[:lines]
+                for line_no, pid in enumerate(pids, 1):
+                    loader.add('orderlines', (ono, line_no, pid, rng.randint(1, 3), prices[pid]))
+
+            if s == sessions - 1 and rng.random() < OPEN_CART_RATE:
+                for pid in popular.sample_distinct(rng.randint(1, 3)):
+                    loader.add('cart', (cid, session_no, pid, rng.randint(1, 2)))
+
+
+def generate(path, customers=10000, products=None, days=365, seed=291,
+             batch_size=50000, verbose=False):
+    """Create 'path' from prj-tables.sql and fill it; returns rows loaded per table"""
+    products = products or customers * 2
+    rng = random.Random(seed)
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    conn = sqlite3.connect(path, isolation_level=None)
+    with open(SCHEMA_FILE) as f:
+        conn.executescript(f.read())
+    # The file is being built from scratch: nothing to protect until the load is done
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    # Defer secondary indexes (none exist yet on a fresh schema, but be explicit)
+    schema.drop_indexes(conn)
+
+    start = time.perf_counter()
+    loader = BulkLoader(conn, batch_size)
+    generate_rows(loader, rng, customers, products, days, datetime.now())
+    counts = loader.close()
+    loaded = time.perf_counter() - start
+    if verbose:
+        total = sum(counts.values())
+        print(f"Loaded {total:,} rows in {loaded:.1f}s ({total / loaded:,.0f} rows/s)")
+        for table, count in counts.items():
+            print(f"  {table:<14}{count:>12,}")
+
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.execute("PRAGMA synchronous = FULL")
+    start = time.perf_counter()
+    features = schema.install(conn)
+    conn.execute("ANALYZE")
+    conn.close()
+    if verbose:
+        print(f"Built indexes and {', '.join(sorted(features))} in "
+              f"{time.perf_counter() - start:.1f}s")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic shop database")
+    parser.add_argument('database_file', help="database to (re)create")
+    parser.add_argument('--customers', type=int, default=10000)
+    parser.add_argument('--products', type=int, help="default: 2 per customer")
+    parser.add_argument('--days', type=int, default=365, help="history length (default 365)")
+    parser.add_argument('--seed', type=int, default=291)
+    parser.add_argument('--batch', type=int, default=50000, help="rows per executemany")
+    args = parser.parse_args()
+
+    generate(args.database_file, args.customers, args.products, args.days, args.seed,
+             args.batch, verbose=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -134,20 +134,20 @@ CREATE TABLE orders (
       shipping_address text,
       foreign key (cid, sessionNo) references sessions(cid, sessionNo)
     );
-INSERT INTO orders VALUES (1, 1, 2, date('now', '-6 months', '-2 hours'), '37496 Paul Keys Suite 670, Michelletown, NV 90697');
-INSERT INTO orders VALUES (2, 1, 1, date('now', '-5 months', '-5 days', '-2 hours'), '9653 Martin Motorway Suite 101, Richardbury, NV 33283');
-INSERT INTO orders VALUES (3, 1, 1, date('now', '-17 days'), '91976 Stephanie Road, Brownstad, MN 37133');  -- October
-INSERT INTO orders VALUES (4, 1, 2, date('now', '-4 months', '-2 hours'), '0908 Chris Islands, Michelletown, WY 63636');
-INSERT INTO orders VALUES (5, 1, 1, date('now', '-16 days', '-2 hours'), '34477 Randy Turnpike Apt. 060, Lake Jenniferview, PR 60126');
-INSERT INTO orders VALUES (6, 1, 2, date('now', '-5 months', '-2 hours'), '05441 Frank Oval, Stephenland, KS 83584');
-INSERT INTO orders VALUES (7, 1, 1, date('now', '-7 months', '-2 hours'), '79445 Summer Mountains, Brittanychester, WV 04543');
-INSERT INTO orders VALUES (8, 1, 2, date('now', '-5 months', '-2 hours'), 'USCGC Mann, FPO AE 08086');
-INSERT INTO orders VALUES (9, 3, 1, date('now', '-8 months', '-2 hours'), '9490 Richard Squares, Hicksborough, MT 49592');
-INSERT INTO orders VALUES (10, 3, 1, date('now', '-2 months', '-2 hours'), '47832 Watson Mission, Wrightview, MP 72010');
-INSERT INTO orders VALUES (11, 1, 4, date('now', '-1 day'), '12345 109 St NW, Edmonton, AB');
-INSERT INTO orders VALUES (21, 1, 1, date('now', '-3 days'), '9999 Test Order Street');
-INSERT INTO orders VALUES (22, 3, 1, date('now', '-3 days'), '2222 Second Customer Ave');
-INSERT INTO orders VALUES (23, 1, 8, date('now', '-2 days'), '123 house');
+INSERT INTO orders (ono, cid, sessionNo, odate, shipping_address) VALUES (1, 1, 2, date('now', '-6 months', '-2 hours'), '37496 Paul Keys Suite 670, Michelletown, NV 90697');
+INSERT INTO orders (ono, cid, sessionNo, odate, shipping_address) VALUES (2, 1, 1, date('now', '-5 months', '-5 days', '-2 hours'), '9653 Martin Motorway Suite 101, Richardbury, NV 33283');
+INSERT INTO orders (ono, cid, sessionNo, odate, shipping_address) VALUES (3, 1, 1, date('now', '-17 days'), '91976 Stephanie Road, Brownstad, MN 37133');  -- October
+INSERT INTO orders (ono, cid, sessionNo, odate, shipping_address) VALUES (4, 1, 2, date('now', '-4 months', '-2 hours'), '0908 Chris Islands, Michelletown, WY 63636');
+INSERT INTO orders (ono, cid, sessionNo, odate, shipping_address) VALUES (5, 1, 1, date('now', '-16 days', '-2 hours'), '34477 Randy Turnpike Apt. 060, Lake Jenniferview, PR 60126');
+INSERT INTO orders (ono, cid, sessionNo, odate, shipping_address) VALUES (6, 1, 2, date('now', '-5 months', '-2 hours'), '05441 Frank Oval, Stephenland, KS 83584');
+INSERT INTO orders (ono, cid, sessionNo, odate, shipping_address) VALUES (7, 1, 1, date('now', '-7 months', '-2 hours'), '79445 Summer Mountains, Brittanychester, WV 04543');
+INSERT INTO orders (ono, cid, sessionNo, odate, shipping_address) VALUES (8, 1, 2, date('now', '-5 months', '-2 hours'), 'USCGC Mann, FPO AE 08086');
+INSERT INTO orders (ono, cid, sessionNo, odate, shipping_address) VALUES (9, 3, 1, date('now', '-8 months', '-2 hours'), '9490 Richard Squares, Hicksborough, MT 49592');
+INSERT INTO orders (ono, cid, sessionNo, odate, shipping_address) VALUES (10, 3, 1, date('now', '-2 months', '-2 hours'), '47832 Watson Mission, Wrightview, MP 72010');
+INSERT INTO orders (ono, cid, sessionNo, odate, shipping_address) VALUES (11, 1, 4, date('now', '-1 day'), '12345 109 St NW, Edmonton, AB');
+INSERT INTO orders (ono, cid, sessionNo, odate, shipping_address) VALUES (21, 1, 1, date('now', '-3 days'), '9999 Test Order Street');
+INSERT INTO orders (ono, cid, sessionNo, odate, shipping_address) VALUES (22, 3, 1, date('now', '-3 days'), '2222 Second Customer Ave');
+INSERT INTO orders (ono, cid, sessionNo, odate, shipping_address) VALUES (23, 1, 8, date('now', '-2 days'), '123 house');
 
 CREATE TABLE orderlines (
       ono int,
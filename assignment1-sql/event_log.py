@@ -0,0 +1,107 @@
+# Write-behind buffer for search and product-view logging
+import atexit
+import sqlite3
+import threading
+
+class EventLog:
+    """Queue search/viewedProduct rows in memory and write them in batches
+
+    Logging a search or a product view used to be an INSERT plus a commit
+    (an fsync) on the interactive path. Here rows are appended to an
+    in-memory queue and written with one executemany per table inside a
+    single transaction once max_rows are queued or flush_interval seconds
+    have passed, whichever comes first. Call flush() at logout; close()
+    (also run at interpreter exit) flushes whatever is left.
+    """
+
+    TABLES = {
+        # Two events with the same (cid, sessionNo, ts) key would fail the
+        # whole batch, so a duplicate is dropped like a failed single insert was
+        'search': "INSERT OR IGNORE INTO search (cid, sessionNo, ts, query) VALUES (?, ?, ?, ?)",
+        'viewedProduct': "INSERT OR IGNORE INTO viewedProduct (cid, sessionNo, ts, pid) VALUES (?, ?, ?, ?)",
+    }
+
+    def __init__(self, db, max_rows=50, flush_interval=2.0):
+        self.db = db
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._queued = {table: [] for table in self.TABLES}
+        self._count = 0
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._flusher = None
+        atexit.register(self.close)
+
+    def log_search(self, cid, session_no, ts, query):
+        """Queue a row for the search table"""
+        self._append('search', (cid, session_no, ts, query))
+
+    def log_view(self, cid, session_no, ts, pid):
+        """Queue a row for the viewedProduct table"""
+        self._append('viewedProduct', (cid, session_no, ts, pid))
+
+    def _append(self, table, row):
+        with self._lock:
+            self._queued[table].append(row)
+            self._count += 1
+            full = self._count >= self.max_rows
+            if self._flusher is None and not self._stopped.is_set():
+                self._flusher = threading.Thread(target=self._run, name='event-log-flusher',
+                                                 daemon=True)
+                self._flusher.start()
+        if full:
+            self._wakeup.set()
+
+    def _run(self):
+        """Background thread: flush on the timer or when the queue fills"""
+        try:
+            while not self._stopped.is_set():
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                self.flush()
+        finally:
+            self.db.release_connection()
+
+    def pending(self):
+        """Number of rows waiting to be written"""
+        with self._lock:
+            return self._count
+
+    def flush(self):
+        """Write every queued row in one transaction; returns rows written"""
+        with self._flush_lock:
+            with self._lock:
+                batches, self._queued = self._queued, {table: [] for table in self.TABLES}
+                count, self._count = self._count, 0
+            if count == 0:
+                return 0
+            try:
+                with self.db.transaction():
+                    for table, rows in batches.items():
+                        if rows:
+                            self.db.execute_many(self.TABLES[table], rows)
+            except sqlite3.OperationalError as e:
+                # Locked or busy: put the rows back so the next flush retries them
+                print(f"Event log flush error: {e}")
+                with self._lock:
+                    for table, rows in batches.items():
+                        self._queued[table][:0] = rows
+                    self._count += count
+                return 0
+            except sqlite3.Error as e:
+                print(f"Event log flush error: {e}")
+                return 0
+            return count
+
+    def close(self):
+        """Stop the background flusher and write the remaining rows"""
+        # Let go of the exit hook, which would keep this log alive until exit
+        atexit.unregister(self.close)
+        self._stopped.set()
+        self._wakeup.set()
+        flusher, self._flusher = self._flusher, None
+        if flusher is not None and flusher is not threading.current_thread():
+            flusher.join()
+        self.flush()
@@ -1,17 +1,7 @@
 #!/usr/bin/env python3
 import sqlite3
 
-conn = sqlite3.connect('prj-test.db')
-cursor = conn.cursor()
-
-# Clear existing products first (optional)
-print("Clearing existing products...")
-cursor.execute("DELETE FROM products")
-conn.commit()
-
-print("Inserting products...")
-
-products = [
+PRODUCTS = [
     (1, 'Luxury Hand Soap', 'Bath & Body', 5.99, 100, 'Premium hand soap with moisturizing cream'),
     (2, 'Face Cream Moisturizer', 'Beauty', 24.99, 50, 'Anti-aging face cream for all skin types'),
     (3, 'Organic Food Basket', 'Groceries', 49.99, 25, 'Fresh organic food items delivered daily'),
@@ -29,33 +19,58 @@ products = [
     (15, 'Baby Cream', 'Baby Care', 12.99, 70, 'Gentle baby cream for sensitive skin')
 ]
 
-for p in products:
-    cursor.execute(
-        'INSERT INTO products (pid, name, category, price, stock_count, descr) VALUES (?, ?, ?, ?, ?, ?)',
-        p
-    )
-    print(f"  ✓ {p[1]}")
-
-# THIS IS CRITICAL - COMMIT THE TRANSACTION
-conn.commit()
-print(f"\n✓ Committed {len(products)} products to database")
-
-# Verify
-cursor.execute("SELECT COUNT(*) FROM products")
-count = cursor.fetchone()[0]
-print(f"✓ Verification: {count} products now in database")
-
-# Show samples
-cursor.execute("SELECT pid, name FROM products LIMIT 5")
-print("\nFirst 5 products:")
-for row in cursor.fetchall():
-    print(f"  [{row[0]}] {row[1]}")
-
-# Add salesperson
-cursor.execute("DELETE FROM users WHERE uid = 100")
-cursor.execute("INSERT INTO users (uid, pwd, role) VALUES (100, 'sales123', 'sales')")
-conn.commit()
-print("\n✓ Added salesperson (ID: 100, Password: sales123)")
-
-conn.close()
-print("\n✓ Database closed. Ready to use!")
\ No newline at end of file
+
+def insert_products(conn, verbose=False):
+    """Replace all products with PRODUCTS and add salesperson 100 (commits)"""
+    cursor = conn.cursor()
+
+    # Clear existing products first (optional)
+    if verbose:
+        print("Clearing existing products...")
+    cursor.execute("DELETE FROM products")
+    conn.commit()
+
+    if verbose:
+        print("Inserting products...")
+    for p in PRODUCTS:
+        cursor.execute(
+            'INSERT INTO products (pid, name, category, price, stock_count, descr) VALUES (?, ?, ?, ?, ?, ?)',
+            p
+        )
+        if verbose:
+            print(f"  ✓ {p[1]}")
+
+    # THIS IS CRITICAL - COMMIT THE TRANSACTION
+    conn.commit()
+    if verbose:
+        print(f"\n✓ Committed {len(PRODUCTS)} products to database")
+
+    # Add salesperson
+    cursor.execute("DELETE FROM users WHERE uid = 100")
+    cursor.execute("INSERT INTO users (uid, pwd, role) VALUES (100, 'sales123', 'sales')")
+    conn.commit()
+    if verbose:
+        print("\n✓ Added salesperson (ID: 100, Password: sales123)")
+
+
+def main():
+    conn = sqlite3.connect('prj-test.db')
+    insert_products(conn, verbose=True)
+    cursor = conn.cursor()
+
+    # Verify
+    cursor.execute("SELECT COUNT(*) FROM products")
+    count = cursor.fetchone()[0]
+    print(f"✓ Verification: {count} products now in database")
+
+    # Show samples
+    cursor.execute("SELECT pid, name FROM products LIMIT 5")
+    print("\nFirst 5 products:")
+    for row in cursor.fetchall():
+        print(f"  [{row[0]}] {row[1]}")
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
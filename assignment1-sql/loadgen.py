@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Concurrent customer load generator
+
+Simulates N customers shopping at once. Each customer logs in and runs
+visits (search, look at a few results, sometimes add one to the cart and
+check out, now and then open the order history) until the time is up,
+then logs out. Prints p50/p95/p99 latency per operation and the overall
+throughput.
+
+The customers call the ShopService in-process (one pooled connection per
+customer thread), or a running server.py with --url. Without a database
+file a scratch copy of the prj-tables.sql schema is seeded first.
+
+Usage: python loadgen.py [database_file] [--url URL] [--customers N]
+                         [--seconds S] [--scale N] [--think MS]
+                         [--cart-mode memory|db]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+from database import Database
+from datagen import generate
+from service import ShopService, ServiceError
+
+# Chance of each step within a visit
+VIEW_RESULTS = (1, 3)      # results viewed per search (min, max)
+ADD_TO_CART = 0.4          # per viewed product
+CHECKOUT = 0.3             # per visit, if the cart is not empty
+ORDER_HISTORY = 0.1        # per visit
+VISITS_PER_LOGIN = (3, 8)  # visits before logging out and back in
+
+OPERATIONS = ['login', 'search', 'view_product', 'add_to_cart', 'checkout',
+              'orders', 'logout']
+
+
+class ServiceClient:
+    """A customer calling the ShopService directly"""
+
+    def __init__(self, service):
+        self.service = service
+        self.session = None
+
+    def login(self, uid, pwd):
+        self.session = self.service.login(uid, pwd)
+        return self.session
+
+    def call(self, operation, **params):
+        return getattr(self.service, operation)(self.session, **params)
+
+    def close(self):
+        self.service.db.release_connection()
+
+
+class HttpClient:
+    """A customer calling server.py over one keep-alive HTTP connection"""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.conn = http.client.HTTPConnection(parts.hostname, parts.port or 80)
+        self.prefix = parts.path.rstrip('/') or '/api'
+        self.token = None
+
+    def _post(self, operation, params):
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        self.conn.request('POST', f'{self.prefix}/{operation}', json.dumps(params), headers)
+        response = self.conn.getresponse()
+        body = json.loads(response.read() or b'{}')
+        if response.status == 400:
+            raise ServiceError(body.get('error'))
+        if response.status != 200:
+            raise RuntimeError(f"{operation}: HTTP {response.status} {body.get('error')}")
+        return body['result']
+
+    def login(self, uid, pwd):
+        self.token = self._post('login', {'uid': uid, 'pwd': pwd})['token']
+        return self.token
+
+    def call(self, operation, **params):
+        return self._post(operation, params)
+
+    def close(self):
+        self.conn.close()
+
+
+class Recorder:
+    """Per-thread operation latencies (seconds) and error counts"""
+
+    def __init__(self):
+        self.latencies = {op: [] for op in OPERATIONS}
+        self.errors = {op: 0 for op in OPERATIONS}
+
+    def timed(self, operation, call, *args, **kwargs):
+        """Run call, recording its latency; returns (succeeded, result)"""
+        start = time.perf_counter()
+        try:
+            result = call(*args, **kwargs)
+        except (ServiceError, RuntimeError, OSError):
+            self.errors[operation] += 1
+            return False, None
+        self.latencies[operation].append(time.perf_counter() - start)
+        return True, result
+
+    def merge(self, other):
+        for op in OPERATIONS:
+            self.latencies[op].extend(other.latencies[op])
+            self.errors[op] += other.errors[op]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def shop(client, rec, rng, uid, pwd, keywords, deadline, think):
+    """One customer: log in, run visits until the deadline, log out"""
+    while time.perf_counter() < deadline:
+        if not rec.timed('login', client.login, uid, pwd)[0]:
+            return
+        cart_items = 0
+        for _ in range(rng.randint(*VISITS_PER_LOGIN)):
+            if time.perf_counter() >= deadline:
+                break
+            words = ' '.join(rng.sample(keywords, rng.choice((1, 1, 2))))
+            _, page = rec.timed('search', client.call, 'search', keywords=words)
+            time.sleep(think)
+            rows = page['rows'] if page else []
+            for row in rng.sample(rows, min(len(rows), rng.randint(*VIEW_RESULTS))):
+                _, product = rec.timed('view_product', client.call, 'view_product', pid=row['pid'])
+                time.sleep(think)
+                if product and product['stock_count'] > 0 and rng.random() < ADD_TO_CART:
+                    if rec.timed('add_to_cart', client.call, 'add_to_cart', pid=row['pid'])[0]:
+                        cart_items += 1
+            if cart_items and rng.random() < CHECKOUT:
+                rec.timed('checkout', client.call, 'checkout', address=f'{uid} Load Test Ave')
+                cart_items = 0
+            if rng.random() < ORDER_HISTORY:
+                rec.timed('orders', client.call, 'orders')
+        rec.timed('logout', client.call, 'logout')
+
+
+def run(make_client, customers, seconds, think, keywords):
+    """Run the customers concurrently; returns (merged Recorder, elapsed seconds)"""
+    total = Recorder()
+    total_lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(index):
+        rng = random.Random(index)
+        rec = Recorder()
+        client = make_client()
+        uid, pwd = customers[index]
+        try:
+            shop(client, rec, rng, uid, pwd, keywords, deadline, think)
+        finally:
+            client.close()
+            with total_lock:
+                total.merge(rec)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(customers))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return total, time.perf_counter() - start
+
+
+def load_customers(path, count, seed=291):
+    """Pick 'count' distinct customer logins and a keyword pool from the database"""
+    db = Database(path)
+    try:
+        users = db.execute_query("SELECT uid, pwd FROM users WHERE role = 'customer'") or []
+        names = db.execute_query("SELECT name FROM products LIMIT 2000") or []
+    finally:
+        db.close()
+    if len(users) < count:
+        raise SystemExit(f"Need {count} customers, database has {len(users)}")
+    keywords = sorted({word.lower() for row in names for word in row['name'].split()
+                       if len(word) >= 3 and not word.isdigit()})
+    if not keywords:
+        raise SystemExit("No products to search for")
+    rng = random.Random(seed)
+    return [(u['uid'], u['pwd']) for u in rng.sample(users, count)], keywords
+
+
+def report(rec, elapsed, customers):
+    """Print the latency table and throughput"""
+    print(f"\n{'Operation':<14}{'Count':>8}{'Errors':>8}{'p50 ms':>9}"
+          f"{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    print("-" * 66)
+    total_ops = 0
+    for op in OPERATIONS:
+        values = sorted(rec.latencies[op])
+        total_ops += len(values)
+        if not values and not rec.errors[op]:
+            continue
+        ms = lambda pct: percentile(values, pct) * 1000
+        print(f"{op:<14}{len(values):>8}{rec.errors[op]:>8}{ms(50):>9.2f}"
+              f"{ms(95):>9.2f}{ms(99):>9.2f}{(values[-1] if values else 0) * 1000:>9.2f}")
+    print("-" * 66)
+    orders = len(rec.latencies['checkout'])
+    print(f"{customers} customers, {elapsed:.1f}s: {total_ops / elapsed:.1f} operations/sec, "
+          f"{orders / elapsed:.1f} checkouts/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent customer load generator")
+    parser.add_argument('database_file', nargs='?',
+                        help="application database (default: seed a scratch one)")
+    parser.add_argument('--url', help="server.py base URL, e.g. http://127.0.0.1:8291/api "
+                                      "(default: call the service in-process)")
+    parser.add_argument('--customers', type=int, default=8, help="concurrent customers (default 8)")
+    parser.add_argument('--seconds', type=float, default=10.0, help="run time (default 10)")
+    parser.add_argument('--scale', type=int, default=2000,
+                        help="customers to seed in the scratch database (default 2000)")
+    parser.add_argument('--think', type=float, default=0.0,
+                        help="pause between page views in ms (default 0)")
+    parser.add_argument('--cart-mode', choices=ShopService.CART_MODES, default='memory',
+                        help="in-process cart mode (default memory)")
+    args = parser.parse_args()
+    if args.url and not args.database_file:
+        parser.error("--url needs the database_file the server is using (to pick logins)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.database_file
+        if path is None:
+            path = os.path.join(tmp, 'load.db')
+            print(f"Seeding scratch database (scale {args.scale})...")
+            generate(path, customers=args.scale)
+        customers, keywords = load_customers(path, args.customers)
+
+        print("=" * 66)
+        print(f"  Load test: {args.customers} customers for {args.seconds:.0f}s "
+              f"({args.url or 'in-process'})")
+        print("=" * 66)
+        if args.url:
+            rec, elapsed = run(lambda: HttpClient(args.url), customers, args.seconds,
+                               args.think / 1000, keywords)
+        else:
+            db = Database(path)
+            service = ShopService(db, args.cart_mode)
+            try:
+                rec, elapsed = run(lambda: ServiceClient(service), customers, args.seconds,
+                                   args.think / 1000, keywords)
+                cache = db.products.stats()
+            finally:
+                db.close()
+    report(rec, elapsed, args.customers)
+    if not args.url:
+        print(f"Product cache: {cache['hit_rate']:.1%} hits ({cache['hits']} hits, "
+              f"{cache['misses']} misses, {cache['invalidations']} invalidations)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,35 @@
 # Main entry point for the application
 #!/usr/bin/env python3
-import sys
+import argparse
 from database import Database
+import query_stats
 from auth import Auth
 from customer import Customer
 from salesperson import Salesperson
+from service import ShopService
 
 def main():
     """Main application entry point"""
     
     # Check command line arguments
-    if len(sys.argv) != 2:
-        print("Usage: python main.py <database_file>")
-        print("Example: python main.py prj-test.db")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="E-commerce system",
+                                     epilog="Example: python main.py prj-test.db")
+    parser.add_argument('database_file')
+    parser.add_argument('--cart-mode', choices=ShopService.CART_MODES, default='memory',
+                        help="keep carts in memory and write them back in batches (default), "
+                             "or write every cart change to the database")
+    query_stats.add_arguments(parser)
+    args = parser.parse_args()
     
-    db_file = sys.argv[1]
+    db_file = args.database_file
+    stats, trace = query_stats.from_arguments(args)
     
     # Initialize database connection
     print(f"Connecting to database: {db_file}")
-    db = Database(db_file)
+    db = Database(db_file, stats=stats, trace=trace)
     
     # Initialize authentication
-    auth = Auth(db)
+    auth = Auth(db, ShopService(db, cart_mode=args.cart_mode))
     
     print("\n" + "="*50)
     print("  WELCOME TO E-COMMERCE SYSTEM")
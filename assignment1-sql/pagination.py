@@ -0,0 +1,121 @@
+# Keyset (cursor) pagination for result lists shown page by page
+from concurrent.futures import ThreadPoolExecutor
+
+class KeysetPager:
+    """Fetch a query's results one page at a time
+
+    Instead of loading every row and slicing, each page is a fresh query that
+    seeks past the last row of the previous page:
+
+        <base_query> AND (k1, k2) > (?, ?) ORDER BY k1, k2 LIMIT page_size + 1
+
+    so only one page is ever held in memory and, with an index on the keys,
+    every page costs the same however deep the user pages. The extra row
+    tells us whether a next page exists without counting the whole result.
+
+    base_query must be a SELECT ending in a WHERE clause (no ORDER BY/LIMIT).
+    keys is a list of (sql_expression, result_column) pairs that together
+    uniquely order the rows, e.g. [("o.odate", "odate"), ("o.ono", "ono")].
+    With prefetch=True the next page is loaded on a background thread (with
+    its own pooled connection) while the user reads the current one.
+    A stateless caller can resume a listing with start=<next_key of the
+    page it last saw>. page_size must be at least 1 (ValueError otherwise).
+    """
+
+    def __init__(self, db, base_query, params, keys, page_size=5,
+                 descending=False, prefetch=False, start=None):
+        if page_size < 1:
+            raise ValueError(f"page_size must be at least 1, got {page_size}")
+        self.db = db
+        self.base_query = base_query
+        self.params = tuple(params)
+        self.keys = keys
+        self.page_size = page_size
+        self.descending = descending
+        self.page_no = 0
+        # Seek key each visited page starts after (None for the first page)
+        start = tuple(start) if start is not None else None
+        self._starts = [start]
+        self._pending = None  # (seek key, future) of a prefetched page
+        # In-memory databases share one connection, so no background reads
+        self._executor = (ThreadPoolExecutor(max_workers=1)
+                          if prefetch and not db._shared else None)
+        self.rows, self.has_next = self._fetch(start)
+        self._prefetch_next()
+
+    def _key(self, row):
+        """Seek key of a result row"""
+        return tuple(row[column] for _, column in self.keys)
+
+    def page_query(self, after=None):
+        """Return (sql, params) of the page following seek key 'after'"""
+        query = self.base_query
+        params = list(self.params)
+        exprs = [expr for expr, _ in self.keys]
+        if after is not None:
+            op = '<' if self.descending else '>'
+            placeholders = ', '.join('?' * len(after))
+            query += f" AND ({', '.join(exprs)}) {op} ({placeholders})"
+            params.extend(after)
+        direction = ' DESC' if self.descending else ''
+        query += " ORDER BY " + ', '.join(expr + direction for expr in exprs)
+        query += " LIMIT ?"
+        params.append(self.page_size + 1)
+        return query, tuple(params)
+
+    def _fetch(self, after):
+        """Run the page query for the rows following seek key 'after'"""
+        rows = self.db.execute_query(*self.page_query(after)) or []
+        return rows[:self.page_size], len(rows) > self.page_size
+
+    def _load(self, after):
+        """Use the prefetched page if it is the one wanted, else query now"""
+        pending, self._pending = self._pending, None
+        if pending is not None and pending[0] == after:
+            return pending[1].result()
+        return self._fetch(after)
+
+    def _prefetch_next(self):
+        """Start loading the following page in the background"""
+        if self._executor is not None and self.has_next:
+            after = self._key(self.rows[-1])
+            self._pending = (after, self._executor.submit(self._fetch, after))
+
+    @property
+    def next_key(self):
+        """Seek key of the following page (None on the last page)"""
+        return self._key(self.rows[-1]) if self.has_next else None
+
+    @property
+    def offset(self):
+        """Number of rows on the pages before the current one"""
+        return self.page_no * self.page_size
+
+    def next_page(self):
+        """Advance to the next page; returns False on the last page"""
+        if not self.has_next:
+            return False
+        after = self._key(self.rows[-1])
+        self.rows, self.has_next = self._load(after)
+        self._starts.append(after)
+        self.page_no += 1
+        self._prefetch_next()
+        return True
+
+    def prev_page(self):
+        """Go back one page; returns False on the first page"""
+        if self.page_no == 0:
+            return False
+        self._starts.pop()
+        self.rows, self.has_next = self._load(self._starts[-1])
+        self.page_no -= 1
+        self._prefetch_next()
+        return True
+
+    def close(self):
+        """Stop the prefetch thread and return its connection"""
+        if self._executor is not None:
+            self._executor.submit(self.db.release_connection)
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._pending = None
@@ -1,4 +1,10 @@
 -- Let's drop the tables in case they exist from previous runs
+drop table if exists id_sequences;
+drop table if exists products_fts;
+drop table if exists daily_sales;
+drop table if exists daily_sales_products;
+drop table if exists daily_sales_customers;
+drop table if exists product_stats;
 drop table if exists orderlines;
 drop table if exists orders;
 drop table if exists cart;
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Bulk product import/export and price/stock updates
+
+Salespeople can change one product per round trip in the menus; this module
+streams whole files instead. Files are CSV (with a header row) or NDJSON
+(one JSON object per line), chosen by extension or the fmt argument:
+
+    products:  pid, name, category, price, stock_count, descr
+    updates:   pid and any of price, stock_count (absolute), stock_delta
+
+Rows are parsed lazily and fed straight to one executemany inside one
+transaction, so a file of any size is held in memory one row at a time and
+is applied in full or not at all. Imports are staged in a temp table and
+merged into products by one INSERT ... SELECT; when they cover a large
+share of the catalog the full-text sync triggers are dropped for the merge
+and the index is rebuilt once, which is far cheaper than re-indexing row by
+row. Exports iterate a cursor over products and write each row as it is
+fetched.
+
+Usage: python product_bulk.py <database_file> import <file> [--format csv|ndjson]
+       python product_bulk.py <database_file> update <file> [--format csv|ndjson]
+       python product_bulk.py <database_file> export <file> [--format csv|ndjson]
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from database import Database
+import schema
+
+FORMATS = ('csv', 'ndjson')
+PRODUCT_COLUMNS = ['pid', 'name', 'category', 'price', 'stock_count', 'descr']
+
+
+class BulkRowError(Exception):
+    """A row of a bulk file is malformed or not allowed; nothing was written"""
+
+    def __init__(self, line, message):
+        super().__init__(f"Line {line}: {message}" if line else message)
+        self.line = line
+
+
+def file_format(path, fmt=None):
+    """fmt if given, else the format implied by the file extension"""
+    if fmt is None:
+        ext = os.path.splitext(path)[1].lower()
+        fmt = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}.get(ext)
+        if fmt is None:
+            raise ValueError(f"Cannot tell the format of {path}; use csv or ndjson")
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {FORMATS}")
+    return fmt
+
+
+def read_records(f, fmt):
+    """Yield (line number, {column: value}) for each record of an open text file"""
+    if fmt == 'csv':
+        # strict: a stray quote is an error rather than part of the value
+        reader = csv.DictReader(f, strict=True)
+        try:
+            for record in reader:
+                yield reader.line_num, record
+        except csv.Error as e:
+            # line_num counts the lines of whole records: the bad one starts next
+            raise BulkRowError(reader.line_num + 1, f"invalid CSV ({e})")
+    else:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise BulkRowError(line_no, f"invalid JSON ({e})")
+            if not isinstance(record, dict):
+                raise BulkRowError(line_no, "expected a JSON object")
+            yield line_no, record
+
+
+def _value(record, column, convert, line_no, required=True):
+    """record[column] converted, or None if absent/blank and not required"""
+    value = record.get(column)
+    if value is None or value == '':
+        if required:
+            raise BulkRowError(line_no, f"missing {column}")
+        return None
+    try:
+        return convert(value)
+    except (TypeError, ValueError):
+        raise BulkRowError(line_no, f"invalid {column}: {value!r}")
+
+
+class ProductBulk:
+    """Stream product files into and out of the products table"""
+
+    STAGE = "CREATE TEMP TABLE IF NOT EXISTS bulk_products (pid, name, category, price, stock_count, descr)"
+    STAGE_ROW = "INSERT INTO temp.bulk_products VALUES (?, ?, ?, ?, ?, ?)"
+    STAGE_CLEAR = "DELETE FROM temp.bulk_products"
+    # Rows that are already identical are left alone (no triggers fire)
+    MERGE = """
+        INSERT INTO products (pid, name, category, price, stock_count, descr)
+        SELECT pid, name, category, price, stock_count, descr
+        FROM temp.bulk_products WHERE true ORDER BY rowid
+        ON CONFLICT (pid) DO UPDATE SET
+          name = excluded.name, category = excluded.category, price = excluded.price,
+          stock_count = excluded.stock_count, descr = excluded.descr
+        WHERE (name, category, price, stock_count, descr)
+          IS NOT (excluded.name, excluded.category, excluded.price,
+                  excluded.stock_count, excluded.descr)
+    """
+    # Above this share of the catalog, rebuild the full-text index once
+    # instead of re-indexing each imported row (a rebuild costs about a
+    # tenth of a per-row re-index, per product in the table)
+    REINDEX_SHARE = 0.1
+    # Absent fields are passed as NULL and leave the column unchanged; the
+    # stock guard makes a delta that would go below zero match no row
+    UPDATE = """
+        UPDATE products SET
+          price = COALESCE(?, price),
+          stock_count = COALESCE(?, stock_count) + ?
+        WHERE pid = ? AND COALESCE(?, stock_count) + ? >= 0
+    """
+    EXPORT = "SELECT pid, name, category, price, stock_count, descr FROM products ORDER BY pid"
+
+    def __init__(self, db):
+        self.db = db
+
+    @staticmethod
+    def _product_rows(records, count):
+        for line_no, record in records:
+            pid = _value(record, 'pid', int, line_no)
+            price = _value(record, 'price', float, line_no)
+            stock = _value(record, 'stock_count', int, line_no)
+            if price <= 0:
+                raise BulkRowError(line_no, "price must be positive")
+            if stock < 0:
+                raise BulkRowError(line_no, "stock_count cannot be negative")
+            count[0] += 1
+            yield (pid, _value(record, 'name', str, line_no, required=False),
+                   _value(record, 'category', str, line_no, required=False),
+                   price, stock, _value(record, 'descr', str, line_no, required=False))
+
+    @staticmethod
+    def _update_rows(records, count):
+        for line_no, record in records:
+            pid = _value(record, 'pid', int, line_no)
+            price = _value(record, 'price', float, line_no, required=False)
+            stock = _value(record, 'stock_count', int, line_no, required=False)
+            delta = _value(record, 'stock_delta', int, line_no, required=False) or 0
+            if price is None and stock is None and not delta:
+                raise BulkRowError(line_no, "nothing to update (price, stock_count or stock_delta)")
+            if price is not None and price <= 0:
+                raise BulkRowError(line_no, "price must be positive")
+            if stock is not None and stock < 0:
+                raise BulkRowError(line_no, "stock_count cannot be negative")
+            count[0] += 1
+            yield price, stock, delta, pid, stock, delta
+
+    def import_products(self, f, fmt):
+        """Insert or replace the products in file f; returns rows read"""
+        db = self.db
+        count = [0]
+        with db.transaction():
+            db.execute_update(self.STAGE)
+            db.execute_update(self.STAGE_CLEAR)
+            try:
+                db.execute_many(self.STAGE_ROW, self._product_rows(read_records(f, fmt), count))
+                products = db.execute_query("SELECT COUNT(*) FROM products")[0][0]
+                reindex = ('product_search' in self.db.features
+                           and count[0] > products * self.REINDEX_SHARE)
+                if reindex:
+                    schema.suspend_product_search(db.conn)
+                # One statement, with no parameters
+                merged = db.execute_many(self.MERGE, [()])
+                if reindex:
+                    schema.resume_product_search(db.conn, rebuild=merged > 0)
+            finally:
+                db.execute_update(self.STAGE_CLEAR)
+        # Every product may have changed
+        self.db.products.clear()
+        return count[0]
+
+    def update_products(self, f, fmt):
+        """Apply the price/stock updates in file f; returns rows applied"""
+        count = [0]
+        with self.db.transaction():
+            updated = self.db.execute_many(self.UPDATE, self._update_rows(read_records(f, fmt), count))
+            if updated != count[0]:
+                raise BulkRowError(None, f"{count[0] - updated} row(s) name no product "
+                                         f"or would make stock negative")
+        self.db.products.clear()
+        return count[0]
+
+    def export_products(self, f, fmt):
+        """Write every product to file f, in pid order; returns rows written"""
+        start = time.perf_counter()
+        cursor = self.db.conn.execute(self.EXPORT)
+        count = 0
+        if fmt == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(PRODUCT_COLUMNS)
+            while True:
+                rows = cursor.fetchmany(1000)
+                if not rows:
+                    break
+                writer.writerows(rows)
+                count += len(rows)
+        else:
+            for row in cursor:
+                f.write(json.dumps(dict(zip(PRODUCT_COLUMNS, row))) + '\n')
+                count += 1
+        # Streamed from its own cursor, so timed here (writing included)
+        self.db.stats.record(self.EXPORT, time.perf_counter() - start, count)
+        return count
+
+
+def main():
+    """Command line: run one bulk operation against a database file"""
+    parser = argparse.ArgumentParser(description="Bulk product import/export")
+    parser.add_argument('database_file')
+    parser.add_argument('operation', choices=['import', 'update', 'export'])
+    parser.add_argument('file')
+    parser.add_argument('--format', choices=FORMATS, help="default: from the file extension")
+    args = parser.parse_args()
+
+    db = Database(args.database_file)
+    bulk = ProductBulk(db)
+    start = time.perf_counter()
+    try:
+        fmt = file_format(args.file, args.format)
+        if args.operation == 'export':
+            with open(args.file, 'w', newline='') as f:
+                count = bulk.export_products(f, fmt)
+        else:
+            apply = bulk.import_products if args.operation == 'import' else bulk.update_products
+            with open(args.file, newline='') as f:
+                count = apply(f, fmt)
+    except (OSError, ValueError, BulkRowError) as e:
+        print(f"{args.operation} failed: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - start
+    print(f"{args.operation}: {count:,} rows in {elapsed:.2f}s "
+          f"({count / elapsed if elapsed else 0:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# In-process LRU cache of products rows, invalidated on writes
+import threading
+import time
+from collections import OrderedDict
+
+
+class ProductCache:
+    """Cache products rows by pid, bounded by size (LRU) and age (TTL)
+
+    Product pages, carts and stock checks read the same few popular rows
+    over and over; here each row is read from SQLite once and then served
+    from memory until it is evicted, it expires after ttl seconds, or code
+    that changes the product calls invalidate(pid). Writes made by other
+    processes are not seen until the entry expires, so ttl is the bound on
+    staleness for them.
+    """
+
+    def __init__(self, db, max_size=2048, ttl=30.0):
+        self.db = db
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # pid -> (row, expires at)
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; a row read before an invalidation is
+        # not cached, since it may predate the write being invalidated
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, pid, fresh=False):
+        """Return the products row for pid (None if there is none)
+
+        With fresh=True the row is re-read from the database and the cached
+        copy replaced.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(pid)
+            if entry is not None and not fresh:
+                if entry[1] > now:
+                    self._entries.move_to_end(pid)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[pid]
+                self.expired += 1
+            self.misses += 1
+            generation = self._generation
+
+        result = self.db.execute_query("SELECT * FROM products WHERE pid = ?", (pid,))
+        row = result[0] if result else None
+        if row is not None:
+            self._store(pid, row, generation)
+        return row
+
+    def get_many(self, pids):
+        """{pid: row} for every pid that exists"""
+        rows = {}
+        for pid in pids:
+            row = self.get(pid)
+            if row is not None:
+                rows[pid] = row
+        return rows
+
+    def _store(self, pid, row, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[pid] = (row, time.monotonic() + self.ttl)
+            self._entries.move_to_end(pid)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *pids):
+        """Drop the given products (call after committing a change to them)"""
+        with self._lock:
+            self._generation += 1
+            for pid in pids:
+                if self._entries.pop(pid, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        """Drop every cached product (e.g. after a bulk change)"""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'size': len(self._entries), 'max_size': self.max_size, 'ttl': self.ttl,
+                    'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                    'expired': self.expired, 'evictions': self.evictions,
+                    'invalidations': self.invalidations}
@@ -0,0 +1,71 @@
+# Builds product keyword searches (AND semantics, case-insensitive substrings)
+
+# Trigram index terms are 3 characters long; shorter keywords cannot be
+# looked up in the index and are checked with LIKE on the matched rows
+MIN_INDEXED_LENGTH = 3
+
+
+def _fts_phrase(keyword):
+    """Quote a keyword as an FTS5 phrase so operators/punctuation are literal"""
+    return '"' + keyword.replace('"', '""') + '"'
+
+
+def _indexed_keywords(keyword_list, use_index):
+    """Keywords that can be looked up in the trigram index"""
+    if not use_index:
+        return []
+    return [kw for kw in keyword_list if len(kw) >= MIN_INDEXED_LENGTH]
+
+
+def _score_expression(indexed):
+    """Relevance of a row: bm25 when the index is used, else a constant"""
+    return "bm25(products_fts)" if indexed else "0.0"
+
+
+def build_search_query(keyword_list, use_index=True, columns='p.*', ordered=True):
+    """Return (sql, params) selecting products that contain every keyword
+
+    A product matches a keyword if its name or description contains it
+    (case-insensitive). With the products_fts index the long keywords are
+    resolved by one index lookup and results are ranked by bm25 relevance
+    (exposed as the 'score' column, lower is better); otherwise every
+    keyword becomes a LIKE condition over a full scan, as before.
+    With ordered=False the query ends at its WHERE clause, ready to be
+    paged in pid order by a KeysetPager over search_keys().
+    """
+    indexed = _indexed_keywords(keyword_list, use_index)
+    scanned = [kw for kw in keyword_list if kw not in indexed]
+
+    conditions = []
+    params = []
+    score = _score_expression(indexed)
+    if indexed:
+        source = "products_fts f JOIN products p ON p.pid = f.rowid"
+        conditions.append("products_fts MATCH ?")
+        params.append(' AND '.join(_fts_phrase(kw) for kw in indexed))
+    else:
+        source = "products p"
+    for keyword in scanned:
+        conditions.append("(LOWER(p.name) LIKE ? OR LOWER(p.descr) LIKE ?)")
+        params.extend([f'%{keyword}%', f'%{keyword}%'])
+
+    query = f"SELECT {columns}, {score} AS score FROM {source} WHERE {' AND '.join(conditions)}"
+    if ordered:
+        query += " ORDER BY score, p.pid"
+    return query, tuple(params)
+
+
+def search_keys(keyword_list, use_index=True):
+    """Keyset pagination keys for build_search_query(ordered=False): pid order
+
+    Pages are not ranked by relevance. A bm25 seek key would make every
+    page score and sort all the matches, and bm25 changes with every
+    catalog write, so a later page could skip or repeat rows. In pid
+    order, the index hands over matches already sorted, a page reads only
+    its own rows, and a catalog change between pages only adds or drops
+    the products it touches.
+    """
+    if _indexed_keywords(keyword_list, use_index):
+        # The index yields its rowids (the pids) in order
+        return [('f.rowid', 'pid')]
+    return [('p.pid', 'pid')]
@@ -0,0 +1,161 @@
+# Per-statement latency/row statistics for Database.execute_query/execute_update
+import json
+import re
+import sys
+import threading
+from datetime import datetime
+from functools import lru_cache
+
+# Histogram bucket upper bounds in milliseconds (a last bucket catches the rest)
+BUCKETS_MS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)+\s*\)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=4096)
+def normalize_sql(sql):
+    """Statement text with literals replaced by ? and whitespace collapsed
+
+    Statements that differ only in their constants (or in the length of an
+    IN (...) list) normalize to the same key, e.g.
+        SELECT * FROM products WHERE pid IN (1, 2, 3)
+        -> SELECT * FROM products WHERE pid IN (?, ...)
+    """
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = ' '.join(sql.split())
+    return _IN_LIST.sub('IN (?, ...)', sql)
+
+
+class StatementStats:
+    """Counters and latency histogram of one normalized statement"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, elapsed_ms, rows, error):
+        self.calls += 1
+        self.errors += error
+        self.rows += rows
+        self.total += elapsed_ms
+        self.max = max(self.max, elapsed_ms)
+        for i, bound in enumerate(BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.histogram[i] += 1
+                return
+        self.histogram[-1] += 1
+
+    def percentile(self, pct):
+        """Upper bound (ms) of the bucket holding the pct-th percentile call"""
+        rank = pct / 100 * self.calls
+        seen = 0
+        for i, count in enumerate(self.histogram):
+            seen += count
+            if count and seen >= rank:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.max
+        return 0.0
+
+    def as_dict(self):
+        bounds = [f"<={b}ms" for b in BUCKETS_MS] + [f">{BUCKETS_MS[-1]}ms"]
+        return {'calls': self.calls, 'errors': self.errors, 'rows': self.rows,
+                'total_ms': round(self.total, 3), 'max_ms': round(self.max, 3),
+                'p50_ms': self.percentile(50), 'p95_ms': self.percentile(95),
+                'p99_ms': self.percentile(99),
+                'histogram': {b: n for b, n in zip(bounds, self.histogram) if n}}
+
+
+class QueryStats:
+    """Statement statistics collected by a Database
+
+    Every execute_query/execute_update call is timed and counted under its
+    normalized SQL. Calls slower than slow_ms are written to the slow-query
+    log (the slow_log file, or stderr). At close() the summary is printed
+    if report is set and written as JSON to summary_path if given.
+    """
+
+    def __init__(self, slow_ms=None, slow_log=None, report=False, summary_path=None):
+        self.slow_ms = slow_ms
+        self.slow_log = slow_log
+        self.report = report
+        self.summary_path = summary_path
+        self.statements = {}
+        self._lock = threading.Lock()
+
+    def record(self, sql, elapsed, rows=0, error=False):
+        """Account one call of 'sql' that took 'elapsed' seconds"""
+        key = normalize_sql(sql)
+        elapsed_ms = elapsed * 1000
+        with self._lock:
+            stats = self.statements.get(key)
+            if stats is None:
+                stats = self.statements[key] = StatementStats()
+            stats.add(elapsed_ms, rows, error)
+        if self.slow_ms is not None and elapsed_ms >= self.slow_ms:
+            self._log_slow(key, elapsed_ms, rows)
+
+    def _log_slow(self, key, elapsed_ms, rows):
+        line = (f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')} slow query "
+                f"({elapsed_ms:.1f} ms, {rows} rows): {key}")
+        if self.slow_log:
+            with self._lock, open(self.slow_log, 'a') as f:
+                f.write(line + "\n")
+        else:
+            print(line, file=sys.stderr)
+
+    def snapshot(self):
+        """{normalized sql: stats dict}, most total time first"""
+        with self._lock:
+            items = sorted(self.statements.items(), key=lambda kv: kv[1].total, reverse=True)
+            return {sql: stats.as_dict() for sql, stats in items}
+
+    def summary(self, top=15):
+        """Text table of the statements with the most total time"""
+        lines = [f"{'total ms':>10}{'calls':>8}{'avg ms':>9}{'p95 ms':>9}{'rows':>9}  statement"]
+        for sql, s in list(self.snapshot().items())[:top]:
+            text = sql if len(sql) <= 90 else sql[:87] + '...'
+            lines.append(f"{s['total_ms']:>10.1f}{s['calls']:>8}{s['total_ms'] / s['calls']:>9.2f}"
+                         f"{s['p95_ms']:>9.2f}{s['rows']:>9}  {text}")
+        return "\n".join(lines)
+
+    def reset(self):
+        with self._lock:
+            self.statements = {}
+
+    def close(self):
+        """Export the collected statistics as configured"""
+        if self.report and self.statements:
+            print("\n=== SQL STATEMENT SUMMARY ===")
+            print(self.summary())
+        if self.summary_path:
+            with open(self.summary_path, 'w') as f:
+                json.dump(self.snapshot(), f, indent=2)
+
+
+def add_arguments(parser):
+    """Add the instrumentation options to an argparse parser"""
+    group = parser.add_argument_group('SQL instrumentation')
+    group.add_argument('--stats', action='store_true',
+                       help="print per-statement latency/row statistics at exit")
+    group.add_argument('--stats-file', metavar='PATH',
+                       help="write the statistics as JSON to PATH at exit")
+    group.add_argument('--slow-ms', type=float, metavar='MS',
+                       help="log statements taking at least MS milliseconds")
+    group.add_argument('--slow-log', metavar='PATH',
+                       help="append slow statements to PATH (default: stderr)")
+    group.add_argument('--trace', action='store_true',
+                       help="print every statement SQLite runs to stderr")
+
+
+def from_arguments(args):
+    """Return (QueryStats, trace callback or None) for add_arguments() options"""
+    stats = QueryStats(slow_ms=args.slow_ms, slow_log=args.slow_log,
+                       report=args.stats, summary_path=args.stats_file)
+    trace = (lambda sql: print(f"SQL: {sql}", file=sys.stderr)) if args.trace else None
+    return stats, trace
@@ -0,0 +1,414 @@
+# Idempotent schema extensions layered on top of prj-tables.sql
+import argparse
+import sqlite3
+import time
+
+# Full-text index over products.name/descr. The trigram tokenizer indexes
+# every 3-character substring (case-insensitively), so a quoted keyword
+# matches anywhere inside a word, exactly like LIKE '%keyword%'. The table is
+# external-content: it stores only the index and reads rows from products.
+PRODUCT_SEARCH_TRIGGERS = [
+    """CREATE TRIGGER products_fts_ai AFTER INSERT ON products BEGIN
+      INSERT INTO products_fts (rowid, name, descr)
+      VALUES (new.pid, new.name, new.descr);
+    END""",
+    """CREATE TRIGGER products_fts_ad AFTER DELETE ON products BEGIN
+      INSERT INTO products_fts (products_fts, rowid, name, descr)
+      VALUES ('delete', old.pid, old.name, old.descr);
+    END""",
+    """CREATE TRIGGER products_fts_au AFTER UPDATE OF pid, name, descr ON products BEGIN
+      INSERT INTO products_fts (products_fts, rowid, name, descr)
+      VALUES ('delete', old.pid, old.name, old.descr);
+      INSERT INTO products_fts (rowid, name, descr)
+      VALUES (new.pid, new.name, new.descr);
+    END""",
+]
+PRODUCT_SEARCH_TRIGGER_NAMES = ['products_fts_ai', 'products_fts_ad', 'products_fts_au']
+PRODUCT_SEARCH_REBUILD = "INSERT INTO products_fts (products_fts) VALUES ('rebuild')"
+PRODUCT_SEARCH_DDL = (
+    "".join(f"DROP TRIGGER IF EXISTS {name};" for name in PRODUCT_SEARCH_TRIGGER_NAMES) + """
+    CREATE VIRTUAL TABLE products_fts USING fts5(
+      name, descr,
+      content='products', content_rowid='pid',
+      tokenize='trigram'
+    );
+""" + "".join(trigger + ";" for trigger in PRODUCT_SEARCH_TRIGGERS) + PRODUCT_SEARCH_REBUILD + ";")
+PRODUCT_SEARCH_OBJECTS = ['products_fts'] + PRODUCT_SEARCH_TRIGGER_NAMES
+
+# Per-day sales totals for Salesperson.sales_report, maintained by triggers as
+# orders and order lines are inserted, updated and deleted. Distinct
+# products/customers are kept as (day, id) sets so that distinct counts over
+# any range of days stay exact. An order line counts on its order's day once
+# both rows exist, whichever was written first.
+#
+# The trigger bodies add or remove one row's share; {row} is new or old.
+_ORDER_ADD = """
+      INSERT INTO daily_sales (day, order_count, revenue)
+        VALUES ({row}.odate, 1, (SELECT COALESCE(SUM(qty * uprice), 0)
+                                 FROM orderlines WHERE ono = {row}.ono))
+        ON CONFLICT (day) DO UPDATE SET order_count = order_count + 1,
+                                        revenue = revenue + excluded.revenue;
+      INSERT OR IGNORE INTO daily_sales_customers (day, cid) VALUES ({row}.odate, {row}.cid);
+      INSERT OR IGNORE INTO daily_sales_products (day, pid)
+        SELECT {row}.odate, pid FROM orderlines WHERE ono = {row}.ono;
+"""
+_ORDER_REMOVE = """
+      UPDATE daily_sales SET order_count = order_count - 1,
+        revenue = revenue - (SELECT COALESCE(SUM(qty * uprice), 0)
+                             FROM orderlines WHERE ono = {row}.ono)
+        WHERE day = {row}.odate;
+      DELETE FROM daily_sales WHERE day = {row}.odate AND order_count <= 0;
+      DELETE FROM daily_sales_customers
+        WHERE day = {row}.odate AND cid = {row}.cid
+          AND NOT EXISTS (SELECT 1 FROM orders WHERE cid = {row}.cid AND odate = {row}.odate);
+      DELETE FROM daily_sales_products
+        WHERE day = {row}.odate AND pid IN (SELECT pid FROM orderlines WHERE ono = {row}.ono)
+          AND NOT EXISTS (SELECT 1 FROM orderlines ol JOIN orders o ON o.ono = ol.ono
+                          WHERE ol.pid = daily_sales_products.pid AND o.odate = {row}.odate);
+"""
+_LINE_ADD = """
+      UPDATE daily_sales SET revenue = revenue + {row}.qty * {row}.uprice
+        WHERE day = (SELECT odate FROM orders WHERE ono = {row}.ono);
+      INSERT OR IGNORE INTO daily_sales_products (day, pid)
+        SELECT odate, {row}.pid FROM orders WHERE ono = {row}.ono;
+"""
+_LINE_REMOVE = """
+      UPDATE daily_sales SET revenue = revenue - {row}.qty * {row}.uprice
+        WHERE day = (SELECT odate FROM orders WHERE ono = {row}.ono);
+      DELETE FROM daily_sales_products
+        WHERE pid = {row}.pid AND day = (SELECT odate FROM orders WHERE ono = {row}.ono)
+          AND NOT EXISTS (SELECT 1 FROM orderlines ol JOIN orders o ON o.ono = ol.ono
+                          WHERE ol.pid = {row}.pid AND o.odate = daily_sales_products.day);
+"""
+SALES_ROLLUP_DDL = ("""
+    CREATE TABLE IF NOT EXISTS daily_sales (
+      day		date,
+      order_count	int,
+      revenue	float,
+      primary key (day)
+    );
+    CREATE TABLE IF NOT EXISTS daily_sales_products (
+      day		date,
+      pid		int,
+      primary key (day, pid)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS daily_sales_customers (
+      day		date,
+      cid		int,
+      primary key (day, cid)
+    ) WITHOUT ROWID;
+    DROP TRIGGER IF EXISTS daily_sales_orders_ai;
+    DROP TRIGGER IF EXISTS daily_sales_orders_ad;
+    DROP TRIGGER IF EXISTS daily_sales_orders_au;
+    DROP TRIGGER IF EXISTS daily_sales_orderlines_ai;
+    DROP TRIGGER IF EXISTS daily_sales_orderlines_ad;
+    DROP TRIGGER IF EXISTS daily_sales_orderlines_au;
+    CREATE TRIGGER daily_sales_orders_ai AFTER INSERT ON orders BEGIN""" + _ORDER_ADD.format(row='new') + """
+    END;
+    CREATE TRIGGER daily_sales_orders_ad AFTER DELETE ON orders BEGIN""" + _ORDER_REMOVE.format(row='old') + """
+    END;
+    CREATE TRIGGER daily_sales_orders_au AFTER UPDATE OF ono, cid, odate ON orders BEGIN"""
+    + _ORDER_REMOVE.format(row='old') + _ORDER_ADD.format(row='new') + """
+    END;
+    CREATE TRIGGER daily_sales_orderlines_ai AFTER INSERT ON orderlines BEGIN""" + _LINE_ADD.format(row='new') + """
+    END;
+    CREATE TRIGGER daily_sales_orderlines_ad AFTER DELETE ON orderlines BEGIN""" + _LINE_REMOVE.format(row='old') + """
+    END;
+    CREATE TRIGGER daily_sales_orderlines_au AFTER UPDATE OF ono, pid, qty, uprice ON orderlines BEGIN"""
+    + _LINE_REMOVE.format(row='old') + _LINE_ADD.format(row='new') + """
+    END;
+""")
+SALES_ROLLUP_REBUILD = """
+    DELETE FROM daily_sales;
+    DELETE FROM daily_sales_products;
+    DELETE FROM daily_sales_customers;
+    INSERT INTO daily_sales (day, order_count, revenue)
+      SELECT o.odate, COUNT(DISTINCT o.ono), COALESCE(SUM(ol.qty * ol.uprice), 0)
+      FROM orders o LEFT JOIN orderlines ol ON ol.ono = o.ono
+      GROUP BY o.odate;
+    INSERT INTO daily_sales_products (day, pid)
+      SELECT DISTINCT o.odate, ol.pid FROM orderlines ol JOIN orders o ON o.ono = ol.ono;
+    INSERT INTO daily_sales_customers (day, cid)
+      SELECT DISTINCT odate, cid FROM orders;
+"""
+SALES_ROLLUP_OBJECTS = ['daily_sales', 'daily_sales_products', 'daily_sales_customers',
+                        'daily_sales_orders_ai', 'daily_sales_orders_ad', 'daily_sales_orders_au',
+                        'daily_sales_orderlines_ai', 'daily_sales_orderlines_ad',
+                        'daily_sales_orderlines_au']
+
+# Per-product leaderboard counters for Salesperson.top_selling: the number of
+# distinct orders containing the product and the number of times it was
+# viewed, kept current by triggers and indexed so the top rows are an index
+# range read no matter how much history has accumulated.
+PRODUCT_STATS_DDL = """
+    CREATE TABLE IF NOT EXISTS product_stats (
+      pid		int,
+      order_count	int default 0,
+      view_count	int default 0,
+      primary key (pid)
+    );
+    CREATE INDEX IF NOT EXISTS product_stats_orders ON product_stats (order_count);
+    CREATE INDEX IF NOT EXISTS product_stats_views ON product_stats (view_count);
+    DROP TRIGGER IF EXISTS product_stats_orderlines_ai;
+    DROP TRIGGER IF EXISTS product_stats_orderlines_ad;
+    DROP TRIGGER IF EXISTS product_stats_orderlines_au;
+    DROP TRIGGER IF EXISTS product_stats_views_ai;
+    DROP TRIGGER IF EXISTS product_stats_views_ad;
+    -- An order counts once per product, however many of its lines hold it
+    CREATE TRIGGER product_stats_orderlines_ai AFTER INSERT ON orderlines
+    WHEN NOT EXISTS (SELECT 1 FROM orderlines
+                     WHERE pid = new.pid AND ono = new.ono AND lineNo <> new.lineNo)
+    BEGIN
+      INSERT INTO product_stats (pid, order_count) VALUES (new.pid, 1)
+        ON CONFLICT (pid) DO UPDATE SET order_count = order_count + 1;
+    END;
+    CREATE TRIGGER product_stats_orderlines_ad AFTER DELETE ON orderlines
+    WHEN NOT EXISTS (SELECT 1 FROM orderlines WHERE pid = old.pid AND ono = old.ono)
+    BEGIN
+      UPDATE product_stats SET order_count = order_count - 1 WHERE pid = old.pid;
+    END;
+    -- A line moved to another product or order: the delete, then the insert
+    CREATE TRIGGER product_stats_orderlines_au AFTER UPDATE OF ono, pid ON orderlines
+    WHEN old.pid IS NOT new.pid OR old.ono IS NOT new.ono
+    BEGIN
+      UPDATE product_stats SET order_count = order_count - 1
+        WHERE pid = old.pid
+          AND NOT EXISTS (SELECT 1 FROM orderlines WHERE pid = old.pid AND ono = old.ono);
+      INSERT INTO product_stats (pid, order_count)
+        SELECT new.pid, 1
+        WHERE NOT EXISTS (SELECT 1 FROM orderlines
+                          WHERE pid = new.pid AND ono = new.ono AND lineNo <> new.lineNo)
+        ON CONFLICT (pid) DO UPDATE SET order_count = order_count + 1;
+    END;
+    CREATE TRIGGER product_stats_views_ai AFTER INSERT ON viewedProduct BEGIN
+      INSERT INTO product_stats (pid, view_count) VALUES (new.pid, 1)
+        ON CONFLICT (pid) DO UPDATE SET view_count = view_count + 1;
+    END;
+    CREATE TRIGGER product_stats_views_ad AFTER DELETE ON viewedProduct BEGIN
+      UPDATE product_stats SET view_count = view_count - 1 WHERE pid = old.pid;
+    END;
+"""
+PRODUCT_STATS_REBUILD = """
+    DELETE FROM product_stats;
+    INSERT INTO product_stats (pid, order_count, view_count)
+      SELECT pid, SUM(order_count), SUM(view_count) FROM (
+        SELECT pid, COUNT(DISTINCT ono) as order_count, 0 as view_count
+        FROM orderlines GROUP BY pid
+        UNION ALL
+        SELECT pid, 0, COUNT(*) FROM viewedProduct GROUP BY pid
+      ) GROUP BY pid;
+"""
+PRODUCT_STATS_OBJECTS = ['product_stats', 'product_stats_orders', 'product_stats_views',
+                         'product_stats_orderlines_ai', 'product_stats_orderlines_ad',
+                         'product_stats_orderlines_au',
+                         'product_stats_views_ai', 'product_stats_views_ad']
+
+# Order totals and line counts stored on the orders rows themselves, so order
+# history never has to aggregate orderlines. The columns are added to
+# prj-tables.sql's orders table and kept current by triggers on orderlines.
+ORDER_TOTALS_COLUMNS = [('total', 'float default 0'), ('line_count', 'int default 0')]
+ORDER_TOTALS_DDL = """
+    DROP TRIGGER IF EXISTS order_totals_orderlines_ai;
+    DROP TRIGGER IF EXISTS order_totals_orderlines_ad;
+    DROP TRIGGER IF EXISTS order_totals_orderlines_au;
+    CREATE TRIGGER order_totals_orderlines_ai AFTER INSERT ON orderlines BEGIN
+      UPDATE orders SET total = total + new.qty * new.uprice, line_count = line_count + 1
+      WHERE ono = new.ono;
+    END;
+    CREATE TRIGGER order_totals_orderlines_ad AFTER DELETE ON orderlines BEGIN
+      UPDATE orders SET total = total - old.qty * old.uprice, line_count = line_count - 1
+      WHERE ono = old.ono;
+    END;
+    CREATE TRIGGER order_totals_orderlines_au AFTER UPDATE OF ono, qty, uprice ON orderlines BEGIN
+      UPDATE orders SET total = total - old.qty * old.uprice, line_count = line_count - 1
+      WHERE ono = old.ono;
+      UPDATE orders SET total = total + new.qty * new.uprice, line_count = line_count + 1
+      WHERE ono = new.ono;
+    END;
+"""
+ORDER_TOTALS_REBUILD = """
+    UPDATE orders SET
+      total = (SELECT COALESCE(SUM(qty * uprice), 0) FROM orderlines ol WHERE ol.ono = orders.ono),
+      line_count = (SELECT COUNT(*) FROM orderlines ol WHERE ol.ono = orders.ono);
+"""
+ORDER_TOTALS_OBJECTS = ['order_totals_orderlines_ai', 'order_totals_orderlines_ad',
+                        'order_totals_orderlines_au']
+
+# Secondary indexes for the application's hot queries, as (name, definition)
+MANAGED_INDEXES = [
+    # Order history: WHERE cid = ? AND line_count > 0 ORDER BY odate DESC, ono DESC,
+    # covering every column a history page shows
+    ('orders_history', 'orders (cid, odate DESC, ono DESC, line_count, total, shipping_address)'),
+    # Sales report: WHERE odate >= ?
+    ('orders_odate', 'orders (odate)'),
+    # Top-selling by orders: join/group orderlines on pid
+    ('orderlines_pid', 'orderlines (pid, ono)'),
+    # Top-selling by views: group viewedProduct on pid
+    ('viewedProduct_pid', 'viewedProduct (pid)'),
+    # Signup duplicate check: WHERE LOWER(email) = LOWER(?)
+    ('customers_email_lower', 'customers (LOWER(email))'),
+    # ID allocation: MAX(sessionNo) (the primary key leads with cid)
+    ('sessions_sessionNo', 'sessions (sessionNo)'),
+]
+# Indexes replaced by a MANAGED_INDEXES entry, dropped on install
+RETIRED_INDEXES = ['orders_cid_odate']
+
+
+def _existing_objects(conn):
+    """Names of all tables, indexes and triggers in the database"""
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+
+
+def _install_objects(conn, objects, ddl):
+    """Run ddl in one transaction unless every object in 'objects' exists
+
+    A partial install (e.g. a table was dropped and recreated by
+    prj-tables.sql, taking its triggers with it) is redone from scratch, so
+    ddl must drop/recreate what it needs and rebuild any derived data.
+    """
+    existing = _existing_objects(conn)
+    if all(name in existing for name in objects):
+        return
+    try:
+        conn.executescript("BEGIN IMMEDIATE;" + ddl + "COMMIT;")
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+
+
+def install_product_search(conn):
+    """Create the products full-text index and its sync triggers
+
+    Returns False if this SQLite build has no FTS5/trigram support, in which
+    case searches fall back to LIKE scans.
+    """
+    try:
+        _install_objects(conn, PRODUCT_SEARCH_OBJECTS,
+                         "DROP TABLE IF EXISTS products_fts;" + PRODUCT_SEARCH_DDL)
+    except sqlite3.OperationalError as e:
+        print(f"Full-text search unavailable ({e}); using LIKE search")
+        return False
+    return True
+
+
+def suspend_product_search(conn):
+    """Drop the full-text sync triggers in the caller's transaction
+
+    For writes touching a large share of products, where re-indexing each
+    row costs more than one rebuild; resume_product_search() must follow in
+    the same transaction.
+    """
+    for name in PRODUCT_SEARCH_TRIGGER_NAMES:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def resume_product_search(conn, rebuild=True):
+    """Recreate the sync triggers and rebuild the full-text index
+
+    Pass rebuild=False if no product was written while suspended.
+    """
+    for trigger in PRODUCT_SEARCH_TRIGGERS:
+        conn.execute(trigger)
+    if rebuild:
+        conn.execute(PRODUCT_SEARCH_REBUILD)
+
+
+def install_sales_rollups(conn):
+    """Create the daily sales rollup tables and triggers (backfilled on creation)"""
+    _install_objects(conn, SALES_ROLLUP_OBJECTS, SALES_ROLLUP_DDL + SALES_ROLLUP_REBUILD)
+
+
+def rebuild_sales_rollups(conn):
+    """Recompute the daily sales rollups from orders/orderlines"""
+    conn.executescript("BEGIN IMMEDIATE;" + SALES_ROLLUP_REBUILD + "COMMIT;")
+
+
+def install_product_stats(conn):
+    """Create the product leaderboard counters and triggers (backfilled on creation)"""
+    _install_objects(conn, PRODUCT_STATS_OBJECTS, PRODUCT_STATS_DDL + PRODUCT_STATS_REBUILD)
+
+
+def rebuild_product_stats(conn):
+    """Recompute the product leaderboard counters from orderlines/viewedProduct"""
+    conn.executescript("BEGIN IMMEDIATE;" + PRODUCT_STATS_REBUILD + "COMMIT;")
+
+
+def install_order_totals(conn):
+    """Add orders.total/line_count and their triggers (backfilled on creation)"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(orders)")}
+    missing = [(name, decl) for name, decl in ORDER_TOTALS_COLUMNS if name not in columns]
+    if not missing and all(name in _existing_objects(conn) for name in ORDER_TOTALS_OBJECTS):
+        return
+    alter = ''.join(f"ALTER TABLE orders ADD COLUMN {name} {decl};" for name, decl in missing)
+    try:
+        conn.executescript("BEGIN IMMEDIATE;" + alter + ORDER_TOTALS_DDL
+                           + ORDER_TOTALS_REBUILD + "COMMIT;")
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+
+
+def rebuild_order_totals(conn):
+    """Recompute orders.total/line_count from orderlines"""
+    conn.executescript("BEGIN IMMEDIATE;" + ORDER_TOTALS_REBUILD + "COMMIT;")
+
+
+def install_indexes(conn):
+    """Create any missing managed index and drop retired ones"""
+    for name in RETIRED_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    for name, definition in MANAGED_INDEXES:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+
+
+def drop_indexes(conn):
+    """Drop the managed indexes (e.g. before a bulk load; reinstall after)"""
+    for name, _ in MANAGED_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def install(conn):
+    """Bring a prj-tables.sql database up to date; returns installed features"""
+    features = set()
+    if 'products' not in _existing_objects(conn):
+        # Not an application database (yet); leave it untouched
+        return features
+    # Before the indexes, which cover the new orders columns
+    install_order_totals(conn)
+    features.add('order_totals')
+    install_indexes(conn)
+    if install_product_search(conn):
+        features.add('product_search')
+    install_sales_rollups(conn)
+    features.add('sales_rollups')
+    install_product_stats(conn)
+    features.add('product_stats')
+    return features
+
+
+def main():
+    """Command line: install extensions and optionally rebuild derived tables"""
+    parser = argparse.ArgumentParser(description="Install/rebuild schema extensions")
+    parser.add_argument('database_file')
+    parser.add_argument('--rebuild', action='store_true',
+                        help="recompute derived data (order totals, sales rollups, "
+                             "product leaderboards) from the base tables")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.database_file, isolation_level=None)
+    features = install(conn)
+    print(f"Installed: {', '.join(sorted(features)) or 'nothing (no products table)'}")
+    if args.rebuild and features:
+        for label, rebuild in [('order totals', rebuild_order_totals),
+                               ('sales rollups', rebuild_sales_rollups),
+                               ('product leaderboards', rebuild_product_stats)]:
+            start = time.perf_counter()
+            rebuild(conn)
+            print(f"Rebuilt {label} in {time.perf_counter() - start:.2f}s")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+JSON-over-HTTP server for the e-commerce system
+
+Serves the ShopService operations to any number of concurrent clients,
+one thread (and one pooled SQLite connection) per client connection.
+
+Usage: python server.py <database_file> [--host HOST] [--port PORT]
+                        [--session-ttl SECONDS] [--max-sessions N]
+                        [--stats] [--stats-file PATH] [--slow-ms MS] [--trace]
+
+Every call is a POST to /api/<operation> with a JSON object of arguments:
+
+    POST /api/login          {"uid": 9001, "pwd": "testpass"}
+      -> 200 {"result": {"token": "...", "uid": 9001, "role": "customer", ...}}
+    POST /api/search         {"keywords": "gaming laptop"}
+    POST /api/search         {"keywords": "gaming laptop", "after": <next>}
+    POST /api/add_to_cart    {"pid": 9001, "qty": 2}
+    POST /api/checkout       {"address": "123 Main St"}
+
+Every operation except login and signup needs the login token in an
+"Authorization: Bearer <token>" header. Refused operations, and arguments
+the operation does not take or of the wrong JSON type, answer 400
+{"error": "<message>"}; a missing or expired token answers 401. A token
+expires after --session-ttl seconds unused, and at most --max-sessions are
+kept (the least recently used is logged out to make room).
+"""
+
+import argparse
+import inspect
+import json
+import secrets
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from database import Database
+import query_stats
+from service import ShopService, ServiceError
+
+# Operations callable without a session, and ones that take the caller's
+# session as their first argument; each is the ShopService method of that
+# name, listed with the JSON arguments it accepts and their types
+SEEK_KEY = (list, type(None))  # next_key of the previous page, or null
+PUBLIC_OPERATIONS = {
+    'login': {'uid': int, 'pwd': str},
+    'signup': {'name': str, 'email': str, 'pwd': str},
+}
+SESSION_OPERATIONS = {
+    # Customer
+    'search': {'keywords': str, 'after': SEEK_KEY, 'page_size': int},
+    'view_product': {'pid': int},
+    'cart': {},
+    'add_to_cart': {'pid': int, 'qty': int},
+    'update_cart': {'pid': int, 'qty': int},
+    'remove_from_cart': {'pid': int},
+    'checkout': {'address': str},
+    'orders': {'after': SEEK_KEY, 'page_size': int},
+    'order_detail': {'ono': int},
+    # Salesperson
+    'product': {'pid': int},
+    'update_price': {'pid': int, 'price': (int, float)},
+    'update_stock': {'pid': int, 'stock': int},
+    'sales_report': {'days': int},
+    'top_selling': {'n': int},
+    'cache_stats': {},
+    # Both
+    'logout': {},
+}
+MAX_PAGE_SIZE = 50  # page_size is clamped to 1..MAX_PAGE_SIZE
+SESSION_TTL = 30 * 60  # seconds a token may go unused
+MAX_SESSIONS = 10000
+
+JSON_TYPES = {int: 'an integer', float: 'a number', str: 'a string', list: 'an array',
+              type(None): 'null'}
+
+
+def check_arguments(params, types):
+    """Return why params do not fit an operation's argument types, else None"""
+    for name, value in params.items():
+        if name not in types:
+            return f"unexpected argument '{name}'"
+        expected = types[name] if isinstance(types[name], tuple) else (types[name],)
+        # JSON true/false arrive as bool, a subclass of int
+        if isinstance(value, bool) or not isinstance(value, expected):
+            return f"'{name}' must be {' or '.join(JSON_TYPES[t] for t in expected)}"
+        if isinstance(value, list) and not all(
+                isinstance(item, (int, float, str)) and not isinstance(item, bool) for item in value):
+            return f"'{name}' must hold only numbers and strings"
+    return None
+
+
+def _to_json(value):
+    """json.dumps fallback for result rows"""
+    if isinstance(value, sqlite3.Row):
+        return dict(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class ShopServer(ThreadingHTTPServer):
+    """HTTP server holding the shared ShopService and the login tokens"""
+
+    daemon_threads = True
+
+    def __init__(self, address, service, verbose=False, session_ttl=SESSION_TTL,
+                 max_sessions=MAX_SESSIONS):
+        super().__init__(address, ShopRequestHandler)
+        self.service = service
+        self.verbose = verbose
+        self.session_ttl = session_ttl
+        self.max_sessions = max_sessions
+        # token -> [Session, last used], least recently used first
+        self._sessions = OrderedDict()
+        self._sessions_lock = threading.Lock()
+
+    def open_session(self, session):
+        """Issue a token for a logged-in Session"""
+        token = secrets.token_urlsafe(24)
+        now = time.monotonic()
+        with self._sessions_lock:
+            ended = self._expire(now)
+            while len(self._sessions) >= self.max_sessions:
+                ended.append(self._sessions.popitem(last=False)[1][0])
+            self._sessions[token] = [session, now]
+        self._logout(ended)
+        return token
+
+    def get_session(self, token):
+        """Session of a token that has not expired, else None"""
+        now = time.monotonic()
+        with self._sessions_lock:
+            entry = self._sessions.get(token)
+            if entry is None:
+                return None
+            if now - entry[1] <= self.session_ttl:
+                entry[1] = now
+                self._sessions.move_to_end(token)
+                return entry[0]
+            del self._sessions[token]
+        self._logout([entry[0]])
+        return None
+
+    def close_session(self, token):
+        with self._sessions_lock:
+            entry = self._sessions.pop(token, None)
+        return entry[0] if entry else None
+
+    def _expire(self, now):
+        """Drop the tokens unused for session_ttl; caller holds the lock"""
+        ended = []
+        while self._sessions:
+            token, (session, used) = next(iter(self._sessions.items()))
+            if now - used <= self.session_ttl:
+                break
+            del self._sessions[token]
+            ended.append(session)
+        return ended
+
+    def _logout(self, sessions):
+        for session in sessions:
+            self.service.logout(session)
+
+    def logout_all(self):
+        """End every open session (at shutdown)"""
+        with self._sessions_lock:
+            entries, self._sessions = list(self._sessions.values()), OrderedDict()
+        self._logout(session for session, _ in entries)
+
+
+class ShopRequestHandler(BaseHTTPRequestHandler):
+    """Dispatches POST /api/<operation> to the ShopService"""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive: one thread per client
+    # Send each response's headers and body as one write, without Nagle
+    # delays between small request/response round trips
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        operation = self.path.rstrip('/').rsplit('/', 1)[-1]
+        if not self.path.startswith('/api/') or (
+                operation not in PUBLIC_OPERATIONS and operation not in SESSION_OPERATIONS):
+            self._reply(404, {'error': f"Unknown operation: {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            params = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(params, dict):
+                raise ValueError("arguments must be a JSON object")
+        except ValueError as e:
+            self._reply(400, {'error': f"Invalid request body: {e}"})
+            return
+
+        types = PUBLIC_OPERATIONS.get(operation, SESSION_OPERATIONS.get(operation))
+        error = check_arguments(params, types)
+        if error:
+            self._reply(400, {'error': f"Invalid arguments: {error}"})
+            return
+        if 'page_size' in params:
+            params['page_size'] = max(1, min(params['page_size'], MAX_PAGE_SIZE))
+
+        token = None
+        args = []
+        if operation in SESSION_OPERATIONS:
+            auth = self.headers.get('Authorization', '')
+            token = auth[len('Bearer '):] if auth.startswith('Bearer ') else None
+            session = self.server.get_session(token) if token else None
+            if session is None:
+                self._reply(401, {'error': "Not logged in."})
+                return
+            args.append(session)
+
+        method = getattr(self.server.service, operation)
+        try:
+            bound = inspect.signature(method).bind(*args, **params)
+        except TypeError as e:
+            self._reply(400, {'error': f"Invalid arguments: {e}"})
+            return
+
+        try:
+            result = method(*bound.args, **bound.kwargs)
+        except ServiceError as e:
+            self._reply(400, {'error': str(e)})
+            return
+        except Exception as e:
+            self.log_error("%s failed: %r", operation, e)
+            self._reply(500, {'error': "Internal server error."})
+            return
+
+        if operation == 'login':
+            session = result
+            result = {'token': self.server.open_session(session), 'uid': session.uid,
+                      'role': session.role, 'session_no': session.session_no}
+        elif operation == 'logout':
+            self.server.close_session(token)
+        self._reply(200, {'result': result})
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload, default=_to_json).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def finish(self):
+        super().finish()
+        # The client is gone; return this thread's pooled connection
+        self.server.service.db.release_connection()
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the e-commerce system as JSON over HTTP")
+    parser.add_argument('database_file')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8291)
+    parser.add_argument('--verbose', action='store_true', help="log every request")
+    parser.add_argument('--cart-mode', choices=ShopService.CART_MODES, default='memory',
+                        help="where carts are kept between checkouts (default memory)")
+    parser.add_argument('--session-ttl', type=float, default=SESSION_TTL,
+                        help=f"seconds a login token may go unused (default {SESSION_TTL})")
+    parser.add_argument('--max-sessions', type=int, default=MAX_SESSIONS,
+                        help=f"most login tokens kept at once (default {MAX_SESSIONS})")
+    query_stats.add_arguments(parser)
+    args = parser.parse_args()
+
+    # Stop cleanly on 'kill' as well as Ctrl-C
+    def interrupt(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, interrupt)
+
+    stats, trace = query_stats.from_arguments(args)
+    db = Database(args.database_file, stats=stats, trace=trace)
+    server = ShopServer((args.host, args.port), ShopService(db, args.cart_mode),
+                        verbose=args.verbose, session_ttl=args.session_ttl,
+                        max_sessions=args.max_sessions)
+    print(f"Serving {args.database_file} on http://{args.host}:{server.server_address[1]}/api/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down.")
+    finally:
+        server.server_close()
+        server.logout_all()
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,412 @@
+# Non-interactive shop operations shared by the terminal menus and server.py
+import sqlite3
+from datetime import datetime, timedelta
+from checkout import CheckoutEngine, InsufficientStock
+from pagination import KeysetPager
+from product_bulk import BulkRowError, ProductBulk
+from product_search import build_search_query, search_keys
+
+# Order history page source (newest first): totals and line counts are stored
+# on the orders rows, so a page is one range read of the orders_history index
+ORDER_HISTORY_QUERY = """
+    SELECT o.ono, o.odate, o.shipping_address, o.total, o.line_count
+    FROM orders o
+    WHERE o.cid = ? AND o.line_count > 0
+"""
+ORDER_HISTORY_KEYS = [('o.odate', 'odate'), ('o.ono', 'ono')]
+
+# Ranking sources for top_selling, read from the product_stats counters
+TOP_BY_ORDERS_SOURCE = """
+    SELECT s.pid, p.name, s.order_count
+    FROM product_stats s JOIN products p ON p.pid = s.pid
+"""
+TOP_BY_VIEWS_SOURCE = """
+    SELECT s.pid, p.name, s.view_count
+    FROM product_stats s JOIN products p ON p.pid = s.pid
+"""
+
+# Cart contents as shown to the customer come from the product cache;
+# checkout re-reads the products rows inside its transaction
+CART_ITEMS_QUERY = "SELECT pid, qty FROM cart WHERE cid = ? AND sessionNo = ?"
+
+
+class ServiceError(Exception):
+    """An operation was refused; the message is meant to be shown to the user"""
+
+
+class Session:
+    """A logged-in user: uid, role and (customers only) their sessionNo"""
+
+    def __init__(self, uid, role, session_no=None):
+        self.uid = uid
+        self.role = role
+        self.session_no = session_no
+
+
+class ShopService:
+    """Every shop operation as a method call, with no input() or print()
+
+    Methods take the caller's Session (from login()) and either return
+    plain rows/dicts or raise ServiceError with a user-facing message. The
+    service keeps no per-user state of its own, so one instance can serve
+    any number of sessions from any number of threads (each thread gets
+    its own pooled connection from the Database).
+
+    Listings are paged: they return {'rows': [...], 'next': key} and the
+    following page is requested by passing that key back as 'after'.
+
+    With cart_mode='memory' carts live in db.carts and reach the cart table
+    only at checkout, logout and periodic flushes; with cart_mode='db'
+    every cart change is written to the cart table as it happens.
+    """
+
+    CART_MODES = ('memory', 'db')
+
+    def __init__(self, db, cart_mode='memory'):
+        if cart_mode not in self.CART_MODES:
+            raise ValueError(f"cart_mode must be one of {self.CART_MODES}")
+        self.db = db
+        self.cart_mode = cart_mode
+        self.checkouts = CheckoutEngine(db)
+        self.bulk = ProductBulk(db)
+
+    @staticmethod
+    def _require(session, role):
+        """Refuse the operation unless it comes from a user with 'role'"""
+        if session is None or session.role != role:
+            raise ServiceError("This operation is not available to this user.")
+
+    @staticmethod
+    def _page(pager):
+        """Result of a paged listing"""
+        pager.close()
+        return {'rows': pager.rows, 'next': pager.next_key}
+
+    # ------------------------------------------------------------------
+    # Authentication
+    # ------------------------------------------------------------------
+
+    def login(self, uid, pwd):
+        """Check credentials and return a Session (opening one for customers)"""
+        query = "SELECT uid, pwd, role FROM users WHERE uid = ?"
+        result = self.db.execute_query(query, (uid,))
+        if not result:
+            raise ServiceError("User ID not found.")
+        user = result[0]
+        if user['pwd'] != pwd:
+            raise ServiceError("Invalid password.")
+
+        session = Session(user['uid'], user['role'])
+        if session.role == 'customer':
+            session.session_no = self.db.ids.next_id('sessions', 'sessionNo')
+            start_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            query = "INSERT INTO sessions (cid, sessionNo, start_time) VALUES (?, ?, ?)"
+            if not self.db.execute_update(query, (session.uid, session.session_no, start_time)):
+                raise ServiceError("Error starting session.")
+        return session
+
+    def email_registered(self, email):
+        """True if a customer already uses this email (case-insensitive)"""
+        query = "SELECT email FROM customers WHERE LOWER(email) = LOWER(?)"
+        return bool(self.db.execute_query(query, (email,)))
+
+    def signup(self, name, email, pwd):
+        """Register a new customer; returns the new user ID"""
+        if self.email_registered(email):
+            raise ServiceError("Email already registered. Please login or use a different email.")
+
+        new_uid = self.db.ids.next_id('users', 'uid')
+
+        # Insert the user and the customer profile in one transaction
+        try:
+            with self.db.transaction():
+                query = "INSERT INTO users (uid, pwd, role) VALUES (?, ?, ?)"
+                self.db.execute_update(query, (new_uid, pwd, 'customer'))
+
+                query = "INSERT INTO customers (cid, name, email) VALUES (?, ?, ?)"
+                self.db.execute_update(query, (new_uid, name, email))
+        except sqlite3.Error:
+            raise ServiceError("Error creating customer account.")
+        return new_uid
+
+    def logout(self, session):
+        """Close a customer's session, writing out its buffered events"""
+        if session.role == 'customer' and session.session_no:
+            if self.cart_mode == 'memory':
+                self.db.carts.drop(session)
+            self.db.events.flush()
+
+            end_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            query = "UPDATE sessions SET end_time = ? WHERE cid = ? AND sessionNo = ?"
+            self.db.execute_update(query, (end_time, session.uid, session.session_no))
+
+    # ------------------------------------------------------------------
+    # Customer operations
+    # ------------------------------------------------------------------
+
+    def search_pager(self, session, keywords, page_size=5, prefetch=False, after=None):
+        """Record a search and return a KeysetPager over the matching products"""
+        self._require(session, 'customer')
+        keywords = keywords.strip()
+        if not keywords:
+            raise ServiceError("No keywords provided.")
+
+        # Record search (buffered, written in batches by the event log)
+        if after is None:
+            ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            self.db.events.log_search(session.uid, session.session_no, ts, keywords)
+
+        # Split keywords and build query with AND semantics
+        keyword_list = keywords.lower().split()
+        use_index = 'product_search' in self.db.features
+        query, params = build_search_query(keyword_list, use_index, ordered=False)
+        return KeysetPager(self.db, query, params, search_keys(keyword_list, use_index),
+                           page_size=page_size, prefetch=prefetch, start=after)
+
+    def search(self, session, keywords, after=None, page_size=5):
+        """One page of products containing every keyword"""
+        return self._page(self.search_pager(session, keywords, page_size, after=after))
+
+    def view_product(self, session, pid):
+        """Return a product and record that the customer viewed it"""
+        self._require(session, 'customer')
+        product = self.get_product(pid)
+
+        # Record view (buffered, written in batches by the event log)
+        ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+        self.db.events.log_view(session.uid, session.session_no, ts, product['pid'])
+        return product
+
+    def get_product(self, pid, fresh=False):
+        """Return a product row (from the product cache unless fresh)"""
+        product = self.db.products.get(pid, fresh)
+        if product is None:
+            raise ServiceError("Product not found.")
+        return product
+
+    def add_to_cart(self, session, pid, qty=1):
+        """Add qty of a product to the session's cart"""
+        self._require(session, 'customer')
+        if qty <= 0:
+            raise ServiceError("Quantity must be positive.")
+        if self.get_product(pid)['stock_count'] <= 0:
+            raise ServiceError("Product out of stock.")
+
+        if self.cart_mode == 'memory':
+            self.db.carts.add(session, pid, qty)
+            return
+
+        # Insert the line, or add to the quantity already in the cart
+        query = """
+            INSERT INTO cart (cid, sessionNo, pid, qty) VALUES (?, ?, ?, ?)
+            ON CONFLICT (cid, sessionNo, pid) DO UPDATE SET qty = qty + excluded.qty
+        """
+        if not self.db.execute_update(query, (session.uid, session.session_no, pid, qty)):
+            raise ServiceError("Error updating cart.")
+
+    def cart(self, session):
+        """Items in the session's cart with product name, price and stock"""
+        self._require(session, 'customer')
+        if self.cart_mode == 'memory':
+            items = sorted(self.db.carts.items(session).items())
+        else:
+            rows = self.db.execute_query(CART_ITEMS_QUERY, (session.uid, session.session_no)) or []
+            items = [(row['pid'], row['qty']) for row in rows]
+        products = self.db.products.get_many(pid for pid, _ in items)
+        return [{'pid': pid, 'name': products[pid]['name'], 'price': products[pid]['price'],
+                 'stock_count': products[pid]['stock_count'], 'qty': qty}
+                for pid, qty in items if pid in products]
+
+    def update_cart(self, session, pid, qty):
+        """Set the quantity of a product already in the cart"""
+        self._require(session, 'customer')
+        item = next((item for item in self.cart(session) if item['pid'] == pid), None)
+        if item is None:
+            raise ServiceError("Product is not in the cart.")
+        if qty <= 0:
+            raise ServiceError("Quantity must be positive.")
+        if qty > item['stock_count']:
+            raise ServiceError(f"Insufficient stock. Available: {item['stock_count']}")
+
+        if self.cart_mode == 'memory':
+            self.db.carts.set(session, pid, qty)
+            return
+        query = "UPDATE cart SET qty = ? WHERE cid = ? AND sessionNo = ? AND pid = ?"
+        if not self.db.execute_update(query, (qty, session.uid, session.session_no, pid)):
+            raise ServiceError("Error updating cart.")
+
+    def remove_from_cart(self, session, pid):
+        """Drop a product from the cart"""
+        self._require(session, 'customer')
+        if self.cart_mode == 'memory':
+            self.db.carts.remove(session, pid)
+            return
+        query = "DELETE FROM cart WHERE cid = ? AND sessionNo = ? AND pid = ?"
+        if not self.db.execute_update(query, (session.uid, session.session_no, pid)):
+            raise ServiceError("Error updating cart.")
+
+    def checkout(self, session, address):
+        """Turn the cart into an order; returns {'ono': ..., 'total': ...}
+
+        Stock is checked and decremented for every line at commit time (see
+        CheckoutEngine), so an order is either placed in full or refused
+        with the products that ran short.
+        """
+        self._require(session, 'customer')
+        if self.cart_mode == 'memory':
+            items = self.db.carts.take(session)
+        else:
+            items = self.checkouts.cart_items(session.uid, session.session_no)
+        if not items:
+            raise ServiceError("Your cart is empty.")
+
+        ono = self.db.ids.next_id('orders', 'ono')
+        odate = datetime.now().strftime('%Y-%m-%d')
+
+        # Order, order lines, stock and cart changes commit together
+        committed = False
+        try:
+            lines = self.checkouts.place_order(ono, session.uid, session.session_no,
+                                               odate, address, items)
+            committed = True
+        except InsufficientStock as e:
+            raise ServiceError(str(e))
+        except sqlite3.Error:
+            raise ServiceError("Error creating order.")
+        finally:
+            if self.cart_mode == 'memory':
+                # Checked out: the cart is empty; otherwise keep it for a retry
+                if committed:
+                    self.db.carts.clear(session)
+                else:
+                    self.db.carts.mark_changed(session)
+        self.db.products.invalidate(*items)
+
+        total = sum(line['uprice'] * line['qty'] for line in lines)
+        return {'ono': ono, 'total': total}
+
+    def orders_pager(self, session, page_size=5, prefetch=False, after=None):
+        """KeysetPager over the customer's orders, newest first"""
+        self._require(session, 'customer')
+        return KeysetPager(self.db, ORDER_HISTORY_QUERY, (session.uid,), ORDER_HISTORY_KEYS,
+                           page_size=page_size, descending=True, prefetch=prefetch, start=after)
+
+    def orders(self, session, after=None, page_size=5):
+        """One page of the customer's orders"""
+        return self._page(self.orders_pager(session, page_size, after=after))
+
+    def order_detail(self, session, ono):
+        """Return {'order': header, 'lines': [...], 'total': ...} of one of the customer's orders"""
+        self._require(session, 'customer')
+        query = "SELECT ono, odate, shipping_address FROM orders WHERE ono = ? AND cid = ?"
+        result = self.db.execute_query(query, (ono, session.uid))
+        if not result:
+            raise ServiceError("Order not found.")
+
+        query = """
+            SELECT p.name, p.category, ol.qty, ol.uprice,
+                   (ol.qty * ol.uprice) as line_total
+            FROM orderlines ol
+            JOIN products p ON ol.pid = p.pid
+            WHERE ol.ono = ?
+        """
+        lines = self.db.execute_query(query, (ono,)) or []
+        return {'order': result[0], 'lines': lines,
+                'total': sum(line['line_total'] for line in lines)}
+
+    # ------------------------------------------------------------------
+    # Salesperson operations
+    # ------------------------------------------------------------------
+
+    def product(self, session, pid):
+        """Return a product for the salesperson to check"""
+        self._require(session, 'sales')
+        return self.get_product(pid, fresh=True)
+
+    def update_price(self, session, pid, price):
+        """Set a product's price"""
+        self._require(session, 'sales')
+        if price <= 0:
+            raise ServiceError("Price must be positive.")
+        self.get_product(pid)
+        query = "UPDATE products SET price = ? WHERE pid = ?"
+        updated = self.db.execute_update(query, (price, pid))
+        self.db.products.invalidate(pid)
+        if not updated:
+            raise ServiceError("Error updating product.")
+
+    def update_stock(self, session, pid, stock):
+        """Set a product's stock count"""
+        self._require(session, 'sales')
+        if stock < 0:
+            raise ServiceError("Stock count cannot be negative.")
+        self.get_product(pid)
+        query = "UPDATE products SET stock_count = ? WHERE pid = ?"
+        updated = self.db.execute_update(query, (stock, pid))
+        self.db.products.invalidate(pid)
+        if not updated:
+            raise ServiceError("Error updating product.")
+
+    def import_products(self, session, f, fmt):
+        """Insert or replace the products listed in an open CSV/NDJSON file"""
+        self._require(session, 'sales')
+        return self._bulk(self.bulk.import_products, f, fmt)
+
+    def update_products(self, session, f, fmt):
+        """Apply a CSV/NDJSON file of price/stock updates"""
+        self._require(session, 'sales')
+        return self._bulk(self.bulk.update_products, f, fmt)
+
+    def export_products(self, session, f, fmt):
+        """Write every product to an open file as CSV/NDJSON"""
+        self._require(session, 'sales')
+        return self.bulk.export_products(f, fmt)
+
+    @staticmethod
+    def _bulk(apply, f, fmt):
+        """Run a bulk write; returns rows applied (none are if it fails)"""
+        try:
+            return apply(f, fmt)
+        except BulkRowError as e:
+            raise ServiceError(f"Nothing applied. {e}")
+        except sqlite3.Error:
+            raise ServiceError("Error applying bulk file; nothing applied.")
+
+    def sales_report(self, session, days=7):
+        """Order/product/customer counts and revenue over the last 'days' days"""
+        self._require(session, 'sales')
+        since = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+
+        # One range read over the daily rollups maintained at checkout
+        query = """
+            SELECT
+              (SELECT COALESCE(SUM(order_count), 0) FROM daily_sales WHERE day >= ?) as order_count,
+              (SELECT COUNT(DISTINCT pid) FROM daily_sales_products WHERE day >= ?) as product_count,
+              (SELECT COUNT(DISTINCT cid) FROM daily_sales_customers WHERE day >= ?) as customer_count,
+              (SELECT COALESCE(SUM(revenue), 0) FROM daily_sales WHERE day >= ?) as total_sales
+        """
+        result = self.db.execute_query(query, (since,) * 4)
+        report = dict(result[0]) if result else dict.fromkeys(
+            ['order_count', 'product_count', 'customer_count', 'total_sales'], 0)
+        customers = report['customer_count']
+        report['avg_per_customer'] = report['total_sales'] / customers if customers > 0 else 0
+        report['since'] = since
+        return report
+
+    def top_selling(self, session, n=3):
+        """Top n products by distinct orders and by views (with ties at position n)"""
+        self._require(session, 'sales')
+
+        # Include views still buffered in this process
+        self.db.events.flush()
+
+        by_orders = self.db.top_n_with_ties(TOP_BY_ORDERS_SOURCE, 'order_count', n,
+                                            tiebreak='pid', min_value=1)
+        by_views = self.db.top_n_with_ties(TOP_BY_VIEWS_SOURCE, 'view_count', n,
+                                           tiebreak='pid', min_value=1)
+        return {'by_orders': by_orders or [], 'by_views': by_views or []}
+
+    def cache_stats(self, session):
+        """Hit/miss counters of the product cache"""
+        self._require(session, 'sales')
+        return self.db.products.stats()
@@ -3,6 +3,13 @@ CMPUT 291 Mini Project 1 - Comprehensive Automated Test Suite
 
 This test suite validates all requirements from the project rubric.
 Run with: python test_app.py prj-test.db
+     or:  python test_app.py --parallel [--workers N] [--seed-db FILE]
+
+The first form runs every test in order against the given database. The
+second builds the seeded schema once in memory (optionally on top of a copy
+of FILE, e.g. a large database made by datagen.py), snapshots it, and runs
+each test in a worker process on its own clone of the snapshot, made with
+the sqlite3 backup API.
 
 Test Coverage:
 - Authentication (Login/Signup)
@@ -12,19 +19,42 @@ Test Coverage:
 - Data Integrity
 """
 
+import argparse
+import contextlib
 import sqlite3
 import sys
 import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 import hashlib
+import csv
+import io
+import tempfile
+import json
+import threading
+import urllib.error
+import urllib.request
+
+from checkout import CheckoutEngine, InsufficientStock
+from database import Database
+from datagen import generate
+from insert_products_fixed import insert_products
+from pagination import KeysetPager
+from product_search import build_search_query, search_keys
+from query_stats import QueryStats, normalize_sql
+import schema
+from server import ShopServer
+from service import ShopService, ServiceError
 
 
 class TestDatabase:
     """Database test utilities"""
     
-    def __init__(self, db_name):
+    def __init__(self, db_name, conn=None):
         self.db_name = db_name
-        self.conn = sqlite3.connect(db_name)
+        self.conn = conn or sqlite3.connect(db_name)
         self.conn.row_factory = sqlite3.Row
         self.cursor = self.conn.cursor()
         
@@ -55,8 +85,38 @@ class TestDatabase:
 class TestRunner:
     """Main test runner"""
     
-    def __init__(self, db_name):
-        self.db = TestDatabase(db_name)
+    # Test sections in run order; each one passes on a freshly seeded database
+    TESTS = [
+        'test_a_authentication',
+        'test_b_customer_search',
+        'test_b_cart_management',
+        'test_b_checkout',
+        'test_b_order_history',
+        'test_c_product_management',
+        'test_c_sales_reports',
+        'test_d_sql_injection_prevention',
+        'test_e_session_management',
+        'test_f_id_allocation',
+        'test_f_transactions',
+        'test_f_product_search_index',
+        'test_f_keyset_pagination',
+        'test_f_event_log',
+        'test_f_sales_rollups',
+        'test_f_product_leaderboards',
+        'test_f_top_n_with_ties',
+        'test_f_service_api',
+        'test_f_data_generator',
+        'test_f_query_stats',
+        'test_f_product_cache',
+        'test_f_cart_write_back',
+        'test_f_oversell_safe_checkout',
+        'test_f_order_totals',
+        'test_f_bulk_products',
+        'test_f_connection_pool',
+    ]
+    
+    def __init__(self, db_name, conn=None):
+        self.db = TestDatabase(db_name, conn)
         self.passed = 0
         self.failed = 0
         self.test_cid = None
@@ -144,7 +204,7 @@ class TestRunner:
         today = datetime.now().date()
         
         # Create orders from last 7 days
-        for i in range(5):
+        for i in range(6):
             order_date = today - timedelta(days=i)
             ono = 9000 + i
             
@@ -163,7 +223,7 @@ class TestRunner:
                 (ono, 2, 9002, 2, 29.99)
             )
         
-        print("  ✓ 5 test orders created for sales reporting")
+        print("  ✓ 6 test orders created for sales reporting")
         
         print("\n✓ Test data setup complete!\n")
     
@@ -972,6 +1032,936 @@ class TestRunner:
         print(f"  ✓ Cart for session {self.test_session} contains {len(result)} item(s)")
         print(f"  ✓ Cart data properly scoped to session")
     
+    # ========================================================================
+    # SECTION F: APPLICATION DATABASE LAYER
+    # ========================================================================
+    
+    def test_f_id_allocation(self):
+        """Test F1-F2: ID Allocation"""
+        print("\n" + "="*70)
+        print("TEST SECTION F1-F2: ID ALLOCATION")
+        print("="*70)
+        
+        # F1: IDs start past every existing (explicitly inserted) ID
+        print("\nTest F1: Allocated IDs Skip Existing Rows")
+        max_uid = self.db.execute_query("SELECT MAX(uid) as max_uid FROM users")[0]['max_uid']
+        app_db = Database(self.db.db_name)
+        try:
+            first = app_db.ids.next_id('users', 'uid')
+        finally:
+            app_db.close()
+        self.assert_true(first > max_uid, f"First allocated uid {first} > existing max {max_uid}")
+        
+        # F2: Concurrent allocators (two "processes", several threads) never collide
+        print("\nTest F2: Concurrent Allocation Is Unique")
+        allocators = [Database(self.db.db_name), Database(self.db.db_name)]
+        issued = []
+        issued_lock = threading.Lock()
+        
+        def allocate(app_db):
+            ids = [app_db.ids.next_id('orders', 'ono') for _ in range(100)]
+            with issued_lock:
+                issued.extend(ids)
+        
+        threads = [threading.Thread(target=allocate, args=(allocators[i % 2],)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for app_db in allocators:
+            app_db.close()
+        self.assert_equal(len(set(issued)), 400, "400 allocations produced 400 distinct order numbers")
+    
+    def test_f_transactions(self):
+        """Test F3-F5: Transactions"""
+        print("\n" + "="*70)
+        print("TEST SECTION F3-F5: TRANSACTIONS")
+        print("="*70)
+        
+        app_db = Database(self.db.db_name)
+        update = "UPDATE products SET stock_count = ? WHERE pid = ?"
+        stock_of = lambda: app_db.execute_query(
+            "SELECT stock_count FROM products WHERE pid = ?", (9005,))[0]['stock_count']
+        original = stock_of()
+        
+        try:
+            # F3: All statements commit together at the end of the block
+            print("\nTest F3: Transaction Commits at End of Block")
+            with app_db.transaction():
+                app_db.execute_update(update, (original + 1, 9005))
+                app_db.execute_update(update, (original + 2, 9005))
+                in_block = self.db.execute_query(
+                    "SELECT stock_count FROM products WHERE pid = ?", (9005,))[0]['stock_count']
+            self.assert_equal(in_block, original, "Other connections do not see uncommitted writes")
+            self.assert_equal(stock_of(), original + 2, "Writes visible after commit")
+            
+            # F4: A failing statement rolls back the whole block
+            print("\nTest F4: Failed Statement Rolls Back Block")
+            try:
+                with app_db.transaction():
+                    app_db.execute_update(update, (original, 9005))
+                    app_db.execute_update("INSERT INTO no_such_table VALUES (1)")
+            except sqlite3.Error:
+                pass
+            self.assert_equal(stock_of(), original + 2, "Stock unchanged after rollback")
+            
+            # F5: Nested blocks are savepoints
+            print("\nTest F5: Nested Transaction Rolls Back Only Inner Block")
+            with app_db.transaction():
+                app_db.execute_update(update, (original, 9005))
+                try:
+                    with app_db.transaction():
+                        app_db.execute_update(update, (original + 5, 9005))
+                        raise ValueError("inner failure")
+                except ValueError:
+                    pass
+            self.assert_equal(stock_of(), original, "Outer write kept, inner write undone")
+        finally:
+            app_db.close()
+    
+    def test_f_product_search_index(self):
+        """Test F6-F8: Full-Text Product Search"""
+        print("\n" + "="*70)
+        print("TEST SECTION F6-F8: FULL-TEXT PRODUCT SEARCH")
+        print("="*70)
+        
+        app_db = Database(self.db.db_name)
+        try:
+            # F6: Index results equal the LIKE scan (AND semantics, substrings, short keywords)
+            print("\nTest F6: Indexed Search Matches LIKE Semantics")
+            self.assert_true('product_search' in app_db.features, "products_fts index installed")
+            for keywords in (['laptop'], ['gaming', 'laptop'], ['cream'], ['rgb', 'key'],
+                             ['us'], ['aming', 'o'], ['"quoted'], ['nomatchxyz']):
+                query, params = build_search_query(keywords, use_index=True)
+                indexed = {row['pid'] for row in app_db.execute_query(query, params)}
+                query, params = build_search_query(keywords, use_index=False)
+                scanned = {row['pid'] for row in app_db.execute_query(query, params)}
+                self.assert_equal(indexed, scanned, f"Search {keywords} same as LIKE scan")
+            
+            # F7: Best match ranks first
+            print("\nTest F7: Results Ranked by Relevance")
+            query, params = build_search_query(['gaming'])
+            result = app_db.execute_query(query, params)
+            scores = [row['score'] for row in result]
+            self.assert_true(scores == sorted(scores), "Results ordered by bm25 score")
+            
+            # F8: Index follows product changes made by any connection
+            print("\nTest F8: Index Synced by Triggers")
+            self.db.execute_update("UPDATE products SET descr = ? WHERE pid = ?",
+                                   ('Adjustable zebrawood monitor stand', 9005))
+            query, params = build_search_query(['zebrawood'])
+            result = app_db.execute_query(query, params)
+            self.assert_true([row['pid'] for row in result] == [9005], "Updated description is searchable")
+            self.db.execute_update("UPDATE products SET descr = ? WHERE pid = ?",
+                                   ('Adjustable monitor stand', 9005))
+            result = app_db.execute_query(query, params)
+            self.assert_true(len(result) == 0, "Old description no longer matches")
+        finally:
+            app_db.close()
+    
+    def test_f_keyset_pagination(self):
+        """Test F9-F11: Keyset Pagination"""
+        print("\n" + "="*70)
+        print("TEST SECTION F9-F11: KEYSET PAGINATION")
+        print("="*70)
+        
+        app_db = Database(self.db.db_name)
+        try:
+            # F9: Paging through search results visits every match once, in pid order
+            print("\nTest F9: Search Pages Cover All Results in Order")
+            keywords = ['ing']
+            query, params = build_search_query(keywords)
+            expected = sorted(row['pid'] for row in app_db.execute_query(query, params))
+            query, params = build_search_query(keywords, ordered=False)
+            pager = KeysetPager(app_db, query, params, search_keys(keywords),
+                                page_size=2, prefetch=True)
+            seen = [row['pid'] for row in pager.rows]
+            while pager.next_page():
+                self.assert_true(len(pager.rows) <= 2, f"Page {pager.page_no + 1} holds at most 2 rows")
+                seen.extend(row['pid'] for row in pager.rows)
+            self.assert_equal(seen, expected, "Pages concatenate to the full result")
+            plan = ' '.join(row[3] for row in app_db.conn.execute(
+                "EXPLAIN QUERY PLAN " + pager.page_query((expected[0],))[0],
+                pager.page_query((expected[0],))[1]))
+            self.assert_true('TEMP B-TREE' not in plan, "A page is read in index order, not sorted")
+            
+            # Catalog writes between stateless pages: only the rows written change
+            insert = ("INSERT INTO products (pid, name, category, price, stock_count, descr) "
+                      "VALUES (?, ?, 'Test', 1.0, 1, 'Paging probe')")
+            self.db.execute_update(insert, (99981, 'Ringing Probe'))
+            first = KeysetPager(app_db, query, params, search_keys(keywords), page_size=2)
+            before = [row['pid'] for row in first.rows]
+            self.db.execute_update(insert, (99982, 'Singing Probe'))
+            self.db.execute_update("DELETE FROM products WHERE pid = 99981")
+            self.db.execute_update("UPDATE products SET descr = 'Paging probe, updated' WHERE pid = ?",
+                                   (before[0],))
+            rest = []
+            after = first.next_key
+            while after is not None:
+                page = KeysetPager(app_db, query, params, search_keys(keywords), page_size=2, start=after)
+                rest.extend(row['pid'] for row in page.rows)
+                after = page.next_key
+            self.assert_equal(before + rest, expected + [99982],
+                              "Pages after a write skip or repeat no row; new matches appear, deleted ones go")
+            self.db.execute_update("DELETE FROM products WHERE pid = 99982")
+            
+            # F10: Prev returns to the same rows
+            print("\nTest F10: Previous Page Navigation")
+            last_page = [row['pid'] for row in pager.rows]
+            pager.prev_page()
+            pager.next_page()
+            self.assert_equal([row['pid'] for row in pager.rows], last_page, "Prev then Next shows the same page")
+            while pager.prev_page():
+                pass
+            self.assert_equal([row['pid'] for row in pager.rows], expected[:2], "Back on the first page")
+            pager.close()
+            
+            # F11: Order history pages newest first
+            print("\nTest F11: Order History Pages Newest First")
+            pager = KeysetPager(app_db,
+                                "SELECT o.ono, o.odate FROM orders o WHERE o.cid = ?",
+                                (self.test_cid,), [('o.odate', 'odate'), ('o.ono', 'ono')],
+                                page_size=2, descending=True)
+            orders = list(pager.rows)
+            while pager.next_page():
+                orders.extend(pager.rows)
+            keys = [(o['odate'], o['ono']) for o in orders]
+            self.assert_true(len(keys) >= 5 and keys == sorted(keys, reverse=True),
+                             f"{len(keys)} orders returned in (odate, ono) descending order")
+            pager.close()
+            for page_size in (0, -1):
+                try:
+                    KeysetPager(app_db, "SELECT o.ono FROM orders o WHERE 1", (),
+                                [('o.ono', 'ono')], page_size=page_size)
+                    self.assert_true(False, f"page_size={page_size} is refused")
+                except ValueError as e:
+                    self.assert_true('page_size' in str(e), f"page_size={page_size} is refused ({e})")
+        finally:
+            app_db.close()
+    
+    def test_f_event_log(self):
+        """Test F12-F14: Buffered Search/View Logging"""
+        print("\n" + "="*70)
+        print("TEST SECTION F12-F14: BUFFERED EVENT LOGGING")
+        print("="*70)
+        
+        count_views = lambda: self.db.execute_query(
+            "SELECT COUNT(*) as n FROM viewedProduct WHERE cid = ? AND sessionNo = ?",
+            (self.test_cid, self.test_session))[0]['n']
+        before = count_views()
+        app_db = Database(self.db.db_name)
+        app_db.events.flush_interval = 60
+        try:
+            # F12: Logged events are queued, not written per click
+            print("\nTest F12: Events Are Buffered")
+            for i in range(3):
+                app_db.events.log_view(self.test_cid, self.test_session, f'2099-01-01 00:00:0{i}', 9003)
+            self.assert_equal(app_db.events.pending(), 3, "Three views queued")
+            self.assert_equal(count_views(), before, "Nothing written before flush")
+            
+            # F13: Flush writes the whole queue
+            print("\nTest F13: Flush Writes Queued Events")
+            self.assert_equal(app_db.events.flush(), 3, "Flush wrote 3 rows")
+            self.assert_equal(count_views(), before + 3, "Views visible after flush")
+            
+            # F14: Filling the queue triggers a background flush; close drains the rest
+            print("\nTest F14: Size Threshold and Close Flush the Queue")
+            app_db.events.max_rows = 5
+            for i in range(5):
+                app_db.events.log_search(self.test_cid, self.test_session, f'2099-01-02 00:00:0{i}', 'buffered')
+            for _ in range(50):
+                if app_db.events.pending() == 0:
+                    break
+                threading.Event().wait(0.05)
+            self.assert_equal(app_db.events.pending(), 0, "Full queue flushed in the background")
+            app_db.events.log_view(self.test_cid, self.test_session, '2099-01-03 00:00:00', 9003)
+        finally:
+            app_db.close()
+        self.assert_equal(count_views(), before + 4, "Close flushed the last view")
+    
+    def test_f_sales_rollups(self):
+        """Test F15-F16: Daily Sales Rollups"""
+        print("\n" + "="*70)
+        print("TEST SECTION F15-F16: DAILY SALES ROLLUPS")
+        print("="*70)
+        
+        since = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+        legacy_query = """
+            SELECT COUNT(DISTINCT o.ono) as order_count,
+                   (SELECT COUNT(DISTINCT ol.pid) FROM orderlines ol JOIN orders o ON ol.ono = o.ono
+                    WHERE o.odate >= :since) as product_count,
+                   COUNT(DISTINCT o.cid) as customer_count,
+                   (SELECT COALESCE(SUM(ol.qty * ol.uprice), 0) FROM orderlines ol JOIN orders o ON ol.ono = o.ono
+                    WHERE o.odate >= :since) as total_sales
+            FROM orders o WHERE o.odate >= :since
+        """
+        rollup_query = """
+            SELECT (SELECT COALESCE(SUM(order_count), 0) FROM daily_sales WHERE day >= :since) as order_count,
+                   (SELECT COUNT(DISTINCT pid) FROM daily_sales_products WHERE day >= :since) as product_count,
+                   (SELECT COUNT(DISTINCT cid) FROM daily_sales_customers WHERE day >= :since) as customer_count,
+                   (SELECT COALESCE(SUM(revenue), 0) FROM daily_sales WHERE day >= :since) as total_sales
+        """
+        as_tuple = lambda row: (row['order_count'], row['product_count'], row['customer_count'],
+                                round(row['total_sales'], 2))
+        
+        app_db = Database(self.db.db_name)
+        try:
+            # F15: Rollups maintained by triggers agree with the raw tables
+            print("\nTest F15: Rollup Report Matches Raw Aggregation")
+            ono = app_db.ids.next_id('orders', 'ono')
+            with app_db.transaction():
+                app_db.execute_update(
+                    "INSERT INTO orders (ono, cid, sessionNo, odate, shipping_address) VALUES (?, ?, ?, ?, ?)",
+                    (ono, self.test_cid, self.test_session, datetime.now().strftime('%Y-%m-%d'), 'Rollup St'))
+                app_db.execute_update(
+                    "INSERT INTO orderlines (ono, lineNo, pid, qty, uprice) VALUES (?, ?, ?, ?, ?)",
+                    (ono, 1, 9006, 2, 49.99))
+            legacy = as_tuple(app_db.execute_query(legacy_query, {'since': since})[0])
+            rollup = as_tuple(app_db.execute_query(rollup_query, {'since': since})[0])
+            self.assert_equal(rollup, legacy, "Rollup report equals the four raw queries")
+            
+            # Edits and deletes, and a line written before its order, are followed too
+            report = lambda query: as_tuple(app_db.execute_query(query, {'since': since})[0])
+            app_db.execute_update("UPDATE orderlines SET qty = 5, pid = 9005 WHERE ono = ? AND lineNo = 1", (ono,))
+            app_db.execute_update("UPDATE orders SET odate = ? WHERE ono = ?",
+                                  ((datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d'), ono))
+            self.assert_equal(report(rollup_query), report(legacy_query), "Rollups follow updated lines and dates")
+            late = app_db.ids.next_id('orders', 'ono')
+            with app_db.transaction():
+                app_db.execute_update(
+                    "INSERT INTO orderlines (ono, lineNo, pid, qty, uprice) VALUES (?, ?, ?, ?, ?)",
+                    (late, 1, 9004, 1, 79.99))
+                app_db.execute_update(
+                    "INSERT INTO orders (ono, cid, sessionNo, odate, shipping_address) VALUES (?, ?, ?, ?, ?)",
+                    (late, self.test_cid, self.test_session, datetime.now().strftime('%Y-%m-%d'), 'Late St'))
+            self.assert_equal(report(rollup_query), report(legacy_query), "Line written before its order counted")
+            with app_db.transaction():
+                for order in (ono, late):
+                    app_db.execute_update("DELETE FROM orderlines WHERE ono = ?", (order,))
+                    app_db.execute_update("DELETE FROM orders WHERE ono = ?", (order,))
+            legacy = report(legacy_query)
+            self.assert_equal(report(rollup_query), legacy, "Rollups follow deleted orders and lines")
+            
+            # F16: Rebuilding from scratch gives the same numbers
+            print("\nTest F16: Rollup Rebuild Backfills Identically")
+            schema.rebuild_sales_rollups(app_db.conn)
+            rebuilt = as_tuple(app_db.execute_query(rollup_query, {'since': since})[0])
+            self.assert_equal(rebuilt, legacy, "Rebuilt rollups equal the raw queries")
+        finally:
+            app_db.close()
+    
+    def test_f_product_leaderboards(self):
+        """Test F17-F18: Product Leaderboard Counters"""
+        print("\n" + "="*70)
+        print("TEST SECTION F17-F18: PRODUCT LEADERBOARD COUNTERS")
+        print("="*70)
+        
+        app_db = Database(self.db.db_name)
+        try:
+            # F17: Trigger-maintained counters equal a full re-aggregation
+            print("\nTest F17: Counters Match Full Aggregation")
+            counters = app_db.execute_query(
+                "SELECT pid, order_count, view_count FROM product_stats "
+                "WHERE order_count > 0 OR view_count > 0 ORDER BY pid")
+            expected = app_db.execute_query("""
+                SELECT pid, SUM(oc) as order_count, SUM(vc) as view_count FROM (
+                  SELECT pid, COUNT(DISTINCT ono) as oc, 0 as vc FROM orderlines GROUP BY pid
+                  UNION ALL
+                  SELECT pid, 0, COUNT(*) FROM viewedProduct GROUP BY pid)
+                GROUP BY pid ORDER BY pid""")
+            self.assert_equal([tuple(r) for r in counters], [tuple(r) for r in expected],
+                              "product_stats equals GROUP BY over orderlines/viewedProduct")
+            
+            # F18: A second line for the same product in one order is not a new order
+            print("\nTest F18: Distinct Orders Counted Once per Product")
+            before = app_db.execute_query(
+                "SELECT order_count FROM product_stats WHERE pid = ?", (9003,))
+            before = before[0]['order_count'] if before else 0
+            ono = app_db.ids.next_id('orders', 'ono')
+            with app_db.transaction():
+                app_db.execute_update(
+                    "INSERT INTO orders (ono, cid, sessionNo, odate, shipping_address) VALUES (?, ?, ?, ?, ?)",
+                    (ono, self.test_cid, self.test_session, datetime.now().strftime('%Y-%m-%d'), 'Stats St'))
+                for line_no in (1, 2):
+                    app_db.execute_update(
+                        "INSERT INTO orderlines (ono, lineNo, pid, qty, uprice) VALUES (?, ?, ?, ?, ?)",
+                        (ono, line_no, 9003, 1, 9.99))
+            after = app_db.execute_query(
+                "SELECT order_count FROM product_stats WHERE pid = ?", (9003,))[0]['order_count']
+            self.assert_equal(after, before + 1, "Order with two lines of pid 9003 counted once")
+        finally:
+            app_db.close()
+    
+    def test_f_top_n_with_ties(self):
+        """Test F19-F21: Ranked Top-N Queries"""
+        print("\n" + "="*70)
+        print("TEST SECTION F19-F21: RANKED TOP-N QUERIES")
+        print("="*70)
+        
+        source = """
+            SELECT column1 as id, column2 as score
+            FROM (VALUES (1, 10), (2, 9), (3, 9), (4, 9), (5, 7), (6, 7), (7, 5), (8, 0))
+        """
+        app_db = Database(self.db.db_name)
+        try:
+            ids = lambda rows: [row['id'] for row in rows]
+            
+            # F19: RANK keeps every row tied with the n-th
+            print("\nTest F19: Top-N Keeps Ties at Position N")
+            self.assert_equal(ids(app_db.top_n_with_ties(source, 'score', 3, tiebreak='id')),
+                              [1, 2, 3, 4], "Top 3 includes all rows tied at 3rd place")
+            self.assert_equal(ids(app_db.top_n_with_ties(source, 'score', 1)), [1], "Top 1 without ties")
+            
+            # F20: DENSE_RANK counts distinct values
+            print("\nTest F20: Dense Ranking by Distinct Values")
+            self.assert_equal(ids(app_db.top_n_with_ties(source, 'score', 3, dense=True, tiebreak='id')),
+                              [1, 2, 3, 4, 5, 6], "Top 3 distinct scores")
+            
+            # F21: Fewer qualifying rows than n, and the minimum value filter
+            print("\nTest F21: Short Results and Minimum Value")
+            self.assert_equal(ids(app_db.top_n_with_ties(source, 'score', 20, tiebreak='id', min_value=1)),
+                              [1, 2, 3, 4, 5, 6, 7], "All rows at or above min_value when n exceeds them")
+            result = app_db.top_n_with_ties(source, 'score', 3, tiebreak='id', min_value=11)
+            self.assert_equal(ids(result), [], "No rows when none reach min_value")
+        finally:
+            app_db.close()
+    
+    def test_f_service_api(self):
+        """Test F22-F24: Service Layer and HTTP API"""
+        print("\n" + "="*70)
+        print("TEST SECTION F22-F24: SERVICE LAYER AND HTTP API")
+        print("="*70)
+        
+        app_db = Database(self.db.db_name)
+        service = ShopService(app_db)
+        try:
+            # F22: A full customer flow without any terminal I/O
+            print("\nTest F22: Customer Flow Through the Service")
+            email = f"service{datetime.now().strftime('%H%M%S%f')}@test.com"
+            uid = service.signup('Service Tester', email, 'svcpass')
+            session = service.login(uid, 'svcpass')
+            self.assert_equal(session.role, 'customer', "Login returns a customer session")
+            self.assert_true(session.session_no is not None, "Login opened a session")
+            page = service.search(session, 'usb cable')
+            self.assert_true(any(row['pid'] == 9003 for row in page['rows']), "Search finds the product")
+            service.add_to_cart(session, 9003)
+            service.add_to_cart(session, 9003)
+            self.assert_equal([(i['pid'], i['qty']) for i in service.cart(session)], [(9003, 2)],
+                              "Adding twice increases the cart quantity")
+            order = service.checkout(session, '1 Service Rd')
+            self.assert_equal(service.cart(session), [], "Checkout empties the cart")
+            detail = service.order_detail(session, order['ono'])
+            self.assert_equal(round(detail['total'], 2), round(order['total'], 2), "Order total matches checkout")
+            self.assert_equal([row['ono'] for row in service.orders(session)['rows']], [order['ono']],
+                              "Order appears in the order history")
+            
+            # F23: Refused operations raise ServiceError with the user message
+            print("\nTest F23: Refused Operations Raise ServiceError")
+            def refused(call, message):
+                try:
+                    call()
+                except ServiceError as e:
+                    self.assert_equal(str(e), message, f"Refused: {message}")
+                else:
+                    self.assert_true(False, f"Refused: {message}")
+            refused(lambda: service.login(uid, 'wrong'), "Invalid password.")
+            refused(lambda: service.checkout(session, 'nowhere'), "Your cart is empty.")
+            service.add_to_cart(session, 9003)
+            refused(lambda: service.update_cart(session, 9003, 0), "Quantity must be positive.")
+            refused(lambda: service.sales_report(session),
+                    "This operation is not available to this user.")
+            service.logout(session)
+            
+            # F24: Concurrent clients over JSON/HTTP
+            print("\nTest F24: JSON-over-HTTP Server")
+            server = ShopServer(('127.0.0.1', 0), service)
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            url = f"http://127.0.0.1:{server.server_address[1]}/api/"
+            def call(operation, params=None, token=None):
+                request = urllib.request.Request(url + operation, data=json.dumps(params or {}).encode(),
+                                                 headers={'Content-Type': 'application/json'})
+                if token:
+                    request.add_header('Authorization', f'Bearer {token}')
+                try:
+                    with urllib.request.urlopen(request) as response:
+                        return response.status, json.load(response)
+                except urllib.error.HTTPError as e:
+                    return e.code, json.load(e)
+            try:
+                status, body = call('login', {'uid': uid, 'pwd': 'svcpass'})
+                self.assert_equal(status, 200, "Login over HTTP")
+                token = body['result']['token']
+                results = []
+                clients = [threading.Thread(target=lambda: results.append(
+                    call('search', {'keywords': 'gaming'}, token))) for _ in range(4)]
+                for client in clients:
+                    client.start()
+                for client in clients:
+                    client.join()
+                self.assert_true(all(status == 200 and body['result']['rows'] for status, body in results),
+                                 "Concurrent searches succeed")
+                self.assert_equal(call('cart')[0], 401, "Session operations need a token")
+                self.assert_equal(call('update_price', {'pid': 9003, 'price': 1}, token)[0], 400,
+                                  "Customers cannot use salesperson operations")
+                for params in ({'pid': '9003'}, {'pid': 9003, 'qty': True},
+                               {'pid': 9003, 'session': 1}):
+                    status, body = call('add_to_cart', params, token)
+                    self.assert_equal(status, 400, f"Arguments {params} are refused")
+                    self.assert_true(body['error'].startswith("Invalid arguments"),
+                                     f"Arguments {params} name the problem")
+                self.assert_equal(call('search', {'keywords': 'gaming', 'after': [{}]}, token)[0], 400,
+                                  "Seek keys hold only numbers and strings")
+                status, body = call('search', {'keywords': 'gaming', 'page_size': 0}, token)
+                self.assert_equal((status, len(body['result']['rows'])), (200, 1),
+                                  "page_size below 1 is raised to 1")
+                status, body = call('search', {'keywords': 'e', 'page_size': 10**6}, token)
+                self.assert_true(status == 200 and len(body['result']['rows']) <= 50,
+                                 "page_size is capped by the server")
+                self.assert_equal(call('logout', {}, token)[0], 200, "Logout over HTTP")
+                self.assert_equal(call('cart', {}, token)[0], 401, "Token is invalid after logout")
+
+                server.max_sessions = 1
+                first = call('login', {'uid': uid, 'pwd': 'svcpass'})[1]['result']['token']
+                second = call('login', {'uid': uid, 'pwd': 'svcpass'})[1]['result']['token']
+                self.assert_equal((call('cart', {}, first)[0], call('cart', {}, second)[0]), (401, 200),
+                                  "The least recently used token makes room at max_sessions")
+                server.session_ttl = 0
+                time.sleep(0.01)
+                self.assert_equal(call('cart', {}, second)[0], 401, "An unused token expires")
+                self.assert_equal(len(server._sessions), 0, "Expired tokens are dropped")
+            finally:
+                server.shutdown()
+                server.server_close()
+        finally:
+            app_db.close()
+    
+    def test_f_data_generator(self):
+        """Test F25-F26: Synthetic Data Generator"""
+        print("\n" + "="*70)
+        print("TEST SECTION F25-F26: SYNTHETIC DATA GENERATOR")
+        print("="*70)
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'generated.db')
+            counts = generate(path, customers=300)
+            conn = sqlite3.connect(path)
+            try:
+                scalar = lambda sql: conn.execute(sql).fetchone()[0]
+                
+                # F25: Every foreign key points at a generated row
+                print("\nTest F25: Generated Rows Are Consistent")
+                self.assert_equal(scalar("SELECT COUNT(*) FROM customers"), 300, "300 customers generated")
+                self.assert_equal(counts['orders'], scalar("SELECT COUNT(*) FROM orders"), "Row counts reported")
+                orphans = scalar("""
+                    SELECT (SELECT COUNT(*) FROM viewedProduct v WHERE NOT EXISTS
+                              (SELECT 1 FROM sessions s WHERE s.cid = v.cid AND s.sessionNo = v.sessionNo))
+                         + (SELECT COUNT(*) FROM orders o WHERE NOT EXISTS
+                              (SELECT 1 FROM sessions s WHERE s.cid = o.cid AND s.sessionNo = o.sessionNo))
+                         + (SELECT COUNT(*) FROM orderlines ol WHERE ol.ono NOT IN (SELECT ono FROM orders)
+                                                                 OR ol.pid NOT IN (SELECT pid FROM products))
+                         + (SELECT COUNT(*) FROM cart c WHERE c.pid NOT IN (SELECT pid FROM products))
+                """)
+                self.assert_equal(orphans, 0, "No dangling foreign keys")
+                
+                # F26: Popularity is skewed and the schema extensions are built after the load
+                print("\nTest F26: Skewed Activity and Deferred Indexes")
+                top = scalar("SELECT MAX(view_count) FROM product_stats")
+                median = scalar("""SELECT view_count FROM product_stats ORDER BY view_count
+                                   LIMIT 1 OFFSET (SELECT COUNT(*) FROM product_stats) / 2""")
+                self.assert_true(top > 10 * max(median, 1), f"Most viewed product ({top}) far above median ({median})")
+                indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+                self.assert_true(all(name in indexes for name, _ in schema.MANAGED_INDEXES),
+                                 "Managed indexes built after the load")
+            finally:
+                conn.close()
+    
+    def test_f_query_stats(self):
+        """Test F27-F28: SQL Instrumentation"""
+        print("\n" + "="*70)
+        print("TEST SECTION F27-F28: SQL INSTRUMENTATION")
+        print("="*70)
+        
+        # F27: Statements differing only in constants share one entry
+        print("\nTest F27: Normalized Statement Keys")
+        self.assert_equal(normalize_sql("SELECT * FROM products\n  WHERE pid IN (1, 2, 3) AND name = 'it''s'"),
+                          "SELECT * FROM products WHERE pid IN (?, ...) AND name = ?",
+                          "Literals and IN lists normalized")
+        
+        # F28: Calls are timed and counted; slow ones and the trace are reported
+        print("\nTest F28: Latency, Rows, Slow Log and Trace")
+        with tempfile.TemporaryDirectory() as tmp:
+            slow_log = os.path.join(tmp, 'slow.log')
+            traced = []
+            stats = QueryStats(slow_ms=0, slow_log=slow_log, summary_path=os.path.join(tmp, 'stats.json'))
+            app_db = Database(self.db.db_name, stats=stats, trace=traced.append)
+            try:
+                for pid in (9001, 9002, 9003):
+                    app_db.execute_query(f"SELECT * FROM products WHERE pid = {pid}")
+                app_db.execute_update("UPDATE products SET stock_count = stock_count WHERE pid IN (?, ?)",
+                                      (9001, 9002))
+                app_db.execute_many("UPDATE products SET stock_count = stock_count WHERE pid = ?",
+                                    [(9001,), (9002,), (9003,)])
+                entry = stats.snapshot().get("SELECT * FROM products WHERE pid = ?")
+                self.assert_true(entry is not None and entry['calls'] == 3 and entry['rows'] == 3,
+                                 "Three queries recorded under one key with their row counts")
+                entry = stats.snapshot().get("UPDATE products SET stock_count = stock_count WHERE pid IN (?, ...)")
+                self.assert_true(entry is not None and entry['rows'] == 2, "Update row count recorded")
+                entry = stats.snapshot().get("UPDATE products SET stock_count = stock_count WHERE pid = ?")
+                self.assert_true(entry is not None and (entry['calls'], entry['rows']) == (1, 3),
+                                 "An executemany recorded as one call with its row count")
+                self.assert_true(any('pid = 9002' in sql for sql in traced), "Trace callback saw the statements")
+            finally:
+                app_db.close()
+            with open(slow_log) as f:
+                self.assert_equal(len(f.readlines()), 5, "Every call above a 0 ms threshold logged as slow")
+            with open(os.path.join(tmp, 'stats.json')) as f:
+                self.assert_true(len(json.load(f)) >= 2, "Summary exported at close")
+    
+    def test_f_product_cache(self):
+        """Test F29-F30: Product Read Cache"""
+        print("\n" + "="*70)
+        print("TEST SECTION F29-F30: PRODUCT READ CACHE")
+        print("="*70)
+        
+        app_db = Database(self.db.db_name)
+        service = ShopService(app_db)
+        cache = app_db.products
+        try:
+            # F29: Repeated reads are served from memory
+            print("\nTest F29: Cache Hits, Misses, Size and TTL Bounds")
+            first = cache.get(9005)
+            second = cache.get(9005)
+            self.assert_true(first is second, "Second read served from the cache")
+            self.assert_equal((cache.hits, cache.misses), (1, 1), "One hit and one miss counted")
+            self.assert_true(cache.get(999999) is None, "Missing products are not cached")
+            cache.max_size = 2
+            cache.get(9001)
+            cache.get(9002)
+            self.assert_equal(cache.stats()['size'], 2, "LRU keeps at most max_size products")
+            self.assert_equal(cache.evictions, 1, "Least recently used product evicted")
+            cache.ttl = 0
+            cache.get(9003)
+            cache.get(9003)
+            self.assert_equal(cache.expired, 1, "Expired entry re-read from the database")
+            cache.ttl, cache.max_size = 30.0, 2048
+            
+            # F30: Writes through the service invalidate the cached row
+            print("\nTest F30: Updates Invalidate Cached Products")
+            sales = service.login(9002, 'salespass')
+            price = cache.get(9005)['price']
+            service.update_price(sales, 9005, price + 1)
+            self.assert_equal(cache.get(9005)['price'], price + 1, "Price change visible through the cache")
+            service.update_price(sales, 9005, price)
+            stock = cache.get(9005)['stock_count']
+            customer = service.login(9001, 'testpass')
+            service.add_to_cart(customer, 9005)
+            service.checkout(customer, '1 Cache Ln')
+            self.assert_equal(cache.get(9005)['stock_count'], stock - 1, "Checkout stock decrement invalidates")
+            self.assert_true(service.cache_stats(sales)['invalidations'] >= 3, "Invalidations counted")
+            service.logout(customer)
+        finally:
+            app_db.close()
+    
+    def test_f_cart_write_back(self):
+        """Test F31-F33: In-Memory Carts with Write-Back"""
+        print("\n" + "="*70)
+        print("TEST SECTION F31-F33: IN-MEMORY CARTS WITH WRITE-BACK")
+        print("="*70)
+        
+        cart_rows = lambda session: [(row['pid'], row['qty']) for row in self.db.execute_query(
+            "SELECT pid, qty FROM cart WHERE cid = ? AND sessionNo = ? ORDER BY pid",
+            (session.uid, session.session_no))]
+        app_db = Database(self.db.db_name)
+        app_db.carts.flush_interval = 60
+        service = ShopService(app_db, cart_mode='memory')
+        try:
+            # F31: Cart clicks stay in memory until a flush
+            print("\nTest F31: Cart Changes Are Kept in Memory")
+            session = service.login(9001, 'testpass')
+            service.add_to_cart(session, 9003)
+            service.add_to_cart(session, 9005, 2)
+            service.update_cart(session, 9003, 3)
+            self.assert_equal(cart_rows(session), [], "Nothing written to the cart table yet")
+            self.assert_equal([(i['pid'], i['qty']) for i in service.cart(session)], [(9003, 3), (9005, 2)],
+                              "Cart served from memory")
+            self.assert_equal(app_db.carts.flush(), 1, "Periodic flush writes the changed cart")
+            self.assert_equal(cart_rows(session), [(9003, 3), (9005, 2)], "Cart persisted in one batch")
+            
+            # F32: A new process recovers the flushed cart; logout writes back
+            print("\nTest F32: Recovery and Logout Write-Back")
+            other_db = Database(self.db.db_name)
+            try:
+                recovered = ShopService(other_db).cart(session)
+                self.assert_equal([(i['pid'], i['qty']) for i in recovered], [(9003, 3), (9005, 2)],
+                                  "Flushed cart reloaded by another process")
+            finally:
+                other_db.close()
+            service.remove_from_cart(session, 9005)
+            service.logout(session)
+            self.assert_equal(cart_rows(session), [(9003, 3)], "Logout wrote back the last change")
+            
+            # F33: Checkout writes the cart back and empties it in the same transaction
+            print("\nTest F33: Checkout Persists the In-Memory Cart")
+            session = service.login(9001, 'testpass')
+            service.add_to_cart(session, 9003, 2)
+            order = service.checkout(session, '1 Memory Ln')
+            lines = self.db.execute_query("SELECT pid, qty FROM orderlines WHERE ono = ?", (order['ono'],))
+            self.assert_equal([(row['pid'], row['qty']) for row in lines], [(9003, 2)],
+                              "Order built from the in-memory cart")
+            self.assert_equal((cart_rows(session), service.cart(session), app_db.carts.pending()), ([], [], 0),
+                              "Cart empty in memory and in the table")
+            service.logout(session)
+        finally:
+            app_db.close()
+    
+    def test_f_oversell_safe_checkout(self):
+        """Test F34-F35: Oversell-Safe Checkout"""
+        print("\n" + "="*70)
+        print("TEST SECTION F34-F35: OVERSELL-SAFE CHECKOUT")
+        print("="*70)
+        
+        self.db.execute_update(
+            "INSERT OR REPLACE INTO products (pid, name, category, price, stock_count, descr) VALUES (?, ?, ?, ?, ?, ?)",
+            (9950, 'Flash Sale Console', 'Electronics', 299.99, 1, 'Limited edition console'))
+        stock = lambda pid: self.db.execute_query(
+            "SELECT stock_count FROM products WHERE pid = ?", (pid,))[0]['stock_count']
+        app_db = Database(self.db.db_name)
+        service = ShopService(app_db)
+        try:
+            # F34: The last unit is sold once; a short line refuses the whole order
+            print("\nTest F34: Stock Is Checked at Commit Time")
+            stamp = datetime.now().strftime('%H%M%S%f')
+            buyers = [service.login(service.signup(f'Buyer {i}', f'buyer{i}.{stamp}@test.com', 'buy'), 'buy')
+                      for i in range(8)]
+            first, second = buyers[:2]
+            service.add_to_cart(first, 9950)
+            service.add_to_cart(second, 9003)
+            service.add_to_cart(second, 9950)
+            usb_stock = stock(9003)
+            engine = CheckoutEngine(app_db)
+            stale = engine._products([9003, 9950])
+            service.checkout(first, '1 First St')
+            try:
+                service.checkout(second, '2 Second St')
+                self.assert_true(False, "Second buyer of the last unit is refused")
+            except ServiceError as e:
+                self.assert_equal(str(e), "Insufficient stock for: Flash Sale Console (available: 0)",
+                                  "Second buyer of the last unit is refused")
+            self.assert_equal((stock(9950), stock(9003)), (0, usb_stock),
+                              "Refused order changed no stock (all lines or none)")
+            self.assert_equal(sorted(i['pid'] for i in service.cart(second)), [9003, 9950],
+                              "Refused order keeps the cart")
+            # Stock read before the last unit sold: the decrement finds it short
+            reads = iter([stale, stale])
+            engine._products = lambda pids: next(reads, None) or CheckoutEngine._products(engine, pids)
+            try:
+                engine.place_order(-1, second.uid, second.session_no, '2025-01-01', 'x', {9003: 1, 9950: 1})
+                self.assert_true(False, "A line sold out after the read is refused")
+            except InsufficientStock as e:
+                self.assert_equal([(s['pid'], s['stock_count']) for s in e.shortages], [(9950, 0)],
+                                  "Only the line that ran short is reported")
+            self.assert_equal((stock(9950), stock(9003)), (0, usb_stock),
+                              "Lines decremented before the short one are undone")
+            
+            # F35: Concurrent buyers never drive stock negative
+            print("\nTest F35: Concurrent Checkouts of a Hot Product")
+            self.db.execute_update("UPDATE products SET stock_count = 3 WHERE pid = 9950")
+            app_db.products.invalidate(9950)
+            service.remove_from_cart(second, 9003)
+            for buyer in buyers[2:]:
+                service.add_to_cart(buyer, 9950)
+            outcomes = []
+            def buy(buyer):
+                try:
+                    outcomes.append(service.checkout(buyer, 'Rush Ave')['ono'])
+                except ServiceError as e:
+                    outcomes.append(str(e))
+                finally:
+                    app_db.release_connection()
+            threads = [threading.Thread(target=buy, args=(buyer,)) for buyer in buyers[1:]]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            placed = [o for o in outcomes if isinstance(o, int)]
+            self.assert_equal((len(placed), len(outcomes) - len(placed)), (3, 4),
+                              "3 units sold to 7 concurrent buyers, 4 refused")
+            self.assert_equal(stock(9950), 0, "Stock ends at zero, never below")
+            sold = self.db.execute_query("SELECT SUM(qty) as n FROM orderlines WHERE pid = 9950")[0]['n']
+            self.assert_equal(sold, 4, "Order lines match the units sold")
+            for buyer in buyers:
+                service.logout(buyer)
+        finally:
+            app_db.close()
+    
+    def test_f_order_totals(self):
+        """Test F36-F37: Stored Order Totals"""
+        print("\n" + "="*70)
+        print("TEST SECTION F36-F37: STORED ORDER TOTALS")
+        print("="*70)
+        
+        app_db = Database(self.db.db_name)
+        service = ShopService(app_db)
+        stored = lambda ono: tuple(app_db.execute_query(
+            "SELECT ROUND(total, 2), line_count FROM orders WHERE ono = ?", (ono,))[0])
+        computed = lambda ono: tuple(app_db.execute_query(
+            "SELECT ROUND(COALESCE(SUM(qty * uprice), 0), 2), COUNT(*) FROM orderlines WHERE ono = ?", (ono,))[0])
+        try:
+            # F36: Checkout stores the total and line count on the order
+            print("\nTest F36: Totals Stored at Checkout")
+            session = service.login(9001, 'testpass')
+            service.add_to_cart(session, 9003, 2)
+            service.add_to_cart(session, 9005)
+            order = service.checkout(session, '36 Totals Rd')
+            self.assert_equal(stored(order['ono']), (round(order['total'], 2), 2), "Order row holds total and line count")
+            page = service.orders(session, page_size=50)['rows']
+            shown = [row for row in page if row['ono'] == order['ono']]
+            self.assert_equal([round(row['total'], 2) for row in shown], [round(order['total'], 2)], "History shows the stored total")
+            self.assert_true(all(row['line_count'] > 0 for row in page), "Orders without lines are not listed")
+            query, params = service.orders_pager(session).page_query()
+            plan = ' '.join(row[3] for row in app_db.conn.execute("EXPLAIN QUERY PLAN " + query, params))
+            self.assert_true('COVERING INDEX orders_history' in plan and 'TEMP B-TREE' not in plan,
+                             f"History page is one covering index range read ({plan})")
+            service.logout(session)
+            
+            # F37: Installing the triggers backfills existing orders
+            print("\nTest F37: Backfill of Existing Orders")
+            app_db.execute_update("DROP TRIGGER order_totals_orderlines_ai")
+            app_db.execute_update("UPDATE orders SET total = 0, line_count = 0")
+            schema.install_order_totals(app_db.conn)
+            onos = [row['ono'] for row in app_db.execute_query("SELECT ono FROM orders")]
+            mismatched = [ono for ono in onos if stored(ono) != computed(ono)]
+            self.assert_equal(mismatched, [], f"Totals of all {len(onos)} orders backfilled")
+            line = app_db.execute_query("SELECT ono, lineNo, qty FROM orderlines WHERE ono = ?", (order['ono'],))[0]
+            app_db.execute_update("UPDATE orderlines SET qty = qty + 1 WHERE ono = ? AND lineNo = ?",
+                                  (line['ono'], line['lineNo']))
+            self.assert_equal(stored(order['ono']), computed(order['ono']), "Line edits keep the total current")
+        finally:
+            app_db.close()
+    
+    def test_f_bulk_products(self):
+        """Test F38-F40: Bulk Product Files"""
+        print("\n" + "="*70)
+        print("TEST SECTION F38-F40: BULK PRODUCT FILES")
+        print("="*70)
+        
+        app_db = Database(self.db.db_name)
+        service = ShopService(app_db)
+        product = lambda pid: service.get_product(pid, fresh=True)
+        try:
+            sales = service.login(9002, 'salespass')
+            
+            # F38: Export writes every product, in pid order, in both formats
+            print("\nTest F38: Streaming Export")
+            total = self.db.execute_query("SELECT COUNT(*) as n FROM products")[0]['n']
+            out = io.StringIO()
+            self.assert_equal(service.export_products(sales, out, 'csv'), total, "CSV export counts every product")
+            exported = list(csv.DictReader(io.StringIO(out.getvalue())))
+            self.assert_equal([int(row['pid']) for row in exported],
+                              sorted(int(row['pid']) for row in exported), "Exported in pid order")
+            out = io.StringIO()
+            service.export_products(sales, out, 'ndjson')
+            first = json.loads(out.getvalue().splitlines()[0])
+            self.assert_equal(sorted(first), sorted(['pid', 'name', 'category', 'price', 'stock_count', 'descr']),
+                              "NDJSON lines hold the product columns")
+            
+            # F39: Import inserts and replaces products in one transaction
+            print("\nTest F39: Import Is All or Nothing")
+            bad = ("pid,name,category,price,stock_count,descr\n"
+                   "9960,Bulkimport Lamp,Home,19.5,10,Desk lamp\n"
+                   "9961,Bulkimport Rug,Home,0,5,Free rug\n")
+            try:
+                service.import_products(sales, io.StringIO(bad), 'csv')
+                self.assert_true(False, "Invalid row refuses the import")
+            except ServiceError as e:
+                self.assert_true('Line 3' in str(e), f"Invalid row refuses the import ({e})")
+            self.assert_equal(self.db.execute_query("SELECT pid FROM products WHERE pid = 9960"), [],
+                              "Nothing from the refused file was written")
+            for malformed in ('"9960",Bulkimport Lamp,Home,19.5,10,"Desk" lamp\n',
+                              '9960,Bulkimport Lamp,Home,19.5,10,"Desk lamp\n',
+                              '9960,Bulkimport Lamp,Home,19.5,10,' + 'x' * 200000 + '\n'):
+                try:
+                    service.import_products(sales, io.StringIO(bad.splitlines(True)[0] + malformed), 'csv')
+                    self.assert_true(False, "Malformed CSV refuses the import")
+                except ServiceError as e:
+                    self.assert_true('Line 2: invalid CSV' in str(e), f"Malformed CSV refuses the import ({e})")
+            good = "\n".join(json.dumps(row) for row in [
+                {'pid': 9960, 'name': 'Bulkimport Lamp', 'category': 'Home', 'price': 19.5,
+                 'stock_count': 10, 'descr': 'Desk lamp'},
+                {'pid': 9961, 'name': 'Bulkimport Rug', 'category': 'Home', 'price': 45.0,
+                 'stock_count': 5, 'descr': 'Wool rug'},
+                {'pid': 9003, **{k: v for k, v in dict(product(9003)).items() if k != 'pid'}, 'price': 12.5},
+            ])
+            self.assert_equal(service.import_products(sales, io.StringIO(good), 'ndjson'), 3, "3 rows imported")
+            self.assert_equal((product(9961)['price'], product(9003)['price']), (45.0, 12.5),
+                              "New products inserted, existing ones replaced")
+            customer = service.login(9001, 'testpass')
+            found = sorted(row['pid'] for row in service.search(customer, 'bulkimport')['rows'])
+            self.assert_equal(found, [9960, 9961], "Imported products are searchable")
+            service.logout(customer)
+            
+            # F40: Price/stock updates, with deltas that may not go below zero
+            print("\nTest F40: Bulk Price and Stock Updates")
+            updates = "pid,price,stock_count,stock_delta\n9960,,,-4\n9961,39.0,,\n9003,,100,\n"
+            self.assert_equal(service.update_products(sales, io.StringIO(updates), 'csv'), 3, "3 updates applied")
+            self.assert_equal([(product(pid)['price'], product(pid)['stock_count']) for pid in (9960, 9961, 9003)],
+                              [(19.5, 6), (39.0, 5), (12.5, 100)], "Absent fields left unchanged")
+            try:
+                service.update_products(sales, io.StringIO("pid,stock_delta\n9960,-1\n9961,-50\n"), 'csv')
+                self.assert_true(False, "Update driving stock negative is refused")
+            except ServiceError as e:
+                self.assert_equal(str(e), "Nothing applied. 1 row(s) name no product or would make stock negative",
+                                  "Update driving stock negative is refused")
+            self.assert_equal(product(9960)['stock_count'], 6, "Refused update file changed nothing")
+            service.logout(sales)
+        finally:
+            app_db.close()
+    
+    def test_f_connection_pool(self):
+        """Test F41-F43: Per-Thread Connection Pool"""
+        print("\n" + "="*70)
+        print("TEST SECTION F41-F43: PER-THREAD CONNECTION POOL")
+        print("="*70)
+        
+        app_db = Database(self.db.db_name, busy_timeout=2000)
+        
+        def on_thread(call):
+            result = []
+            thread = threading.Thread(target=lambda: result.append(call()))
+            thread.start()
+            thread.join()
+            return result[0]
+        
+        try:
+            # F41: Each thread has its own connection, reused across calls
+            print("\nTest F41: One Connection per Thread")
+            main_conn = app_db.conn
+            self.assert_true(app_db.conn is main_conn, "Same connection on repeated use in a thread")
+            other_conn = on_thread(lambda: app_db.conn)
+            self.assert_true(other_conn is not main_conn, "Another thread gets its own connection")
+            
+            # F42: Connections run in WAL mode
+            print("\nTest F42: WAL Journal Mode")
+            self.assert_equal(app_db.conn.execute("PRAGMA journal_mode").fetchone()[0], 'wal',
+                              "Journal mode is WAL")
+            
+            # F43: An open write transaction does not block readers on other threads
+            print("\nTest F43: Readers Not Blocked by a Writer")
+            stock_of = lambda: app_db.execute_query(
+                "SELECT stock_count FROM products WHERE pid = ?", (9004,))[0]['stock_count']
+            original = stock_of()
+            with app_db.transaction():
+                app_db.execute_update("UPDATE products SET stock_count = stock_count + 1 WHERE pid = ?", (9004,))
+                start = time.perf_counter()
+                seen = on_thread(stock_of)
+                elapsed = time.perf_counter() - start
+            self.assert_equal(seen, original, "Reader sees the last committed stock during BEGIN IMMEDIATE")
+            self.assert_true(elapsed < 1.0, f"Reader answered without waiting on the lock ({elapsed:.3f}s)")
+            self.assert_equal(stock_of(), original + 1, "Writer's update visible after commit")
+        finally:
+            app_db.close()
+    
     # ========================================================================
     # MAIN TEST EXECUTION
     # ========================================================================
@@ -989,15 +1979,8 @@ class TestRunner:
         self.setup_test_data()
         
         # Run all test sections
-        self.test_a_authentication()
-        self.test_b_customer_search()
-        self.test_b_cart_management()
-        self.test_b_checkout()
-        self.test_b_order_history()
-        self.test_c_product_management()
-        self.test_c_sales_reports()
-        self.test_d_sql_injection_prevention()
-        self.test_e_session_management()
+        for test in self.TESTS:
+            getattr(self, test)()
         
         # Print summary
         self.print_summary()
@@ -1025,14 +2008,123 @@ class TestRunner:
         print("="*70 + "\n")
 
 
+class SnapshotRunner:
+    """Run the test sections in parallel, each on a clone of one seeded snapshot
+
+    The seeded database (prj-tables.sql, the insert_products_fixed.py
+    products, setup_test_data() and the schema extensions) is built once in
+    memory and saved to a snapshot file with the backup API. Each worker
+    process then copies the snapshot into a private database file, again
+    with the backup API, for every test it runs, so tests never see each
+    other's writes and cost nothing to reset.
+    """
+    
+    SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prj-tables.sql')
+    
+    def __init__(self, workers=None, seed_db=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.seed_db = seed_db
+        self.passed = 0
+        self.failed = 0
+    
+    def build_snapshot(self, path):
+        """Seed an in-memory database and back it up to 'path'"""
+        template = sqlite3.connect(':memory:')
+        if self.seed_db:
+            source = sqlite3.connect(self.seed_db)
+            source.backup(template)
+            source.close()
+        else:
+            with open(self.SCHEMA_FILE) as f:
+                template.executescript(f.read())
+            insert_products(template)
+        runner = TestRunner(path, conn=template)
+        runner.setup_test_data()
+        schema.install(template)
+        template.commit()
+        snapshot = sqlite3.connect(path)
+        template.backup(snapshot)
+        snapshot.close()
+        template.close()
+        return runner.test_cid, runner.test_session
+    
+    def run(self):
+        """Run every test section; returns True if all passed"""
+        start = time.perf_counter()
+        with tempfile.TemporaryDirectory() as tmp:
+            snapshot = os.path.join(tmp, 'snapshot.db')
+            test_cid, test_session = self.build_snapshot(snapshot)
+            print(f"Snapshot built in {time.perf_counter() - start:.2f}s; "
+                  f"running {len(TestRunner.TESTS)} test sections on {self.workers} worker(s)")
+            jobs = [(test, snapshot, os.path.join(tmp, f"{test}.db"), test_cid, test_session)
+                    for test in TestRunner.TESTS]
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                # Output is printed in section order as the results arrive
+                for test, passed, failed, output, elapsed in pool.map(run_test_on_clone, jobs):
+                    print(output, end='')
+                    print(f"  ({test}: {elapsed:.2f}s)")
+                    self.passed += passed
+                    self.failed += failed
+        TestRunner.print_summary(self)
+        print(f"Wall time: {time.perf_counter() - start:.2f}s")
+        return self.failed == 0
+
+
+def run_test_on_clone(job):
+    """Worker: clone the snapshot and run one test section on the clone
+
+    Returns (test, passed, failed, captured output, seconds); an exception
+    counts as one failure.
+    """
+    test, snapshot, clone, test_cid, test_session = job
+    start = time.perf_counter()
+    source = sqlite3.connect(snapshot)
+    target = sqlite3.connect(clone)
+    source.backup(target)
+    source.close()
+    target.close()
+    
+    output = io.StringIO()
+    runner = TestRunner(clone)
+    runner.test_cid, runner.test_session = test_cid, test_session
+    try:
+        with contextlib.redirect_stdout(output):
+            try:
+                getattr(runner, test)()
+            except Exception:
+                print(f"  ✗ FAILED: {test} raised")
+                traceback.print_exc(file=sys.stdout)
+                runner.failed += 1
+    finally:
+        runner.db.cleanup()
+    return test, runner.passed, runner.failed, output.getvalue(), time.perf_counter() - start
+
+
 def main():
     """Main entry point"""
-    if len(sys.argv) != 2:
+    parser = argparse.ArgumentParser(description="CMPUT 291 Mini Project 1 test suite",
+                                     epilog="Example: python test_app.py prj-test.db")
+    parser.add_argument('database_file', nargs='?', help="run serially against this database")
+    parser.add_argument('--parallel', action='store_true',
+                        help="run on clones of a seeded in-memory snapshot in worker processes")
+    parser.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+    parser.add_argument('--seed-db', help="build the snapshot on a copy of this database")
+    args = parser.parse_args()
+    
+    if args.parallel:
+        if args.seed_db and not os.path.exists(args.seed_db):
+            print(f"Error: Database file '{args.seed_db}' not found.")
+            sys.exit(1)
+        ok = SnapshotRunner(args.workers, args.seed_db).run()
+        sys.exit(0 if ok else 1)
+    
+    if not args.database_file:
         print("Usage: python test_app.py <database_file>")
+        print("       python test_app.py --parallel [--workers N] [--seed-db FILE]")
         print("Example: python test_app.py prj-test.db")
         sys.exit(1)
     
-    db_name = sys.argv[1]
+    db_name = args.database_file
     
     if not os.path.exists(db_name):
         print(f"Error: Database file '{db_name}' not found.")
@@ -1047,7 +2139,6 @@ def main():
         print("\n\nTests interrupted by user.")
     except Exception as e:
         print(f"\n\nUnexpected error: {e}")
-        import traceback
         traceback.print_exc()
     finally:
         runner.db.cleanup()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+CMPUT 291 - Mini Project 2
+bench_load.py - Loader decoding benchmark
+
+Compares the loader's document paths on a JSON file:
+  json / dicts       stdlib json.loads, pymongo encodes each dict to BSON
+  <fast> / dicts     optional fast decoder (orjson, simdjson), same encoding
+  json / raw BSON    stdlib decode, BSON encoded once in the parser
+  <fast> / raw BSON  fast decode, BSON encoded once in the parser
+
+Without a port only the CPU side is measured: decoding, BSON encoding and
+pickling the parsed chunk (what the parser processes send back). With a
+port each mode also loads the file into a scratch database with
+load_json.insert_batches and reports docs/sec.
+
+Usage: python bench_load.py <json_file> [<port>] [--lines N]
+"""
+
+import pickle
+import sys
+import time
+
+import bson
+import load_json
+
+BENCH_DB = "291db_bench"
+
+
+def read_chunks(json_file, batch_size, max_lines):
+    """The first max_lines lines of the file as loader chunks (byte ranges)"""
+    load_json.map_input(json_file)
+    chunks = []
+    lines = 0
+    for chunk in load_json.read_line_ranges(json_file, batch_size):
+        chunks.append(chunk)
+        lines += chunk[2]
+        if lines >= max_lines:
+            break
+    return chunks
+
+
+def cpu_cost(chunks, decoder, raw_bson):
+    """Seconds to decode, encode and pickle the chunks; returns (seconds, docs)"""
+    start = time.perf_counter()
+    docs = 0
+    for chunk in chunks:
+        result = load_json.parse_chunk(chunk, decoder=decoder, raw_bson=raw_bson)
+        # What the parser process sends back to the reader
+        documents = pickle.loads(pickle.dumps(result, pickle.HIGHEST_PROTOCOL))[1]
+        if not raw_bson:
+            # What pymongo does to each dict in insert_many
+            for document in documents:
+                bson.encode(document)
+        docs += len(documents)
+    return time.perf_counter() - start, docs
+
+
+def main():
+    args = sys.argv[1:]
+    max_lines = 100000
+    if "--lines" in args:
+        i = args.index("--lines")
+        max_lines = int(args[i + 1])
+        del args[i:i + 2]
+    if not args or len(args) > 2:
+        print("Usage: python bench_load.py <json_file> [<port>] [--lines N]")
+        sys.exit(1)
+    json_file = args[0]
+    port = int(args[1]) if len(args) == 2 else None
+
+    decoders = load_json.available_decoders()
+    modes = [(decoder, raw) for raw in (False, True) for decoder in reversed(decoders)]
+
+    print("=" * 60)
+    print("  Loader decoding benchmark")
+    print("=" * 60)
+    print(f"Decoders installed: {', '.join(decoders)}")
+
+    chunks = read_chunks(json_file, 5000, max_lines)
+    print(f"\nCPU cost per document (first {sum(c[2] for c in chunks):,} lines):")
+    baseline = None
+    for decoder, raw in modes:
+        seconds, docs = cpu_cost(chunks, decoder, raw)
+        rate = docs / seconds if seconds else 0
+        baseline = baseline or rate
+        label = f"{decoder} / {'raw BSON' if raw else 'dicts'}"
+        print(f"  {label:<20} {rate:10,.0f} docs/sec  ({rate / baseline:.2f}x)")
+
+    if port is None:
+        return
+
+    client = load_json.connect_to_mongodb(port)
+    results = []
+    try:
+        for decoder, raw in modes:
+            client.drop_database(BENCH_DB)
+            collection = client[BENCH_DB]["articles"]
+            start = time.perf_counter()
+            total = load_json.insert_batches(collection, json_file, decoder=decoder,
+                                             raw_bson=raw)
+            results.append((decoder, raw, total / (time.perf_counter() - start)))
+    finally:
+        client.drop_database(BENCH_DB)
+        client.close()
+
+    print(f"\nFull loads into {BENCH_DB}.articles:")
+    for decoder, raw, rate in results:
+        label = f"{decoder} / {'raw BSON' if raw else 'dicts'}"
+        print(f"  {label:<20} {rate:10,.0f} docs/sec  ({rate / results[0][2]:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
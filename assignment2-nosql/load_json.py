@@ -4,7 +4,25 @@ CMPUT 291 - Mini Project 2
 load-json.py - MongoDB Data Loader
 
 This program loads JSON data from a file into MongoDB using batch insertion.
-Usage: python load-json.py <json_file> <port>
+Usage: python load-json.py <json_file> <port> [--parsers P] [--workers N]
+                           [--batch-size B] [--max-batch-mb M] [--fixed-batch]
+                           [--decoder NAME] [--raw-bson] [--resume]
+
+Loading is pipelined: the main process memory-maps the file and cuts it
+into byte ranges of whole lines, a pool of P parser processes decodes the
+ranges from their own mappings of the file, and N insert threads, each with
+its own MongoClient, insert the batches concurrently. With --raw-bson the
+parsers also encode each document to BSON, and the insert workers hand the
+bytes to pymongo as RawBSONDocuments, which it sends without re-encoding.
+Batches are capped at M MB of input and, unless --fixed-batch is given,
+their document count is tuned from the observed insert throughput.
+
+Progress is checkpointed in the 291db.load_checkpoints collection: the byte
+offset up to which every line has been inserted, and the documents inserted
+so far. --resume keeps the articles collection and continues from that
+offset. Each document's _id is derived from the byte offset of its line, so
+lines inserted after the checkpoint are rejected as duplicates when they
+are read again instead of being stored twice.
 
 Authors: Chidinma Obi-Okoye (obiokoye)
 Date: November 2025
@@ -12,24 +30,129 @@ Date: November 2025
 
 import sys
 import json
+import mmap
 import os
+import queue
+import threading
 import time
+from functools import partial
+from multiprocessing import Pool
+import bson
+from bson.objectid import ObjectId
+from bson.raw_bson import RawBSONDocument
 from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
+
+# Optional faster JSON decoders, used when installed (pip install orjson)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+
+def available_decoders():
+    """
+    Names of the usable JSON decoders, fastest first
+
+    Returns:
+        list: Subset of ["orjson", "simdjson", "json"]
+    """
+    decoders = []
+    if orjson is not None:
+        decoders.append("orjson")
+    if simdjson is not None:
+        decoders.append("simdjson")
+    decoders.append("json")
+    return decoders
+
+
+def get_decoder(name="auto"):
+    """
+    Return the loads() function of a JSON decoder
+
+    Args:
+        name (str): "orjson", "simdjson", "json", or "auto" for the fastest
+            one installed
+
+    Returns:
+        function: Takes str or bytes, returns the decoded document; raises
+        ValueError (json.JSONDecodeError for json and orjson) on bad input
+    """
+    if name == "auto":
+        name = available_decoders()[0]
+    if name == "orjson" and orjson is not None:
+        return orjson.loads
+    if name == "simdjson" and simdjson is not None:
+        return simdjson.loads
+    if name == "json":
+        return json.loads
+    raise ValueError(f"JSON decoder '{name}' is not installed")
 
 
 def parse_arguments():
     """
     Parse and validate command-line arguments
-    Returns: (json_file, port)
+    Returns: (json_file, port, options) where options holds the loader
+    settings (parsers, workers, batch_size, decoder, raw_bson, resume)
     """
+    args = sys.argv[1:]
+    options = {"parsers": os.cpu_count() or 1, "workers": 4, "batch_size": 5000,
+               "max_batch_mb": 8, "adaptive": True, "decoder": "auto", "raw_bson": False,
+               "resume": False}
+    flags = {"--parsers": "parsers", "--workers": "workers", "--batch-size": "batch_size",
+             "--max-batch-mb": "max_batch_mb"}
+    positional = []
+
+    # Split off the optional flags (the numeric ones are followed by a value)
+    while args:
+        arg = args.pop(0)
+        if arg == "--raw-bson":
+            options["raw_bson"] = True
+        elif arg == "--fixed-batch":
+            options["adaptive"] = False
+        elif arg == "--resume":
+            options["resume"] = True
+        elif arg == "--decoder":
+            if not args:
+                print(f"Error: {arg} needs a value")
+                sys.exit(1)
+            options["decoder"] = args.pop(0)
+        elif arg in flags:
+            if not args:
+                print(f"Error: {arg} needs a value")
+                sys.exit(1)
+            value = args.pop(0)
+            try:
+                options[flags[arg]] = int(value)
+            except ValueError:
+                print(f"Error: {arg} must be a number, got '{value}'")
+                sys.exit(1)
+        else:
+            positional.append(arg)
+
     # Check argument count
-    if len(sys.argv) != 3:
-        print("Usage: python load-json.py <json_file> <port>")
+    if len(positional) != 2:
+        print("Usage: python load-json.py <json_file> <port> [--parsers P] [--workers N] "
+              "[--batch-size B] [--max-batch-mb M] [--fixed-batch] [--decoder NAME] [--raw-bson] "
+              "[--resume]")
         print("Example: python load-json.py articles.json 27017")
+        print("  --parsers P     parser processes (default: CPU count; 0 parses in the reader)")
+        print("  --workers N     concurrent insert workers (default: 4)")
+        print("  --batch-size B  documents per batch to start from (default: 5000)")
+        print("  --max-batch-mb M  cap on the input bytes of a batch (default: 8)")
+        print("  --fixed-batch   keep --batch-size instead of tuning it from throughput")
+        print(f"  --decoder NAME  auto, {', '.join(available_decoders())} (default: auto)")
+        print("  --raw-bson      encode to BSON in the parsers, insert as RawBSONDocument")
+        print("  --resume        continue an interrupted load from its last checkpoint")
         sys.exit(1)
 
-    json_file = sys.argv[1]
-    port_str = sys.argv[2]
+    json_file = positional[0]
+    port_str = positional[1]
 
     # Validate file exists
     if not os.path.exists(json_file):
@@ -46,7 +169,18 @@ def parse_arguments():
         print(f"Error: Port must be a number, got '{port_str}'")
         sys.exit(1)
 
-    return json_file, port
+    if (options["parsers"] < 0 or options["workers"] < 1 or options["batch_size"] < 1
+            or options["max_batch_mb"] < 1):
+        print("Error: --parsers must be >= 0; --workers, --batch-size and --max-batch-mb >= 1")
+        sys.exit(1)
+
+    try:
+        get_decoder(options["decoder"])
+    except ValueError as e:
+        print(f"Error: {e} (available: {', '.join(available_decoders())})")
+        sys.exit(1)
+
+    return json_file, port, options
 
 
 def connect_to_mongodb(port):
@@ -87,12 +221,13 @@ def connect_to_mongodb(port):
         sys.exit(1)
 
 
-def setup_database(client):
+def setup_database(client, resume=False):
     """
     Create/access 291db database and setup articles collection
 
     Args:
         client (MongoClient): Connected MongoDB client
+        resume (bool): Keep the existing collection (resuming a load)
 
     Returns:
         Collection: MongoDB collection object
@@ -102,6 +237,10 @@ def setup_database(client):
     # Access (or create) database
     db = client["291db"]
 
+    if resume:
+        print("✓ Keeping existing 'articles' collection")
+        return db["articles"]
+
     # Drop existing collection if it exists
     if "articles" in db.list_collection_names():
         db.articles.drop()
@@ -114,12 +253,85 @@ def setup_database(client):
     return collection
 
 
+# Bytes that clean_line_span trims around a document
+WHITESPACE = frozenset(b" \t\r\n")
+BRACKETS = frozenset(b"[]")
+COMMA = ord(",")
+
+# The input file as mapped in this process (see map_input)
+_input = None
+
+
+def map_input(filename):
+    """
+    Memory-map the input file for parse_chunk (the parser pool initializer)
+
+    Each parser process maps the file itself, so a chunk is handed over as
+    a pair of offsets rather than as its bytes.
+
+    Args:
+        filename (str): Path to JSON file
+    """
+    global _input
+    with open(filename, "rb") as file:
+        # mmap cannot map an empty file
+        if os.fstat(file.fileno()).st_size > 0:
+            _input = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            _input = b""
+
+
+def release_pages(mapped, start, end):
+    """
+    Drop the pages fully inside [start, end) from this process's memory
+
+    The file stays in the page cache; this only keeps the resident size of
+    the process from growing with the part of the file it has been through.
+
+    Args:
+        mapped (mmap): Mapped file
+        start (int), end (int): Byte range that is no longer needed
+    """
+    if not hasattr(mmap, "MADV_DONTNEED") or not isinstance(mapped, mmap.mmap):
+        return
+    first = -(-start // mmap.PAGESIZE) * mmap.PAGESIZE
+    last = end // mmap.PAGESIZE * mmap.PAGESIZE
+    if last > first:
+        mapped.madvise(mmap.MADV_DONTNEED, first, last - first)
+
+
+def clean_line_span(data, start, end):
+    """
+    Narrow one line of the input down to a single JSON document
+
+    Args:
+        data (memoryview or bytes): The mapped file
+        start (int), end (int): Byte range of the line
+
+    Returns:
+        tuple: (start, end) of the document text, or None for lines holding
+        no document (blank lines and the brackets of a JSON array)
+    """
+    while start < end and data[start] in WHITESPACE:
+        start += 1
+    while end > start and data[end - 1] in WHITESPACE:
+        end -= 1
+    # Skip empty lines, start brackets, or end brackets
+    if start == end or (end - start == 1 and data[start] in BRACKETS):
+        return None
+
+    # Remove trailing comma if it exists (common in JSON arrays)
+    if data[end - 1] == COMMA:
+        end -= 1
+    return start, end
+
+
 def read_json_in_batches(filename, batch_size=5000):
     """
     Generator that yields batches of documents from JSON file
 
-    This function reads the file line-by-line to handle files
-    larger than available memory.
+    The file is memory-mapped and read a chunk at a time, so files larger
+    than available memory can be handled.
 
     Args:
         filename (str): Path to JSON file
@@ -128,98 +340,587 @@ def read_json_in_batches(filename, batch_size=5000):
     Yields:
         list: Batch of document dictionaries
     """
-    batch = []
-    line_num = 0
+    map_input(filename)
     errors = 0
 
-    with open(filename, "r", encoding="utf-8") as file:
-        for line in file:
-            line_num += 1
+    for chunk in read_line_ranges(filename, batch_size):
+        _, documents, warnings = parse_chunk(chunk)
+        for warning in warnings:
+            print(warning)
+        errors += len(warnings)
+        if documents:
+            yield documents
 
-            clean_line = line.strip()
-            # Skip empty lines, start brackets, or end brackets
-            if not clean_line or clean_line in ["[", "]"]:
-                continue
+    if errors > 0:
+        print(f"\n⚠ Warning: Skipped {errors} invalid lines")
 
-            # Remove trailing comma if it exists (common in JSON arrays)
-            if clean_line.endswith(","):
-                clean_line = clean_line[:-1]
 
-            try:
-                # Parse JSON from this line
-                document = json.loads(clean_line)
-                batch.append(document)
+def read_line_ranges(filename, batch_size=5000, max_bytes=None, tuner=None,
+                     start=0, start_line=1):
+    """
+    Generator that cuts the file into chunks of whole lines
 
-                # Yield batch when it reaches size limit
-                if len(batch) >= batch_size:
-                    yield batch
-                    batch = []
+    The file is memory-mapped and only searched for newlines; a chunk is
+    described by its byte range, and the parser that decodes it reads
+    those bytes from its own mapping of the file. A chunk ends after
+    batch_size lines or before the line that would take it over max_bytes,
+    whichever comes first (a line longer than max_bytes is a chunk of its
+    own); with a tuner, both limits are asked of the tuner for each chunk.
 
-            except json.JSONDecodeError as e:
-                errors += 1
-                print(f"Warning: Skipping invalid JSON on line {line_num}: {e}")
-                # Continue processing instead of failing
-                continue
+    Args:
+        filename (str): Path to JSON file
+        batch_size (int): Number of document lines per chunk
+        max_bytes (int): Cap on the bytes of a chunk (None for no cap)
+        tuner (BatchTuner): Supplies the limits and is told of each chunk
+        start (int): Byte offset to start reading at (a line boundary)
+        start_line (int): Line number of the line at that offset
 
-            except Exception as e:
-                errors += 1
-                print(f"Warning: Error on line {line_num}: {e}")
-                continue
+    Yields:
+        tuple: (chunk number, line number of the first line, number of
+        lines, start offset, end offset)
+    """
+    with open(filename, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if start >= size:
+            return
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    with mapped:
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+        chunk_num = 0
+        line_num = start_line
+        pos = start
+        while pos < size:
+            if tuner:
+                batch_size, max_bytes = tuner.limits()
+            limit = pos + max_bytes if max_bytes else size
+            end = pos
+            lines = 0
+            while lines < batch_size and end < size:
+                newline = mapped.find(b"\n", end, size)
+                line_end = size if newline < 0 else newline + 1
+                if line_end > limit and lines:
+                    break
+                end = line_end
+                lines += 1
+
+            chunk_num += 1
+            if tuner:
+                # The last chunk is cut by the end of the file, not the cap
+                tuner.chunk_cut(chunk_num, lines, lines < batch_size and end < size)
+            yield chunk_num, line_num, lines, pos, end
+            release_pages(mapped, pos, end)
+            line_num += lines
+            pos = end
+
+
+def line_object_id(id_time, offset):
+    """
+    The _id given to the document on the line at a byte offset
+
+    An ObjectId holds a 4-byte timestamp and 8 more bytes; here they are
+    the time the load started and the offset, so ids stay unique within a
+    load and come out the same when a resumed load reads the line again.
 
-        # Yield any remaining documents
-        if batch:
-            yield batch
+    Args:
+        id_time (int): Start time of the load (seconds since the epoch)
+        offset (int): Byte offset of the line in the file
 
-        if errors > 0:
-            print(f"\n⚠ Warning: Skipped {errors} invalid lines")
+    Returns:
+        ObjectId: The document's _id
+    """
+    return ObjectId(id_time.to_bytes(4, "big") + offset.to_bytes(8, "big"))
 
 
-def insert_batches(collection, json_file, batch_size=5000):
+def parse_chunk(chunk, decoder="json", raw_bson=False, id_time=None):
     """
-    Insert documents in batches from JSON file
+    Decode a chunk of lines of the mapped input (runs in a parser process)
+
+    Lines are located in the mapping with find() and decoded where they
+    lie: orjson reads a memoryview of the line directly, the other
+    decoders get a copy of just the document's bytes.
 
     Args:
-        collection (Collection): MongoDB collection
-        json_file (str): Path to JSON file
-        batch_size (int): Documents per batch
+        chunk (tuple): (chunk number, first line number, number of lines,
+            start offset, end offset), as from read_line_ranges
+        decoder (str): JSON decoder name (see get_decoder)
+        raw_bson (bool): Return each document BSON-encoded, as bytes
+        id_time (int): If given, documents without an _id get
+            line_object_id(id_time, offset of their line)
 
     Returns:
-        int: Total number of documents inserted
+        tuple: (chunk number, [documents], [warning messages])
     """
-    total_inserted = 0
-    batch_count = 0
-    start_time = time.time()
+    chunk_num, first_line, _, start, end = chunk
+    loads = get_decoder(decoder)
+    data = memoryview(_input)
+    # Only orjson decodes from a buffer; the others need bytes
+    zero_copy = loads is getattr(orjson, "loads", None)
+    documents = []
+    warnings = []
+
+    line_num = first_line - 1
+    pos = start
+    while pos < end:
+        line_num += 1
+        line_offset = pos
+        newline = _input.find(b"\n", pos, end)
+        pos = end if newline < 0 else newline + 1
+        span = clean_line_span(data, line_offset, pos)
+        if span is None:
+            continue
+        try:
+            text = data[span[0]:span[1]] if zero_copy else _input[span[0]:span[1]]
+            document = loads(text)
+            if not isinstance(document, dict):
+                raise ValueError("not a JSON object")
+            if id_time is not None and "_id" not in document:
+                document["_id"] = line_object_id(id_time, line_offset)
+            # Bytes pickle back from the parser far cheaper than dicts
+            documents.append(bson.encode(document) if raw_bson else document)
+        except json.JSONDecodeError as e:
+            warnings.append(f"Warning: Skipping invalid JSON on line {line_num}: {e}")
+        except Exception as e:
+            warnings.append(f"Warning: Error on line {line_num}: {e}")
 
-    print(f"\nLoading data from {json_file}...")
-    print(f"Batch size: {batch_size} documents")
-    print("-" * 50)
+    data.release()
+    release_pages(_input, start, end)
+    return chunk_num, documents, warnings
 
-    for batch in read_json_in_batches(json_file, batch_size):
-        try:
-            # Insert batch into MongoDB
-            # ordered=False continues even if some documents fail
-            result = collection.insert_many(batch, ordered=False)
 
-            inserted = len(result.inserted_ids)
-            total_inserted += inserted
-            batch_count += 1
+class LoadProgress:
+    """
+    Running totals shared by the insert workers
+
+    Batches finish in whatever order the workers complete them, so the
+    progress lines count completed batches rather than file positions.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+        self.total_inserted = 0
+        self.batch_count = 0
+        self.errors = 0
+        self.duplicates = 0
+
+    def batch_done(self, inserted, duplicates=0):
+        with self.lock:
+            self.total_inserted += inserted
+            self.duplicates += duplicates
+            self.batch_count += 1
 
             # Progress indicator
-            elapsed = time.time() - start_time
-            rate = total_inserted / elapsed if elapsed > 0 else 0
+            elapsed = time.time() - self.start_time
+            rate = self.total_inserted / elapsed if elapsed > 0 else 0
 
             print(
-                f"Batch {batch_count:3d}: {inserted:5d} docs "
-                f"(Total: {total_inserted:7d}, "
+                f"Batch {self.batch_count:3d}: {inserted:5d} docs "
+                f"(Total: {self.total_inserted:7d}, "
                 f"Rate: {rate:6.0f} docs/sec)"
             )
 
-        except Exception as e:
-            print(f"✗ Error inserting batch {batch_count}: {e}")
-            # Continue with next batch instead of failing completely
-            continue
+    def note(self, message):
+        with self.lock:
+            print(message)
+
+    def batch_failed(self, chunk_num, error):
+        with self.lock:
+            self.errors += 1
+            print(f"✗ Error inserting batch {chunk_num}: {error}")
 
-    return total_inserted
+
+class LoadCheckpoint:
+    """
+    How far a load of a file has got, saved in a side collection
+
+    Batches finish out of order, so the saved offset is a watermark: the
+    end of the last chunk such that it and every chunk before it have been
+    inserted. A chunk whose insert failed outright holds the watermark
+    back for the rest of the load, and a resumed load reads it again.
+    The checkpoint is written at most every 'interval' seconds, and once
+    more when the load stops.
+    """
+
+    def __init__(self, collection, json_file, interval=2.0):
+        self.lock = threading.Lock()
+        self.store = collection.database["load_checkpoints"]
+        self.key = collection.name
+        stat = os.stat(json_file)
+        self.file = {"path": os.path.abspath(json_file), "size": stat.st_size,
+                     "mtime": stat.st_mtime_ns}
+        self.interval = interval
+        self.offset = 0
+        self.line = 1
+        self.inserted = 0
+        self.id_time = int(time.time())
+        self.complete = False
+        self.pending = {}  # chunk number -> [end offset, end line, inserted or None]
+        self.next_chunk = 1
+        self.saved_at = 0.0
+
+    def load(self):
+        """
+        Read the saved checkpoint of this collection
+
+        Returns:
+            bool: True if there was one
+
+        Raises:
+            ValueError: If it is for another file, or the file has changed
+        """
+        saved = self.store.find_one({"_id": self.key})
+        if saved is None:
+            return False
+        if saved["file"] != self.file:
+            raise ValueError(f"the checkpoint is for {saved['file']['path']} as it was "
+                             f"then, not this file")
+        self.offset = saved["offset"]
+        self.line = saved["line"]
+        self.inserted = saved["inserted"]
+        self.id_time = saved["id_time"]
+        self.complete = saved["complete"]
+        return True
+
+    def chunk_read(self, chunk_num, end, end_line):
+        """Record where a chunk ends (called in file order)"""
+        with self.lock:
+            self.pending[chunk_num] = [end, end_line, None]
+
+    def chunk_done(self, chunk_num, inserted):
+        """Record a chunk as inserted (inserted: its documents now stored)"""
+        with self.lock:
+            self.pending[chunk_num][2] = inserted
+            while self.pending.get(self.next_chunk, (0, 0, None))[2] is not None:
+                self.offset, self.line, done = self.pending.pop(self.next_chunk)
+                self.inserted += done
+                self.next_chunk += 1
+            if time.time() - self.saved_at >= self.interval:
+                self._save()
+
+    def save(self, complete=False):
+        """Write the checkpoint; complete only counts if no chunk is outstanding"""
+        with self.lock:
+            self.complete = complete and not self.pending
+            self._save()
+
+    def _save(self):
+        """Write the checkpoint (caller holds the lock)"""
+        self.store.replace_one(
+            {"_id": self.key},
+            {"file": self.file, "offset": self.offset, "line": self.line,
+             "inserted": self.inserted, "id_time": self.id_time,
+             "complete": self.complete},
+            upsert=True,
+        )
+        self.saved_at = time.time()
+
+
+class BatchTuner:
+    """
+    Batch size limits tuned from the observed insert throughput
+
+    Batches are always capped at max_bytes of input (JSON text is close to
+    the size of the BSON it becomes), so batches of large articles are not
+    split by the driver and do not pile up in memory. Within that cap the
+    document count is tuned by hill climbing: after 'window' batches cut at
+    the current size have been inserted, their throughput (documents per
+    second spent in insert_many) is compared with the best size so far.
+    The size keeps moving by 'step' while throughput improves; when it
+    drops, the search returns to the best size and tries the other
+    direction with a smaller step, until the step is under 5% and the best
+    size is kept. A batch slower than max_latency seconds shrinks the size
+    straight away.
+    """
+
+    def __init__(self, batch_size=5000, max_bytes=8 * 1024 * 1024, adaptive=True,
+                 min_size=100, max_size=100000, window=4, max_latency=5.0):
+        self.lock = threading.Lock()
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        self.adaptive = adaptive
+        self.min_size = min_size
+        self.max_size = max_size
+        self.window = window
+        self.max_latency = max_latency
+        self.step = 2.0
+        self.direction = 1
+        self.settled = not adaptive
+        self.best_size = None
+        self.best_rate = None
+        self.sizes = {}  # chunk number -> batch size it was cut at
+        # Largest chunk the byte cap has cut: a bigger size changes nothing
+        self.byte_bound = None
+        self.docs = 0
+        self.seconds = 0.0
+        self.batches = 0
+
+    def limits(self):
+        """(documents, bytes) limits for the next chunk"""
+        with self.lock:
+            return self.batch_size, self.max_bytes
+
+    def chunk_cut(self, chunk_num, lines, byte_bound):
+        """Record the size setting a chunk was cut at, and if max_bytes cut it"""
+        with self.lock:
+            self.sizes[chunk_num] = self.batch_size
+            if byte_bound:
+                self.byte_bound = max(self.byte_bound or 0, lines)
+
+    def batch_done(self, chunk_num, docs, seconds):
+        """
+        Record an inserted batch (docs=0 for one that was not inserted)
+
+        Returns:
+            int: The new batch size, or None if it did not change
+        """
+        with self.lock:
+            size = self.sizes.pop(chunk_num, None)
+            # Batches cut before the last change say nothing about this size
+            if self.settled or size != self.batch_size or docs == 0:
+                return None
+            if seconds > self.max_latency and self.batch_size > self.min_size:
+                # Too slow whatever the throughput: never grow past this size
+                self.max_size = self.batch_size - 1
+                self.direction = -1
+                return self._move(self.batch_size)
+
+            self.docs += docs
+            self.seconds += seconds
+            self.batches += 1
+            if self.batches < self.window:
+                return None
+
+            rate = self.docs / self.seconds if self.seconds > 0 else float("inf")
+            if self.best_rate is None or rate > self.best_rate:
+                self.best_size, self.best_rate = self.batch_size, rate
+            else:
+                # Worse than the best size: search the other side of it
+                self.direction = -self.direction
+                self.step = self.step ** 0.5
+                if self.step < 1.05:
+                    return self._settle()
+            return self._move(self.best_size)
+
+    def _move(self, base):
+        """Step from size 'base' in the current direction (caller holds the lock)"""
+        factor = self.step if self.direction > 0 else 1 / self.step
+        ceiling = min(self.max_size, self.byte_bound or self.max_size)
+        size = min(ceiling, max(self.min_size, int(base * factor)))
+        if self.direction > 0 and size <= base:
+            # Cannot grow any further: search below instead
+            self.direction = -1
+            size = max(self.min_size, min(ceiling, int(base / self.step)))
+        self.docs = 0
+        self.seconds = 0.0
+        self.batches = 0
+        if size == self.batch_size:
+            return self._settle()
+        self.batch_size = size
+        return size
+
+    def _settle(self):
+        """Stop tuning at the best size seen (caller holds the lock)"""
+        self.settled = True
+        if self.best_size is None or self.best_size == self.batch_size:
+            return None
+        self.batch_size = self.best_size
+        return self.batch_size
+
+
+def insert_worker(address, db_name, collection_name, batches, progress, in_flight,
+                  tuner=None, checkpoint=None):
+    """
+    Insert batches from the queue until it yields None (runs in a thread)
+
+    Each worker has its own MongoClient, so the workers' round trips to the
+    server overlap instead of queueing behind one connection.
+
+    Args:
+        address (tuple): (host, port) of the MongoDB server
+        db_name (str), collection_name (str): Target collection
+        batches (Queue): (chunk number, documents) pairs, then None; the
+            documents are dicts or BSON bytes
+        progress (LoadProgress): Shared totals
+        in_flight (Semaphore): Released once per batch handled
+        tuner (BatchTuner): Told how long each batch took
+        checkpoint (LoadCheckpoint): Told of each batch inserted; documents
+            rejected as duplicates were inserted by an earlier, interrupted
+            run and do not count as errors
+    """
+    client = MongoClient(address[0], address[1], serverSelectionTimeoutMS=5000)
+    collection = client[db_name][collection_name]
+    try:
+        while True:
+            item = batches.get()
+            if item is None:
+                break
+            chunk_num, documents = item
+            if documents and isinstance(documents[0], bytes):
+                # Sent as-is: pymongo does not re-encode raw documents
+                documents = [RawBSONDocument(data) for data in documents]
+            try:
+                # ordered=False: documents of a batch may be written in any
+                # order and one failure does not stop the rest
+                start = time.perf_counter()
+                collection.insert_many(documents, ordered=False)
+                progress.batch_done(len(documents))
+                if checkpoint:
+                    checkpoint.chunk_done(chunk_num, len(documents))
+                if tuner:
+                    resized = tuner.batch_done(chunk_num, len(documents),
+                                               time.perf_counter() - start)
+                    if resized:
+                        progress.note(f"Batch size -> {resized} documents")
+            except BulkWriteError as e:
+                if tuner:
+                    tuner.batch_done(chunk_num, 0, 0.0)
+                errors = e.details.get("writeErrors", [])
+                # 11000: duplicate key, i.e. the document is already loaded
+                rejected = sum(1 for error in errors if error.get("code") != 11000)
+                inserted = e.details.get("nInserted", 0)
+                progress.batch_done(inserted, len(errors) - rejected)
+                if checkpoint:
+                    checkpoint.chunk_done(chunk_num, len(documents) - rejected)
+                if rejected:
+                    progress.batch_failed(chunk_num, f"{rejected} document(s) rejected")
+            except Exception as e:
+                if tuner:
+                    tuner.batch_done(chunk_num, 0, 0.0)
+                # Continue with next batch instead of failing completely
+                progress.batch_failed(chunk_num, e)
+            finally:
+                in_flight.release()
+    finally:
+        client.close()
+
+
+def insert_batches(collection, json_file, batch_size=5000, parsers=None, workers=4,
+                   decoder="auto", raw_bson=False, max_batch_bytes=8 * 1024 * 1024,
+                   adaptive=True, checkpoint=None):
+    """
+    Insert documents in batches from JSON file
+
+    The file is loaded by a pipeline: the reader (this thread) cuts the
+    memory-mapped file into byte ranges of whole lines, 'parsers' processes
+    decode the ranges from their own mappings of the file, and 'workers'
+    insert threads insert the decoded batches. Chunks are decoded
+    and inserted in whatever order they finish; only the number of batches
+    in flight is bounded, so memory use does not grow with the file.
+    With a checkpoint, loading starts at its offset and the checkpoint is
+    kept up to date as batches are inserted.
+
+    Args:
+        collection (Collection): MongoDB collection
+        json_file (str): Path to JSON file
+        batch_size (int): Documents per batch (the starting point if adaptive)
+        parsers (int): Parser processes (default: CPU count; 0 decodes in
+            the reader thread)
+        workers (int): Concurrent insert workers
+        decoder (str): JSON decoder (see get_decoder)
+        raw_bson (bool): Encode to BSON in the parsers and insert the bytes
+            as RawBSONDocuments (without a checkpoint, the server then
+            assigns the _ids)
+        max_batch_bytes (int): Cap on the input bytes of a batch
+        adaptive (bool): Tune the batch size from throughput (BatchTuner)
+        checkpoint (LoadCheckpoint): Where to resume from and record
+            progress; documents then get _ids from their line offsets
+
+    Returns:
+        int: Total number of documents inserted
+    """
+    if parsers is None:
+        parsers = os.cpu_count() or 1
+
+    print(f"\nLoading data from {json_file}...")
+    print(f"Batch size: {batch_size} documents{' (adaptive)' if adaptive else ''}, "
+          f"at most {max_batch_bytes / (1024 * 1024):g} MB")
+    print(f"Parsers: {parsers or 'reader thread'}, insert workers: {workers}")
+    if decoder == "auto":
+        decoder = available_decoders()[0]
+    print(f"Decoder: {decoder}{', raw BSON' if raw_bson else ''}")
+    print("-" * 50)
+
+    # Start the parsers before any thread exists, so no lock is forked held;
+    # each maps the file and reads its chunks' byte ranges from the mapping
+    if parsers > 0:
+        pool = Pool(parsers, initializer=map_input, initargs=(json_file,))
+    else:
+        pool = None
+        map_input(json_file)
+
+    progress = LoadProgress()
+    tuner = BatchTuner(batch_size, max_batch_bytes, adaptive)
+    # Chunks read but not yet inserted: enough to keep every parser and
+    # worker busy, few enough that the reader cannot run ahead of the server
+    in_flight = threading.BoundedSemaphore(2 * (parsers + workers))
+    stop = threading.Event()
+    batches = queue.Queue()
+    client = collection.database.client
+    threads = [
+        threading.Thread(
+            target=insert_worker,
+            args=(client.address, collection.database.name, collection.name,
+                  batches, progress, in_flight, tuner, checkpoint),
+            daemon=True,
+        )
+        for _ in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    start, start_line = (checkpoint.offset, checkpoint.line) if checkpoint else (0, 1)
+
+    def chunks():
+        for chunk in read_line_ranges(json_file, tuner=tuner, start=start,
+                                      start_line=start_line):
+            while not in_flight.acquire(timeout=0.1):
+                if stop.is_set():
+                    return
+            if checkpoint:
+                chunk_num, first_line, lines, _, end = chunk
+                checkpoint.chunk_read(chunk_num, end, first_line + lines)
+            yield chunk
+
+    invalid = 0
+    finished = False
+    try:
+        parse = partial(parse_chunk, decoder=decoder, raw_bson=raw_bson,
+                        id_time=checkpoint.id_time if checkpoint else None)
+        parsed = pool.imap_unordered(parse, chunks()) if pool else map(parse, chunks())
+        for chunk_num, documents, warnings in parsed:
+            for warning in warnings:
+                progress.note(warning)
+            invalid += len(warnings)
+            if documents:
+                batches.put((chunk_num, documents))
+            else:
+                tuner.batch_done(chunk_num, 0, 0.0)
+                if checkpoint:
+                    checkpoint.chunk_done(chunk_num, 0)
+                in_flight.release()
+        finished = True
+    finally:
+        stop.set()
+        if pool:
+            pool.terminate()
+        for _ in threads:
+            batches.put(None)
+        for thread in threads:
+            thread.join()
+        if checkpoint:
+            checkpoint.save(complete=finished)
+
+    if invalid > 0:
+        print(f"\n⚠ Warning: Skipped {invalid} invalid lines")
+    if progress.duplicates > 0:
+        print(f"✓ Skipped {progress.duplicates} documents already loaded by the interrupted run")
+    if checkpoint and not checkpoint.complete:
+        print(f"⚠ Not every batch was inserted: rerun with --resume to retry "
+              f"from line {checkpoint.line}")
+
+    return progress.total_inserted
 
 
 def create_indexes(collection):
@@ -252,19 +953,49 @@ def main():
     print("=" * 60)
 
     # Parse arguments
-    json_file, port = parse_arguments()
+    json_file, port, options = parse_arguments()
 
     # Connect to MongoDB
     client = connect_to_mongodb(port)
 
     # Setup database and collection
-    collection = setup_database(client)
+    collection = setup_database(client, resume=options["resume"])
+
+    # Find where to start: the beginning, or the last checkpoint
+    checkpoint = LoadCheckpoint(collection, json_file)
+    if options["resume"]:
+        try:
+            found = checkpoint.load()
+        except ValueError as e:
+            print(f"✗ Cannot resume: {e}")
+            sys.exit(1)
+        if not found:
+            print("✗ Cannot resume: no checkpoint saved (run without --resume)")
+            sys.exit(1)
+        if checkpoint.complete:
+            print(f"✓ Load already complete ({checkpoint.inserted:,} documents)")
+        else:
+            print(f"✓ Resuming at line {checkpoint.line} "
+                  f"({checkpoint.inserted:,} documents already loaded)")
+    else:
+        checkpoint.save()
 
     # Record start time
     start_time = time.time()
 
     # Load data in batches
-    total = insert_batches(collection, json_file, batch_size=5000)
+    total = 0 if checkpoint.complete else insert_batches(
+        collection,
+        json_file,
+        batch_size=options["batch_size"],
+        parsers=options["parsers"],
+        workers=options["workers"],
+        decoder=options["decoder"],
+        raw_bson=options["raw_bson"],
+        max_batch_bytes=options["max_batch_mb"] * 1024 * 1024,
+        adaptive=options["adaptive"],
+        checkpoint=checkpoint,
+    )
 
     # Create Indexes (CRITICAL FOR PHASE 2)
     create_indexes(collection)
@@ -276,6 +1007,8 @@ def main():
     print("  LOAD COMPLETE")
     print("=" * 60)
     print(f"Total documents inserted: {total:,}")
+    if options["resume"] and checkpoint.complete:
+        print(f"Documents loaded over all runs: {checkpoint.inserted:,}")
     print(f"Time taken: {elapsed:.2f} seconds ({elapsed/60:.2f} minutes)")
     print(f"Average rate: {total/elapsed:.0f} documents/second")
     print("=" * 60)
@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+Unit tests for load_json.py that need no MongoDB server
+
+The checkpoint and resume tests run the loader against StubClient, an
+in-memory stand-in for the few pymongo calls it makes.
+
+Usage: python test_load_json.py
+"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import bson
+from bson.objectid import ObjectId
+from bson.raw_bson import RawBSONDocument
+from pymongo.errors import BulkWriteError
+
+import load_json
+from load_json import (BatchTuner, LoadCheckpoint, clean_line_span, insert_batches,
+                       map_input, parse_chunk, read_json_in_batches, read_line_ranges)
+
+
+class StubServer:
+    """Collections of documents keyed by _id, shared by every StubClient"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.collections = {}
+        self.inserts = 0
+        self.fail_inserts = set()  # insert_many calls (1-based) that fail outright
+
+
+class StubClient:
+    address = ("localhost", 27017)
+
+    def __init__(self, server):
+        self.server = server
+
+    def __getitem__(self, name):
+        return StubDatabase(self, name)
+
+    def close(self):
+        pass
+
+
+class StubDatabase:
+
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def __getitem__(self, name):
+        return StubCollection(self, name)
+
+    def __getattr__(self, name):
+        return self[name]
+
+    def list_collection_names(self):
+        return [name for db, name in self.client.server.collections if db == self.name]
+
+
+class StubCollection:
+
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self.server = database.client.server
+
+    @property
+    def documents(self):
+        return self.server.collections.setdefault((self.database.name, self.name), {})
+
+    def insert_many(self, documents, ordered=True):
+        with self.server.lock:
+            self.server.inserts += 1
+            if self.server.inserts in self.server.fail_inserts:
+                raise ConnectionError("server went away")
+            errors = []
+            for index, document in enumerate(documents):
+                key = document.get("_id")
+                if key is None:
+                    # As pymongo and the server do for documents without one
+                    key = ObjectId()
+                    if isinstance(document, dict):
+                        document["_id"] = key
+                if key in self.documents:
+                    errors.append({"index": index, "code": 11000})
+                else:
+                    self.documents[key] = document
+        if errors:
+            raise BulkWriteError({"writeErrors": errors,
+                                  "nInserted": len(documents) - len(errors)})
+
+    def find_one(self, query):
+        return self.documents.get(query["_id"])
+
+    def replace_one(self, query, document, upsert=False):
+        self.documents[query["_id"]] = dict(document, _id=query["_id"])
+
+    def create_index(self, keys):
+        pass
+
+    def drop(self):
+        self.server.collections.pop((self.database.name, self.name), None)
+
+
+def insert(tuner, chunk_num, rate, byte_bound=False, seconds=None):
+    """Cut a chunk at the tuner's size and report it inserted at 'rate' docs/sec"""
+    size, _ = tuner.limits()
+    tuner.chunk_cut(chunk_num, size, byte_bound)
+    return tuner.batch_done(chunk_num, size, size / rate if seconds is None else seconds)
+
+
+class BatchTunerTest(unittest.TestCase):
+
+    def test_grows_while_throughput_improves(self):
+        tuner = BatchTuner(1000, window=1)
+        self.assertEqual(insert(tuner, 1, 1e5), 2000)
+        self.assertEqual(insert(tuner, 2, 2e5), 4000)
+
+    def test_reverses_when_throughput_drops(self):
+        tuner = BatchTuner(1000, window=1)
+        insert(tuner, 1, 1e5)
+        resized = insert(tuner, 2, 5e4)
+        # Back to the best size and below it, with a smaller step
+        self.assertLess(resized, 1000)
+        self.assertEqual(tuner.direction, -1)
+        self.assertAlmostEqual(tuner.step, 2 ** 0.5)
+
+    def test_settles_at_best_size_below_five_percent_step(self):
+        tuner = BatchTuner(1000, window=1)
+        for chunk_num in range(1, 100):
+            size, _ = tuner.limits()
+            insert(tuner, chunk_num, 1e5 if size == 1000 else 5e4)
+            if tuner.settled:
+                break
+        self.assertTrue(tuner.settled)
+        self.assertLess(tuner.step, 1.05)
+        self.assertEqual(tuner.limits()[0], 1000)
+        self.assertIsNone(insert(tuner, chunk_num + 1, 1e6))
+
+    def test_slow_batch_shrinks_and_caps_the_size(self):
+        tuner = BatchTuner(1000, window=1, max_latency=1.0)
+        resized = insert(tuner, 1, 1e5, seconds=2.0)
+        self.assertLess(resized, 1000)
+        self.assertEqual(tuner.max_size, 999)
+        for chunk_num in range(2, 20):
+            insert(tuner, chunk_num, 1e5 * chunk_num)
+            self.assertLessEqual(tuner.limits()[0], 999)
+
+    def test_never_grows_past_the_byte_bound(self):
+        tuner = BatchTuner(200, window=1)
+        insert(tuner, 1, 1e5)
+        # The byte cap cut this chunk: more documents would not fit
+        tuner.chunk_cut(2, 300, True)
+        tuner.batch_done(2, 300, 1.0)
+        self.assertEqual(tuner.byte_bound, 300)
+        for chunk_num in range(3, 20):
+            insert(tuner, chunk_num, 1e5 * chunk_num)
+            self.assertLessEqual(tuner.limits()[0], 300)
+
+    def test_batches_cut_at_an_old_size_are_ignored(self):
+        tuner = BatchTuner(1000, window=1)
+        tuner.chunk_cut(1, 1000, False)
+        tuner.chunk_cut(2, 1000, False)
+        self.assertEqual(tuner.batch_done(1, 1000, 10.0 / 1000), 2000)
+        self.assertIsNone(tuner.batch_done(2, 1000, 1.0))
+
+
+class ReadLineRangesTest(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".json")
+        self.lines = [b"x" * 9 + b"\n"] * 5 + [b"y" * 39 + b"\n"] + [b"z" * 9 + b"\n"] * 2
+        with os.fdopen(handle, "wb") as f:
+            f.write(b"".join(self.lines))
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_chunks_stay_within_the_byte_cap(self):
+        chunks = list(read_line_ranges(self.path, batch_size=100, max_bytes=25))
+        self.assertEqual([lines for _, _, lines, _, _ in chunks], [2, 2, 1, 1, 2])
+        # Only the line longer than the cap makes a larger chunk
+        self.assertEqual([end - start for _, _, _, start, end in chunks], [20, 20, 10, 40, 20])
+        self.assertEqual([first for _, first, _, _, _ in chunks], [1, 3, 5, 6, 7])
+
+    def test_chunks_cover_the_file(self):
+        chunks = list(read_line_ranges(self.path, batch_size=3))
+        self.assertEqual([lines for _, _, lines, _, _ in chunks], [3, 3, 2])
+        self.assertEqual(chunks[-1][4], len(b"".join(self.lines)))
+        for previous, chunk in zip(chunks, chunks[1:]):
+            self.assertEqual(previous[4], chunk[3])
+
+    def test_tuner_learns_the_byte_bound(self):
+        tuner = BatchTuner(100, max_bytes=25)
+        list(read_line_ranges(self.path, tuner=tuner))
+        self.assertEqual(tuner.byte_bound, 2)
+
+
+def write_input(test, data):
+    """A temporary input file holding 'data' (bytes), removed after the test"""
+    handle, path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(handle, "wb") as f:
+        f.write(data)
+    test.addCleanup(os.remove, path)
+    return path
+
+
+class ParseChunkTest(unittest.TestCase):
+
+    # A JSON array written one document per line, with CRLF endings, blank
+    # lines, a bad line and no newline at the end
+    ARRAY = (b'[\r\n{"id": 1},\r\n\r\n  {"id": 2} ,\r\n{"id": 3\r\n'
+             b'\t{"id": 4}\r\n]\r\n{"id": 5}')
+
+    def parse(self, path, batch_size=100):
+        map_input(path)
+        return [parse_chunk(chunk) for chunk in read_line_ranges(path, batch_size)]
+
+    def test_clean_line_span(self):
+        cases = [(b'{"a": 1}\n', b'{"a": 1}'), (b'  {"a": 1},\r\n', b'{"a": 1}'),
+                 (b'\t{"a": [1, 2]} \r\n', b'{"a": [1, 2]}'), (b'{"a": 1}', b'{"a": 1}'),
+                 (b'[\n', None), (b' ]\r\n', None), (b'\r\n', None), (b'   ', None), (b'', None)]
+        for line, document in cases:
+            span = clean_line_span(memoryview(line), 0, len(line))
+            self.assertEqual(span and line[span[0]:span[1]], document, line)
+
+    def test_documents_and_warnings(self):
+        path = write_input(self, self.ARRAY)
+        for batch_size in (1, 3, 100):
+            chunks = self.parse(path, batch_size)
+            documents = [doc for _, docs, _ in chunks for doc in docs]
+            warnings = [warning for _, _, found in chunks for warning in found]
+            self.assertEqual([doc["id"] for doc in documents], [1, 2, 4, 5], batch_size)
+            self.assertEqual(len(warnings), 1, batch_size)
+            self.assertIn("invalid JSON on line 5", warnings[0])
+
+    def test_line_objects_only(self):
+        path = write_input(self, b'{"id": 1}\n[1, 2]\n"text"\n')
+        (_, documents, warnings), = self.parse(path)
+        self.assertEqual(documents, [{"id": 1}])
+        self.assertEqual(len(warnings), 2)
+        self.assertTrue(all("not a JSON object" in warning for warning in warnings))
+
+    def test_empty_file(self):
+        path = write_input(self, b"")
+        self.assertEqual(self.parse(path), [])
+        self.assertEqual(list(read_json_in_batches(path)), [])
+
+    def test_read_json_in_batches_counts_bad_lines(self):
+        path = write_input(self, self.ARRAY)
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            batches = list(read_json_in_batches(path, batch_size=2))
+        self.assertEqual([doc["id"] for batch in batches for doc in batch], [1, 2, 4, 5])
+        self.assertIn("Skipped 1 invalid lines", out.getvalue())
+
+
+class LoadTestCase(unittest.TestCase):
+    """A file of LINES articles and a stub server for the loader"""
+
+    LINES = 3000
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(handle, "w") as f:
+            for i in range(self.LINES):
+                f.write(json.dumps({"id": str(i), "title": f"Article {i}", "source": "s"}) + "\n")
+        self.server = StubServer()
+        patcher = mock.patch.object(load_json, "MongoClient",
+                                    lambda *args, **kwargs: StubClient(self.server))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.collection = StubClient(self.server)["291db"]["articles"]
+        self.checkpoints = self.collection.database["load_checkpoints"]
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def load(self, checkpoint=None, **options):
+        options = dict(dict(batch_size=100, parsers=0, workers=2, adaptive=False), **options)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return insert_batches(self.collection, self.path, checkpoint=checkpoint, **options)
+
+    def stored(self):
+        """The loaded documents as plain dicts, keyed by _id"""
+        return {key: bson.decode(doc.raw if isinstance(doc, RawBSONDocument) else bson.encode(doc))
+                for key, doc in self.collection.documents.items()}
+
+
+class LoadCheckpointTest(LoadTestCase):
+
+    def test_watermark_waits_for_earlier_chunks(self):
+        checkpoint = LoadCheckpoint(self.collection, self.path, interval=0.0)
+        for chunk_num, end in [(1, 100), (2, 200), (3, 300)]:
+            checkpoint.chunk_read(chunk_num, end, chunk_num * 10 + 1)
+        checkpoint.chunk_done(2, 10)
+        self.assertEqual((checkpoint.offset, checkpoint.line, checkpoint.inserted), (0, 1, 0))
+        checkpoint.chunk_done(1, 10)
+        self.assertEqual((checkpoint.offset, checkpoint.line, checkpoint.inserted), (200, 21, 20))
+        checkpoint.save(complete=True)
+        self.assertFalse(checkpoint.complete, "chunk 3 is still outstanding")
+        checkpoint.chunk_done(3, 10)
+        checkpoint.save(complete=True)
+        saved = self.checkpoints.find_one({"_id": "articles"})
+        self.assertEqual((saved["offset"], saved["inserted"], saved["complete"]), (300, 30, True))
+
+    def test_load_reads_back_the_saved_checkpoint(self):
+        saved = LoadCheckpoint(self.collection, self.path)
+        self.assertFalse(saved.load())
+        saved.chunk_read(1, 100, 11)
+        saved.chunk_done(1, 10)
+        saved.save()
+        checkpoint = LoadCheckpoint(self.collection, self.path)
+        self.assertTrue(checkpoint.load())
+        self.assertEqual((checkpoint.offset, checkpoint.line, checkpoint.inserted, checkpoint.id_time),
+                         (100, 11, 10, saved.id_time))
+
+    def test_refuses_a_changed_file(self):
+        LoadCheckpoint(self.collection, self.path).save()
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"id": "extra"}) + "\n")
+        with self.assertRaises(ValueError):
+            LoadCheckpoint(self.collection, self.path).load()
+
+    def test_refuses_another_file(self):
+        LoadCheckpoint(self.collection, self.path).save()
+        handle, other = tempfile.mkstemp(suffix=".json")
+        os.close(handle)
+        self.addCleanup(os.remove, other)
+        with self.assertRaises(ValueError):
+            LoadCheckpoint(self.collection, other).load()
+
+
+class ResumeTest(LoadTestCase):
+
+    def test_resume_skips_documents_already_loaded(self):
+        checkpoint = LoadCheckpoint(self.collection, self.path)
+        checkpoint.save()
+        # One batch early in the load is lost: the watermark stops before it
+        self.server.fail_inserts = {3}
+        first = self.load(checkpoint)
+        self.assertEqual(first, self.LINES - 100)
+        saved = self.checkpoints.find_one({"_id": "articles"})
+        self.assertFalse(saved["complete"])
+        self.assertLess(saved["inserted"], first)
+
+        self.server.fail_inserts = set()
+        checkpoint = LoadCheckpoint(self.collection, self.path)
+        self.assertTrue(checkpoint.load())
+        second = self.load(checkpoint)
+        self.assertEqual(second, 100, "only the lost batch is stored again")
+        self.assertEqual(len(self.collection.documents), self.LINES)
+        self.assertEqual(sorted(int(doc["id"]) for doc in self.collection.documents.values()),
+                         list(range(self.LINES)))
+        saved = self.checkpoints.find_one({"_id": "articles"})
+        self.assertEqual((saved["inserted"], saved["complete"]), (self.LINES, True))
+
+    def main(self, *options):
+        argv = ["load-json.py", self.path, "27017", "--parsers", "0", "--batch-size", "100",
+                *options]
+        with mock.patch.object(sys, "argv", argv), \
+                mock.patch.object(load_json, "connect_to_mongodb",
+                                  lambda port: StubClient(self.server)), \
+                contextlib.redirect_stdout(io.StringIO()) as out:
+            try:
+                load_json.main()
+            except SystemExit as e:
+                return e.code, out.getvalue()
+        return 0, out.getvalue()
+
+    def test_main_resume(self):
+        status, output = self.main("--resume")
+        self.assertEqual(status, 1)
+        self.assertIn("no checkpoint saved", output)
+
+        self.server.fail_inserts = {2}
+        self.assertEqual(self.main()[0], 0)
+        self.assertLess(len(self.collection.documents), self.LINES)
+        self.server.fail_inserts = set()
+        status, output = self.main("--resume")
+        self.assertEqual(status, 0)
+        self.assertIn("Resuming at line", output)
+        self.assertEqual(len(self.collection.documents), self.LINES)
+
+        status, output = self.main("--resume")
+        self.assertIn("Load already complete (3,000 documents)", output)
+
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"id": "extra"}) + "\n")
+        status, output = self.main("--resume")
+        self.assertEqual(status, 1)
+        self.assertIn("Cannot resume", output)
+
+
+class ParserPoolTest(LoadTestCase):
+
+    BAD_LINES = 7
+
+    def setUp(self):
+        super().setUp()
+        with open(self.path, "a") as f:
+            for i in range(self.BAD_LINES):
+                f.write('{"id": "broken"\n' + json.dumps({"id": f"after {i}"}) + "\n")
+
+    def run_load(self, parsers):
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            inserted = insert_batches(self.collection, self.path, batch_size=100,
+                                      parsers=parsers, workers=3, adaptive=False)
+        stored = sorted(doc["id"] for doc in self.collection.documents.values())
+        self.server.collections.clear()
+        return inserted, stored, out.getvalue().splitlines()
+
+    def test_parser_processes_match_the_reader_thread(self):
+        inserted, stored, output = self.run_load(0)
+        self.assertEqual(inserted, self.LINES + self.BAD_LINES)
+        for parsers in (1, 3):
+            pooled = self.run_load(parsers)
+            self.assertEqual(pooled[:2], (inserted, stored), parsers)
+            warnings = [line for line in pooled[2] if "invalid JSON" in line]
+            self.assertEqual(len(warnings), self.BAD_LINES, parsers)
+            # Each warning is a line of its own, not run into a progress line
+            self.assertTrue(all(line.startswith("Warning: Skipping invalid JSON on line ")
+                                for line in warnings), parsers)
+            self.assertIn(f"Skipped {self.BAD_LINES} invalid lines", "\n".join(pooled[2]))
+            self.assertEqual(sum(1 for line in pooled[2] if line.startswith("Batch ")),
+                             sum(1 for line in output if line.startswith("Batch ")), parsers)
+
+
+class DecoderTest(LoadTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with open(self.path, "a") as f:
+            for i in range(self.LINES, self.LINES + 50):
+                f.write(json.dumps({"id": str(i), "title": "Caf\u00e9 \u2713 \"quoted\"",
+                                    "score": 1.25, "views": 2 ** 53, "tags": ["a", "b"],
+                                    "meta": {"empty": None, "flag": True}}) + "\n")
+
+    def test_get_decoder(self):
+        self.assertIs(load_json.get_decoder("json"), json.loads)
+        self.assertEqual(load_json.available_decoders()[-1], "json")
+        self.assertIs(load_json.get_decoder("auto"),
+                      load_json.get_decoder(load_json.available_decoders()[0]))
+
+    def test_falls_back_without_optional_decoders(self):
+        with mock.patch.object(load_json, "orjson", None), \
+                mock.patch.object(load_json, "simdjson", None):
+            self.assertEqual(load_json.available_decoders(), ["json"])
+            self.assertIs(load_json.get_decoder("auto"), json.loads)
+            for name in ("orjson", "simdjson"):
+                with self.assertRaises(ValueError):
+                    load_json.get_decoder(name)
+
+    def test_every_decoder_and_raw_bson_store_the_same_documents(self):
+        results = {}
+        for decoder in load_json.available_decoders():
+            for raw_bson in (False, True):
+                checkpoint = LoadCheckpoint(self.collection, self.path)
+                checkpoint.id_time = 1700000000
+                self.load(checkpoint, decoder=decoder, raw_bson=raw_bson)
+                stored = self.collection.documents
+                if raw_bson:
+                    self.assertTrue(all(isinstance(doc, RawBSONDocument) for doc in stored.values()))
+                results[decoder, raw_bson] = self.stored()
+                self.server.collections.clear()
+        expected = results["json", False]
+        self.assertEqual(len(expected), self.LINES + 50)
+        for mode, documents in results.items():
+            self.assertEqual(documents, expected, mode)
+
+
+if __name__ == "__main__":
+    unittest.main()